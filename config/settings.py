@@ -1,6 +1,6 @@
 import os
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import List, Optional
 
 class Settings(BaseSettings):
     # App Mode
@@ -16,17 +16,74 @@ class Settings(BaseSettings):
     INPAINT_TIMEOUT: int = 60
     INPAINT_MAX_RETRIES: int = 3
     INPAINT_BACKOFF_FACTOR: float = 2.0
+    INPAINT_TILE_MODE: bool = True         # One inpaint per box cluster instead of per box
+    INPAINT_DENSE_ENABLED: bool = False    # Whole-tile inpaint on dense tiles: fewer calls, but NOT pixel-identical to per-cluster crops
+    INPAINT_DENSE_CLUSTERS: int = 32       # Above this many clusters, inpaint the whole tile once
+    INPAINT_DENSE_COVERAGE: float = 0.35   # ...or when clusters cover this share of the tile
     OCR_CONFIDENCE_THRESHOLD: float = 0.2
     OCR_LANG: str = "en"
     ENABLE_GPU: bool = False
+    OCR_BATCH_SIZE: int = 4           # Tiles stacked per CRAFT forward pass
+    OCR_DETECT_ONLY: bool = True      # Cleaning only needs box geometry: skip the CRNN recognizer
+    OCR_DETECT_SCALE: float = 1.0     # < 1 detects on downscaled tiles (e.g. 0.5), boxes mapped back to full res
+    OCR_DETECT_REFINE: bool = True    # With OCR_DETECT_SCALE < 1, re-detect candidate regions at full resolution
+    OCR_REFINE_MARGIN: int = 16       # Padding (full-res px) around candidates for the refinement crops
+    
+    # LaMa ONNX session pool (Ultra Inpaint)
+    LAMA_POOL_SIZE: int = 2           # Warm sessions = concurrent /api/ultra_inpaint requests
+    LAMA_INTRA_OP_THREADS: int = 0    # Threads per session (0 = CPU cores / pool size)
+    LAMA_INTER_OP_THREADS: int = 1
+    LAMA_MEM_ARENA: bool = True
+    LAMA_GRAPH_OPT: str = "all"       # disable | basic | extended | all
+    LAMA_MULTI_REGION: bool = True    # One 512px window per mask cluster instead of one global ROI
+    LAMA_BATCH_SIZE: int = 4          # Windows per batched run (dynamic-batch models only)
+    LAMA_STRATEGY: str = "adaptive"   # adaptive (native-res packing/tiling) | resize (legacy 512 squash)
+    LAMA_TILE_OVERLAP: int = 64       # Overlap between native 512 tiles of a large window
+    LAMA_PACK_WINDOWS: bool = False   # adaptive: share 512 canvases between small windows (fewer runs, but they influence each other)
     
     # Webtoon & General Pipeline
-    TILE_OVERLAP: int = 64
+    TILE_OVERLAP: int = 120
     TILE_HEIGHT: int = 2048
-    TILE_SEAM_THRESHOLD: float = 15.0
+    TILE_DYNAMIC_HEIGHT: bool = True  # Shrink tiles below TILE_HEIGHT when free RAM can't hold the tiles in flight
+    TILE_SEAM_THRESHOLD: float = 15.0 # Mean abs difference allowed between neighbouring tiles on their overlap
+    TILE_SEAM_POLICY: str = "warn"    # warn | raise (TileSeamError) when a seam exceeds the threshold
+    TILE_SMART_CUTS: bool = True      # Place tile boundaries in flat bands (gutters) instead of fixed strides
+    TILE_CUT_SEARCH: int = 512        # Rows above the target height searched for a flat band
+    TILE_CUT_MIN_FLAT: int = 24       # Minimum flat band height for a clean (overlap-free) cut
+    DETECTION_DEDUP_IOU: float = 0.3  # Overlap-zone boxes from neighbouring tiles with this IoU are one balloon
+    DETECTION_DEDUP_CONTAINMENT: float = 0.8  # ... or when this much of the smaller box lies inside the other
+    TILE_WORKERS: int = 0             # Parallel tile pool size (0 = auto, 1 = serial)
+    STRIP_STORAGE_MODE: str = "auto"  # auto | mmap | memory (disk-backed strips for very tall pages)
+    STRIP_MMAP_MIN_PIXELS: int = 20_000_000  # auto: strips at least this big go through memmap storage
+    STRIP_TMP_DIR: str = ""           # Backing files for memmap strips ("" = system temp dir)
+    
+    # Stage profiler (core/profiler.py)
+    PROFILE_ENABLED: bool = False     # Profile every job and log the report (API: ?profile=true per request)
+    PROFILE_MEMORY: bool = False      # Also track per-stage peak memory (tracemalloc, noticeable overhead)
+    PROFILE_LOG_RECORDS: bool = False # Log every tile/cluster record, not just the per-stage summary
+    
+    # Blank-tile prefilter (rows without contrast skip OCR)
+    PREFILTER_ENABLED: bool = True
+    PREFILTER_ROW_TOLERANCE: int = 24 # Max per-row pixel range still considered flat
+    PREFILTER_MARGIN: int = 24        # Rows kept around every active row
+    PREFILTER_MIN_GAP: int = 64       # Flat gaps shorter than this are not skipped
+    
+    # Preview pyramid (core/preview.py): downscaled WebP copies of every processed page
+    PREVIEW_ENABLED: bool = True
+    PREVIEW_WIDTHS: List[int] = [256, 1024]  # Levels below full size, area-resized from the next larger one
+    PREVIEW_QUALITY: int = 80         # WebP quality of every level
+    PREVIEW_WORKERS: int = 1          # Background threads building pyramids
+    
+    # Result Cache (content-hash of page bytes + pipeline params)
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_DIR: str = "cache/results"
+    RESULT_CACHE_MAX_MB: int = 2048
     
     # Web Specific
     WEB_MAX_UPLOAD_MB: int = 20
+    JOB_WORKERS: int = 2              # Warm worker processes for /start (0 = in-process thread)
+    JOB_QUEUE_MAX_DEPTH: int = 500    # Queued files before /start answers 429
+    JOB_PRIORITY_TOKEN: str = ""      # /start honours ?priority= only with this X-Priority-Token ("" = never)
     
     # Logging
     LOG_FILE: str = "app.log"
@@ -1,12 +1,34 @@
 import os
 import cv2
+import time
+import queue
+import threading
 import numpy as np
 import logging
 import onnxruntime as ort
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import List
 from huggingface_hub import hf_hub_download
 
+from config.settings import settings
+from core.inpaint_engine import Rect, merge_rects
+
 logger = logging.getLogger(__name__)
 
+# LaMa model input side, and the gap (filled by reflection) between ROIs packed into one canvas.
+# The gap only keeps neighbours out of each other's pixels: LaMa's FFC blocks see the whole
+# canvas, so packed ROIs still influence each other's fill (see LAMA_PACK_WINDOWS).
+LAMA_CANVAS = 512
+LAMA_PACK_GAP = 16
+
+GRAPH_OPT_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
 class FrequencySeparation:
     """Original Refinement from tools/ultra_cleaner/frequency_refinement.py"""
     def __init__(self, blur_kernel: int = 21, texture_strength: float = 1.2, feather_radius: int = 5, padding: int = 15):
@@ -47,9 +69,67 @@ class FrequencySeparation:
         result[y_min:y_max, x_min:x_max] = blended_roi.astype(np.uint8)
         return result
 
+class LaMaSessionPool:
+    """
+    Fixed pool of warm LaMa ONNX sessions.
+    Every session is created up front with explicit threading so N concurrent requests
+    each get their own session (and their own intra-op threads) instead of queueing on one.
+    Default split: the CPU cores are divided evenly between the sessions.
+    """
+    def __init__(self, model_path: str, size: int = None, intra_op_threads: int = None,
+                 inter_op_threads: int = None, mem_arena: bool = None, graph_opt: str = None):
+        self.model_path = model_path
+        self.size = max(1, settings.LAMA_POOL_SIZE if size is None else size)
+        intra = settings.LAMA_INTRA_OP_THREADS if intra_op_threads is None else intra_op_threads
+        self.intra_op_threads = intra if intra > 0 else max(1, (os.cpu_count() or 1) // self.size)
+        self.inter_op_threads = max(1, settings.LAMA_INTER_OP_THREADS if inter_op_threads is None else inter_op_threads)
+        self.mem_arena = settings.LAMA_MEM_ARENA if mem_arena is None else mem_arena
+        self.graph_opt = settings.LAMA_GRAPH_OPT if graph_opt is None else graph_opt
+        self._idle = queue.Queue()
+        self.input_names = None
+        self.dynamic_batch = False
+
+        for _ in range(self.size):
+            self._idle.put(self._create_session())
+        logger.info(f"LaMa session pool ready: {self.size} x (intra {self.intra_op_threads}, inter {self.inter_op_threads})")
+
+    def session_options(self) -> ort.SessionOptions:
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = self.intra_op_threads
+        opts.inter_op_num_threads = self.inter_op_threads
+        opts.execution_mode = ort.ExecutionMode.ORT_PARALLEL if self.inter_op_threads > 1 else ort.ExecutionMode.ORT_SEQUENTIAL
+        opts.graph_optimization_level = GRAPH_OPT_LEVELS.get(self.graph_opt, ort.GraphOptimizationLevel.ORT_ENABLE_ALL)
+        opts.enable_cpu_mem_arena = self.mem_arena
+        opts.enable_mem_pattern = self.mem_arena
+        return opts
+
+    def _create_session(self) -> ort.InferenceSession:
+        session = ort.InferenceSession(self.model_path, sess_options=self.session_options(), providers=['CPUExecutionProvider'])
+        if self.input_names is None:
+            inputs = session.get_inputs()
+            self.input_names = [inp.name for inp in inputs]
+            # Symbolic/None first dim = the graph accepts [N,3,512,512] batches
+            self.dynamic_batch = not isinstance(inputs[0].shape[0], int)
+        return session
+
+    @contextmanager
+    def checkout(self, timeout: float = None):
+        """Borrows an idle session (blocking while all are busy) and returns it afterwards."""
+        session = self._idle.get(timeout=timeout)
+        try:
+            yield session
+        finally:
+            self._idle.put(session)
+
+    def run(self, inputs: dict):
+        with self.checkout() as session:
+            return session.run(None, inputs)
+
+
 class LaMaInpainter:
     _instance = None
-    _session = None
+    _pool = None
+    _pool_lock = threading.Lock()
 
     def __new__(cls):
         if cls._instance is None:
@@ -67,23 +147,63 @@ class LaMaInpainter:
         self._initialized = True
 
     def _load_model(self):
-        try:
+        with self._pool_lock:
+            if self._pool is not None:
+                return
+            try:
+                if not os.path.exists(self.model_path):
+                    logger.info("Downloading LaMa model...")
+                    os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
+                    downloaded = hf_hub_download(repo_id="Carve/LaMa-ONNX", filename="lama.onnx")
+                    import shutil
+                    shutil.copy(downloaded, self.model_path)
+
+                LaMaInpainter._pool = LaMaSessionPool(self.model_path)
+                logger.info(f"LaMa loaded from {self.model_path}")
+            except Exception as e:
+                logger.error(f"Error loading LaMa: {e}")
+
+    def warm(self):
+        """
+        Creates the session pool now (server start-up) instead of on the first request. Only
+        an installed model is warmed: the download stays with install_ultra or the first use.
+        """
+        if self._pool is None:
             if not os.path.exists(self.model_path):
-                logger.info("Downloading LaMa model...")
-                os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
-                downloaded = hf_hub_download(repo_id="Carve/LaMa-ONNX", filename="lama.onnx")
-                import shutil
-                shutil.copy(downloaded, self.model_path)
-            
-            self._session = ort.InferenceSession(self.model_path, providers=['CPUExecutionProvider'])
-            logger.info(f"LaMa loaded from {self.model_path}")
-        except Exception as e:
-            logger.error(f"Error loading LaMa: {e}")
+                logger.info(f"LaMa warm-up skipped: no model at {self.model_path}")
+                return False
+            self._load_model()
+        return self.is_available()
 
-    def is_available(self): return self._session is not None
+    def is_available(self): return self._pool is not None
+
+    @staticmethod
+    def _context_window(x_min, y_min, x_max, y_max, H, W):
+        """Region bbox + 30% (+20px) of context on each side, clipped to the image."""
+        padding_h, padding_w = int((y_max-y_min)*0.3)+20, int((x_max-x_min)*0.3)+20
+        return max(0, x_min-padding_w), max(0, y_min-padding_h), min(W, x_max+padding_w), min(H, y_max+padding_h)
+
+    @staticmethod
+    def _to_tensors(roi_img: np.ndarray, roi_mask: np.ndarray):
+        # Resize for model
+        roi_rgb = cv2.cvtColor(roi_img, cv2.COLOR_BGR2RGB)
+        roi_res = cv2.resize(roi_rgb, (512, 512), interpolation=cv2.INTER_AREA)
+        mask_res = cv2.resize(roi_mask, (512, 512), interpolation=cv2.INTER_NEAREST)
+
+        # Tensors [0, 1]
+        img_t = (roi_res.astype(np.float32) / 255.0).transpose(2, 0, 1)[None]
+        mask_t = (mask_res.astype(np.float32) / 255.0)[None, None]
+        return img_t, mask_t
+
+    @staticmethod
+    def _from_output(out: np.ndarray, roi_shape) -> np.ndarray:
+        out_roi = np.clip(out.transpose(1, 2, 0), 0, 255).astype(np.uint8)
+        if out_roi.shape[:2] != tuple(roi_shape[:2]):
+            out_roi = cv2.resize(out_roi, (roi_shape[1], roi_shape[0]), interpolation=cv2.INTER_CUBIC)
+        return cv2.cvtColor(out_roi, cv2.COLOR_RGB2BGR)
 
     def process(self, image: np.ndarray, mask: np.ndarray) -> np.ndarray:
-        if self._session is None:
+        if self._pool is None:
             self._load_model()
         
         if not self.is_available(): return image
@@ -93,36 +213,194 @@ class LaMaInpainter:
         y_indices, x_indices = np.where(mask > 0)
         if len(y_indices) == 0: return image.copy()
         
-        y_min, y_max, x_min, x_max = np.min(y_indices), np.max(y_indices), np.min(x_indices), np.max(x_indices)
         H, W = image.shape[:2]
-        padding_h, padding_w = int((y_max-y_min)*0.3)+20, int((x_max-x_min)*0.3)+20
-        
-        ry1, ry2 = max(0, y_min-padding_h), min(H, y_max+padding_h)
-        rx1, rx2 = max(0, x_min-padding_w), min(W, x_max+padding_w)
+        rx1, ry1, rx2, ry2 = self._context_window(np.min(x_indices), np.min(y_indices), np.max(x_indices), np.max(y_indices), H, W)
         
         roi_img = image[ry1:ry2, rx1:rx2].copy()
         roi_mask = mask[ry1:ry2, rx1:rx2].copy()
+        img_t, mask_t = self._to_tensors(roi_img, roi_mask)
         
-        # Resize for model
-        roi_rgb = cv2.cvtColor(roi_img, cv2.COLOR_BGR2RGB)
-        roi_res = cv2.resize(roi_rgb, (512, 512), interpolation=cv2.INTER_AREA)
-        mask_res = cv2.resize(roi_mask, (512, 512), interpolation=cv2.INTER_NEAREST)
-        
-        # Tensors [0, 1]
-        img_t = (roi_res.astype(np.float32) / 255.0).transpose(2, 0, 1)[None]
-        mask_t = (mask_res.astype(np.float32) / 255.0)[None, None]
-        
-        # Run
-        inputs = {self._session.get_inputs()[0].name: img_t, self._session.get_inputs()[1].name: mask_t}
-        out = self._session.run(None, inputs)[0][0]
-        
-        # Post
-        out_roi = np.clip(out.transpose(1, 2, 0), 0, 255).astype(np.uint8)
-        out_final = cv2.resize(out_roi, (roi_img.shape[1], roi_img.shape[0]), interpolation=cv2.INTER_CUBIC)
-        out_bgr = cv2.cvtColor(out_final, cv2.COLOR_RGB2BGR)
+        # Run (on a session checked out of the pool: concurrent requests don't serialize)
+        inputs = {self._pool.input_names[0]: img_t, self._pool.input_names[1]: mask_t}
+        out = self._pool.run(inputs)[0][0]
         
         res = image.copy()
-        res[ry1:ry2, rx1:rx2] = out_bgr
+        res[ry1:ry2, rx1:rx2] = self._from_output(out, roi_img.shape)
+        return res
+
+    def region_windows(self, mask: np.ndarray) -> List[Rect]:
+        """
+        One context window per connected mask cluster, (x1, y1, x2, y2).
+        Windows that overlap are merged, so every mask pixel is inpainted exactly once.
+        """
+        if len(mask.shape) >= 3: mask = mask[:, :, 0]
+        H, W = mask.shape[:2]
+        n, _, stats, _ = cv2.connectedComponentsWithStats((mask > 0).astype(np.uint8), connectivity=8)
+        windows = []
+        for x, y, w, h, _ in stats[1:]:
+            windows.append(self._context_window(int(x), int(y), int(x + w - 1), int(y + h - 1), H, W))
+        return merge_rects(windows)
+
+    def _run_batched(self, tensors: list, batch_size: int):
+        """Runs (img_t, mask_t) pairs; returns one [3,512,512] output per pair plus the number of runs."""
+        img_name, mask_name = self._pool.input_names[:2]
+
+        if self._pool.dynamic_batch and batch_size > 1:
+            def run_chunk(chunk):
+                inputs = {img_name: np.concatenate([t[0] for t in chunk]), mask_name: np.concatenate([t[1] for t in chunk])}
+                return list(self._pool.run(inputs)[0])
+            chunks = [tensors[i:i + batch_size] for i in range(0, len(tensors), batch_size)]
+        else:
+            def run_chunk(chunk):
+                return [self._pool.run({img_name: chunk[0][0], mask_name: chunk[0][1]})[0][0]]
+            chunks = [[t] for t in tensors]
+
+        if len(chunks) > 1 and self._pool.size > 1:
+            with ThreadPoolExecutor(max_workers=min(self._pool.size, len(chunks))) as executor:
+                outputs = [out for chunk_out in executor.map(run_chunk, chunks) for out in chunk_out]
+        else:
+            outputs = [out for chunk in chunks for out in run_chunk(chunk)]
+        return outputs, len(chunks)
+
+    @staticmethod
+    def _tile_starts(length: int, size: int, overlap: int) -> List[int]:
+        """Start offsets of `size` tiles covering [0, length) with at least `overlap` px shared."""
+        if length <= size:
+            return [0]
+        stride = size - overlap
+        starts = list(range(0, length - size, stride))
+        starts.append(length - size)
+        return starts
+
+    def _adaptive_canvases(self, image: np.ndarray, mask: np.ndarray, windows: List[Rect], pack: bool = None):
+        """
+        Builds 512x512 model inputs at native resolution (no resize at all):
+        - windows that fit in 512 get a canvas each, padded by reflection; with `pack`
+          (default LAMA_PACK_WINDOWS) they are shelf-packed together, several per canvas,
+          which saves runs but lets them influence each other's fill;
+        - larger windows are cut into overlapping 512 tiles, and only tiles touching the
+          mask are kept, so the work follows the masked area instead of the window size.
+        Returns (canvases, placements). A placement maps a canvas region back to the page:
+        (canvas index, canvas x, canvas y, page rect, feather weights or None, source window).
+        """
+        size, gap, overlap = LAMA_CANVAS, LAMA_PACK_GAP, settings.LAMA_TILE_OVERLAP
+        pack = settings.LAMA_PACK_WINDOWS if pack is None else pack
+        canvases, placements = [], []
+
+        small = sorted((r for r in windows if r[2] - r[0] <= size and r[3] - r[1] <= size),
+                       key=lambda r: r[3] - r[1], reverse=True)
+        large = [r for r in windows if r[2] - r[0] > size or r[3] - r[1] > size]
+
+        def new_canvas():
+            canvases.append((np.full((size, size, 3), 255, dtype=np.uint8), np.zeros((size, size), dtype=np.uint8)))
+            return len(canvases) - 1
+
+        # Shelf packing: tallest first, left to right, new shelf/canvas when full
+        cur, cx, cy, shelf_h = None, 0, 0, 0
+        for x1, y1, x2, y2 in small:
+            w, h = x2 - x1, y2 - y1
+            if not pack:
+                canvas_img = cv2.copyMakeBorder(image[y1:y2, x1:x2], 0, size - h, 0, size - w, cv2.BORDER_REFLECT_101)
+                canvas_mask = np.zeros((size, size), dtype=np.uint8)
+                canvas_mask[:h, :w] = mask[y1:y2, x1:x2]
+                canvases.append((canvas_img, canvas_mask))
+                placements.append((len(canvases) - 1, 0, 0, (x1, y1, x2, y2), None, (x1, y1, x2, y2)))
+                continue
+            if cur is not None and cx + w > size:
+                cx, cy, shelf_h = 0, cy + shelf_h + gap, 0
+            if cur is None or cy + h > size:
+                cur, cx, cy, shelf_h = new_canvas(), 0, 0, 0
+            canvas_img, canvas_mask = canvases[cur]
+            # Reflected border around each slot keeps neighbours out of its pixels (not out of
+            # LaMa's receptive field, which spans the canvas)
+            slot = cv2.copyMakeBorder(image[y1:y2, x1:x2], 0, min(gap, size - cy - h), 0, min(gap, size - cx - w), cv2.BORDER_REFLECT_101)
+            canvas_img[cy:cy + slot.shape[0], cx:cx + slot.shape[1]] = slot
+            canvas_mask[cy:cy + h, cx:cx + w] = mask[y1:y2, x1:x2]
+            placements.append((cur, cx, cy, (x1, y1, x2, y2), None, (x1, y1, x2, y2)))
+            cx += w + gap
+            shelf_h = max(shelf_h, h)
+
+        for x1, y1, x2, y2 in large:
+            for ty in self._tile_starts(y2 - y1, size, overlap):
+                for tx in self._tile_starts(x2 - x1, size, overlap):
+                    px1, py1 = x1 + tx, y1 + ty
+                    px2, py2 = min(x2, px1 + size), min(y2, py1 + size)
+                    tile_mask = mask[py1:py2, px1:px2]
+                    if not tile_mask.any():
+                        continue
+                    h, w = py2 - py1, px2 - px1
+                    tile_img = cv2.copyMakeBorder(image[py1:py2, px1:px2], 0, size - h, 0, size - w, cv2.BORDER_REFLECT_101)
+                    tile_m = np.zeros((size, size), dtype=np.uint8)
+                    tile_m[:h, :w] = tile_mask
+                    canvases.append((tile_img, tile_m))
+                    placements.append((len(canvases) - 1, 0, 0, (px1, py1, px2, py2), self._feather(h, w, overlap), (x1, y1, x2, y2)))
+        return canvases, placements
+
+    @staticmethod
+    def _feather(h: int, w: int, overlap: int) -> np.ndarray:
+        """Linear ramp over the overlap band, so neighbouring tiles cross-fade instead of seaming."""
+        ramp_y = np.minimum(1.0, (np.minimum(np.arange(h), np.arange(h)[::-1]) + 1) / max(1, overlap))
+        ramp_x = np.minimum(1.0, (np.minimum(np.arange(w), np.arange(w)[::-1]) + 1) / max(1, overlap))
+        return (ramp_y[:, None] * ramp_x[None, :]).astype(np.float32)
+
+    def process_regions(self, image: np.ndarray, mask: np.ndarray, batch_size: int = None,
+                        strategy: str = None, pack: bool = None) -> np.ndarray:
+        """
+        Multi-region mode: each cluster gets its own window instead of one ROI spanning all
+        of them. Model inputs are stacked into [N,3,512,512] batches when the model has a
+        dynamic batch axis; otherwise they run one per pooled session, in parallel.
+        strategy "resize": every window is squashed/stretched to 512x512 (legacy behaviour).
+        strategy "adaptive": native resolution, large windows tiled, small ones packed into
+        shared canvases only with `pack` (default LAMA_PACK_WINDOWS).
+        """
+        if self._pool is None:
+            self._load_model()
+        if not self.is_available(): return image
+
+        if len(mask.shape) >= 3: mask = mask[:, :, 0]
+        windows = self.region_windows(mask)
+        if not windows: return image.copy()
+
+        start = time.perf_counter()
+        batch_size = max(1, settings.LAMA_BATCH_SIZE if batch_size is None else batch_size)
+        strategy = settings.LAMA_STRATEGY if strategy is None else strategy
+
+        res = image.copy()
+        if strategy == "adaptive":
+            canvases, placements = self._adaptive_canvases(image, mask, windows, pack)
+            outputs, runs = self._run_batched([self._to_tensors(img, m) for img, m in canvases], batch_size)
+            native = [self._from_output(out, (LAMA_CANVAS, LAMA_CANVAS)) for out in outputs]
+
+            acc = {}
+            for canvas_idx, cx, cy, (x1, y1, x2, y2), weight, window in placements:
+                patch = native[canvas_idx][cy:cy + (y2 - y1), cx:cx + (x2 - x1)]
+                if weight is None:
+                    res[y1:y2, x1:x2] = patch
+                    continue
+                # Tiles of one large window: weighted sum, normalized once all tiles are in
+                wx1, wy1, wx2, wy2 = window
+                if window not in acc:
+                    acc[window] = (np.zeros((wy2 - wy1, wx2 - wx1, 3), np.float32), np.zeros((wy2 - wy1, wx2 - wx1), np.float32))
+                total, weights = acc[window]
+                total[y1 - wy1:y2 - wy1, x1 - wx1:x2 - wx1] += patch.astype(np.float32) * weight[..., None]
+                weights[y1 - wy1:y2 - wy1, x1 - wx1:x2 - wx1] += weight
+            for (wx1, wy1, wx2, wy2), (total, weights) in acc.items():
+                covered = weights > 0
+                region = res[wy1:wy2, wx1:wx2]
+                region[covered] = np.clip(total[covered] / weights[covered][:, None] + 0.5, 0, 255).astype(np.uint8)
+            n_inputs = len(canvases)
+        else:
+            tensors = [self._to_tensors(image[y1:y2, x1:x2], mask[y1:y2, x1:x2]) for x1, y1, x2, y2 in windows]
+            outputs, runs = self._run_batched(tensors, batch_size)
+            for (x1, y1, x2, y2), out in zip(windows, outputs):
+                res[y1:y2, x1:x2] = self._from_output(out, (y2 - y1, x2 - x1))
+            n_inputs = len(tensors)
+
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"LaMa multi-region ({strategy}): {len(windows)} regions, {n_inputs} canvases in {runs} runs, "
+            f"{len(windows) / max(elapsed, 1e-6):.1f} regions/s"
+        )
         return res
 
 def get_lama_engine():
@@ -134,7 +412,7 @@ def get_lama_engine():
 def ultra_inpaint_area(image: np.ndarray, mask: np.ndarray, use_frequency_separation: bool = True) -> np.ndarray:
     """The 'From Scratch' Pipeline: LaMa + Frequency Refinement"""
     lama = get_lama_engine()
-    step1 = lama.process(image, mask)
+    step1 = lama.process_regions(image, mask) if settings.LAMA_MULTI_REGION else lama.process(image, mask)
     
     if use_frequency_separation:
         freq = FrequencySeparation()
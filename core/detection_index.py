@@ -0,0 +1,122 @@
+# core/detection_index.py
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from config.settings import settings
+
+Rect = Tuple[float, float, float, float]
+
+
+def box_rect(box: Dict[str, Any]) -> Rect:
+    """Axis-aligned (x1, y1, x2, y2) of an OCR box polygon."""
+    xs = [p[0] for p in box["box"]]
+    ys = [p[1] for p in box["box"]]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _area(r: Rect) -> float:
+    return max(0.0, r[2] - r[0]) * max(0.0, r[3] - r[1])
+
+
+def _intersection(a: Rect, b: Rect) -> float:
+    return _area((max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])))
+
+
+def rect_iou(a: Rect, b: Rect) -> float:
+    inter = _intersection(a, b)
+    union = _area(a) + _area(b) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def rect_containment(a: Rect, b: Rect) -> float:
+    """Intersection over the smaller box: catches a balloon that one tile only saw cut off at its edge."""
+    smaller = min(_area(a), _area(b))
+    return _intersection(a, b) / smaller if smaller > 0 else 0.0
+
+
+class DetectionIndex:
+    """
+    Page-level registry of the OCR boxes of every tile (page coordinates).
+    Neighbouring tiles share their overlap rows, so text there is detected twice:
+    the index merges those duplicates (IoU or containment) and gives every balloon
+    exactly one owner tile - the first tile that contains it entirely. A balloon no
+    single tile contains (taller than the overlap) stays with each tile that saw it,
+    since neither could clean it alone.
+    """
+
+    def __init__(self, bounds: Sequence[Tuple[int, int]], iou_threshold: Optional[float] = None,
+                 containment: Optional[float] = None):
+        self.bounds = list(bounds)
+        self.iou_threshold = settings.DETECTION_DEDUP_IOU if iou_threshold is None else iou_threshold
+        self.containment = settings.DETECTION_DEDUP_CONTAINMENT if containment is None else containment
+        # One entry per unique balloon: representative box + the box each tile saw
+        self._entries: List[Dict[str, Any]] = []
+        self.detections = 0
+        self.duplicates = 0
+        self._owned: Optional[Dict[int, List[Dict[str, Any]]]] = None
+
+    def add(self, tile_idx: int, boxes: List[Dict[str, Any]]):
+        """Registers a tile's boxes. Tiles must be added in order (each is matched against the previous one)."""
+        self._owned = None
+        self.detections += len(boxes)
+        prev = [e for e in self._entries if tile_idx - 1 in e["members"]] if tile_idx > 0 else []
+        if prev:
+            shared_top = self.bounds[tile_idx][0]
+            shared_bottom = self.bounds[tile_idx - 1][1]
+            prev = [e for e in prev if e["rect"][3] > shared_top]
+
+        for box in boxes:
+            rect = box_rect(box)
+            match = None
+            if prev and rect[1] < shared_bottom:
+                match = self._best_match(rect, prev)
+            if match is None:
+                self._entries.append({"box": box, "rect": rect, "members": {tile_idx: box}})
+                continue
+            self.duplicates += 1
+            match["members"][tile_idx] = box
+            # Keep the more complete detection; the other one was cut by a tile edge
+            if _area(rect) > _area(match["rect"]):
+                confidence = max(box.get("confidence") or 0, match["box"].get("confidence") or 0)
+                if box.get("confidence") is not None:
+                    box = {**box, "confidence": confidence}
+                match["box"], match["rect"] = box, rect
+            prev.remove(match)
+
+    def _best_match(self, rect: Rect, candidates: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        best, best_score = None, 0.0
+        for entry in candidates:
+            iou = rect_iou(rect, entry["rect"])
+            if iou < self.iou_threshold and rect_containment(rect, entry["rect"]) < self.containment:
+                continue
+            if iou >= best_score:
+                best, best_score = entry, iou
+        return best
+
+    def _resolve(self) -> Dict[int, List[Dict[str, Any]]]:
+        owned: Dict[int, List[Dict[str, Any]]] = {idx: [] for idx in range(len(self.bounds))}
+        for entry in self._entries:
+            y1, y2 = entry["rect"][1], entry["rect"][3]
+            owner = next((idx for idx in sorted(entry["members"])
+                          if self.bounds[idx][0] <= y1 and y2 <= self.bounds[idx][1]), None)
+            if owner is None:
+                for idx, box in entry["members"].items():
+                    owned[idx].append(box)
+            else:
+                owned[owner].append(entry["box"])
+        return owned
+
+    def owned_by(self, tile_idx: int) -> List[Dict[str, Any]]:
+        """The boxes (page coordinates) the given tile must clean."""
+        if self._owned is None:
+            self._owned = self._resolve()
+        return self._owned[tile_idx]
+
+    @property
+    def boxes(self) -> List[Dict[str, Any]]:
+        """Unique page-level boxes, top to bottom."""
+        return sorted((e["box"] for e in self._entries), key=lambda b: box_rect(b)[1])
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {"detections": self.detections, "unique": len(self._entries), "duplicates_removed": self.duplicates}
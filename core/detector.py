@@ -1,10 +1,12 @@
 import os
 import threading
+import cv2
 import numpy as np
 import easyocr
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from config.settings import settings
 from core.exceptions import OCRInitializationError, OCRFailureError
+from core.inpaint_engine import merge_rects
 from core.logger import logger
 
 class TextDetector:
@@ -15,6 +17,7 @@ class TextDetector:
     _instance: Optional['TextDetector'] = None
     _lock = threading.Lock()
     _ocr: Optional[easyocr.Reader] = None
+    _threshold_noted = False
     
     def __new__(cls):
         with cls._lock:
@@ -60,17 +63,7 @@ class TextDetector:
             
             # EasyOCR returns list of (bbox, text, prob)
             results = self.ocr.readtext(image)
-            
-            boxes = []
-            for (bbox, text, prob) in results:
-                if prob >= settings.OCR_CONFIDENCE_THRESHOLD:
-                    # bbox is [[x, y], [x, y], [x, y], [x, y]]
-                    # We cast to float for consistency with previous pipeline expectations if needed
-                    boxes.append({
-                        "box": [[float(p[0]), float(p[1])] for p in bbox],
-                        "text": text,
-                        "confidence": float(prob)
-                    })
+            boxes = self._parse_results(results, settings.OCR_CONFIDENCE_THRESHOLD)
             
             logger.info(f"OCR detection complete. Found {len(boxes)} candidates.", extra={"job_id": job_id})
             return boxes
@@ -78,3 +71,206 @@ class TextDetector:
         except Exception as e:
             logger.error(f"OCR Operation Failed [Job: {job_id}]: {str(e)}")
             raise OCRFailureError(f"OCR process failed: {str(e)}")
+
+    def detect_batch(self, tiles: List[np.ndarray], job_id: str = "unknown", threshold: Optional[float] = None,
+                     recognize: bool = True, scale: Optional[float] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Detects text on several tiles with as few CRAFT forward passes as possible.
+        Tiles of equal width are padded (white, at the bottom) to a common height and
+        stacked into one batch of up to OCR_BATCH_SIZE images. Boxes are returned per
+        tile, in that tile's own coordinates.
+        recognize=False runs CRAFT only (no CRNN pass): boxes come back with text and
+        confidence set to None, and `threshold` doesn't apply - CRAFT's own text_threshold
+        already decided which regions are text, and it has no per-box score to filter on
+        (a threshold passed anyway is reported once in the log). Use recognize() later for
+        the few boxes whose text is actually needed.
+        scale < 1 (default OCR_DETECT_SCALE) detects on downscaled tiles and maps the boxes
+        back to full resolution (see _detect_scaled).
+        """
+        if not recognize and threshold is not None and not TextDetector._threshold_noted:
+            TextDetector._threshold_noted = True
+            logger.warning(f"OCR confidence threshold {threshold} has no effect in detect-only mode "
+                           "(OCR_DETECT_ONLY): every box CRAFT finds is kept", extra={"job_id": job_id})
+        if threshold is None:
+            threshold = settings.OCR_CONFIDENCE_THRESHOLD
+        scale = settings.OCR_DETECT_SCALE if scale is None else scale
+        results: List[List[Dict[str, Any]]] = [[] for _ in tiles]
+        if not tiles:
+            return results
+        if 0 < scale < 1:
+            return self._detect_scaled(tiles, job_id, threshold, recognize, scale)
+
+        try:
+            by_width: Dict[int, List[int]] = {}
+            for idx, tile in enumerate(tiles):
+                by_width.setdefault(tile.shape[1], []).append(idx)
+
+            batch_size = max(1, settings.OCR_BATCH_SIZE)
+            forward_passes = 0
+            for indices in by_width.values():
+                for i in range(0, len(indices), batch_size):
+                    chunk = indices[i:i + batch_size]
+                    if not recognize:
+                        polygons = self._detect_polygons([tiles[idx] for idx in chunk])
+                        for idx, polys in zip(chunk, polygons):
+                            results[idx] = self._parse_polygons(polys, max_y=tiles[idx].shape[0])
+                        forward_passes += 1
+                        continue
+                    if len(chunk) == 1:
+                        raw_batch = [self.ocr.readtext(tiles[chunk[0]])]
+                    else:
+                        batch_h = max(tiles[idx].shape[0] for idx in chunk)
+                        batch = [self._pad_to_height(tiles[idx], batch_h) for idx in chunk]
+                        raw_batch = self.ocr.readtext_batched(batch)
+                    forward_passes += 1
+
+                    for idx, raw in zip(chunk, raw_batch):
+                        results[idx] = self._parse_results(raw, threshold, max_y=tiles[idx].shape[0])
+
+            logger.info(f"Batched OCR detection complete. {len(tiles)} tiles in {forward_passes} passes.",
+                        extra={"job_id": job_id, "extra": {"recognize": recognize}})
+            return results
+
+        except Exception as e:
+            logger.error(f"Batched OCR Operation Failed [Job: {job_id}]: {str(e)}")
+            raise OCRFailureError(f"OCR batch process failed: {str(e)}")
+
+    def _detect_scaled(self, tiles: List[np.ndarray], job_id: str, threshold: float, recognize: bool,
+                       scale: float) -> List[List[Dict[str, Any]]]:
+        """
+        Dialogue glyphs stay well above CRAFT's minimum size on 1600-2400px wide pages, so
+        detection runs on INTER_AREA-downscaled tiles and boxes are scaled back up. With
+        OCR_DETECT_REFINE, each candidate region is detected again at full resolution
+        (only those crops), which restores tight boxes for the mask builder.
+        """
+        small = [
+            cv2.resize(t, (max(1, round(t.shape[1] * scale)), max(1, round(t.shape[0] * scale))), interpolation=cv2.INTER_AREA)
+            for t in tiles
+        ]
+        coarse = self.detect_batch(small, job_id=job_id, threshold=threshold, recognize=recognize, scale=1.0)
+
+        results = []
+        for tile, low, boxes in zip(tiles, small, coarse):
+            h, w = tile.shape[:2]
+            sx, sy = w / low.shape[1], h / low.shape[0]
+            boxes = [{**b, "box": [[min(x * sx, float(w)), min(y * sy, float(h))] for x, y in b["box"]]} for b in boxes]
+            if settings.OCR_DETECT_REFINE and boxes:
+                boxes = self._refine(tile, boxes, job_id, threshold, recognize)
+            results.append(boxes)
+        return results
+
+    def _refine(self, tile: np.ndarray, boxes: List[Dict[str, Any]], job_id: str, threshold: float,
+                recognize: bool) -> List[Dict[str, Any]]:
+        """Full-resolution detection inside the (merged, padded) candidate regions of a tile only."""
+        h, w = tile.shape[:2]
+        margin = settings.OCR_REFINE_MARGIN
+        rects = []
+        for box in boxes:
+            x1, x2, y1, y2 = self._horizontal_rect(box)
+            rects.append((max(0, x1 - margin), max(0, y1 - margin), min(w, x2 + margin), min(h, y2 + margin)))
+        regions = merge_rects(rects)
+
+        refined = []
+        for x1, y1, x2, y2 in regions:
+            found = self.detect_batch([tile[y1:y2, x1:x2]], job_id=job_id, threshold=threshold, recognize=recognize, scale=1.0)[0]
+            if found:
+                refined.extend({**b, "box": [[x + x1, y + y1] for x, y in b["box"]]} for b in found)
+            else:
+                # Nothing at full resolution: keep the coarse candidates of that region
+                refined.extend(b for b, r in zip(boxes, rects)
+                               if x1 <= r[0] and y1 <= r[1] and r[2] <= x2 and r[3] <= y2)
+        return refined
+
+    def recognize(self, image: np.ndarray, boxes: List[Dict[str, Any]], job_id: str = "unknown") -> List[Dict[str, Any]]:
+        """
+        Lazy second stage: runs the recognizer on the given boxes only (coordinates of `image`).
+        Returns copies of the boxes with text and confidence filled in; a box with no pixels
+        inside the image gets "" and 0.0.
+        """
+        if not boxes:
+            return []
+        try:
+            grey = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            h, w = grey.shape[:2]
+            recognized = []
+            for box in boxes:
+                x1, x2, y1, y2 = self._horizontal_rect(box)
+                x1, x2, y1, y2 = max(0, x1), min(w, x2), max(0, y1), min(h, y2)
+                text, prob = "", 0.0
+                # One call per box: EasyOCR reorders its output by position and drops crops it
+                # can't resize, so results of a shared call can't be matched back reliably
+                if x2 > x1 and y2 > y1:
+                    raw = self.ocr.recognize(grey, horizontal_list=[[x1, x2, y1, y2]], free_list=[])
+                    if raw:
+                        _, text, prob = raw[0]
+                recognized.append({**box, "text": text, "confidence": float(prob)})
+            logger.info(f"Recognized {len(boxes)} boxes [Job: {job_id}]", extra={"job_id": job_id})
+            return recognized
+        except Exception as e:
+            logger.error(f"OCR Recognition Failed [Job: {job_id}]: {str(e)}")
+            raise OCRFailureError(f"OCR recognition failed: {str(e)}")
+
+    def _detect_polygons(self, images: List[np.ndarray]) -> List[List[List[List[float]]]]:
+        """CRAFT-only pass over images of equal width. Returns the text polygons of each image."""
+        if len(images) == 1:
+            horizontal, free = self.ocr.detect(images[0])
+        else:
+            batch_h = max(img.shape[0] for img in images)
+            # Same input readtext_batched builds: 3-channel images of one common shape
+            batch = np.stack([
+                cv2.cvtColor(padded, cv2.COLOR_GRAY2BGR) if padded.ndim == 2 else padded
+                for padded in (self._pad_to_height(img, batch_h) for img in images)
+            ])
+            horizontal, free = self.ocr.detect(batch, reformat=False)
+        polygons = []
+        for rects, polys in zip(horizontal, free):
+            polygons.append(
+                [[[x1, y1], [x2, y1], [x2, y2], [x1, y2]] for x1, x2, y1, y2 in rects] + [list(p) for p in polys]
+            )
+        return polygons
+
+    @staticmethod
+    def _horizontal_rect(box: Dict[str, Any]) -> Tuple[int, int, int, int]:
+        """EasyOCR horizontal_list entry [x_min, x_max, y_min, y_max] of a box polygon."""
+        xs = [p[0] for p in box["box"]]
+        ys = [p[1] for p in box["box"]]
+        return int(min(xs)), int(max(xs)), int(min(ys)), int(max(ys))
+
+    @staticmethod
+    def _parse_polygons(polygons, max_y: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Detection-only boxes: same format as _parse_results, without text or score."""
+        boxes = []
+        for poly in polygons:
+            pts = [[float(p[0]), float(p[1])] for p in poly]
+            if max_y is not None:
+                pts = [[x, min(y, float(max_y))] for x, y in pts]
+            boxes.append({"box": pts, "text": None, "confidence": None})
+        return boxes
+
+    @staticmethod
+    def _pad_to_height(tile: np.ndarray, height: int) -> np.ndarray:
+        """Pads a tile with white rows so every image of a batch has the same shape."""
+        missing = height - tile.shape[0]
+        if missing <= 0:
+            return tile
+        pad = [(0, missing), (0, 0)] + [(0, 0)] * (tile.ndim - 2)
+        return np.pad(tile, pad, mode="constant", constant_values=255)
+
+    @staticmethod
+    def _parse_results(results, threshold: float, max_y: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Converts raw EasyOCR (bbox, text, prob) tuples into the pipeline box format."""
+        boxes = []
+        for (bbox, text, prob) in results:
+            if prob < threshold:
+                continue
+            # bbox is [[x, y], [x, y], [x, y], [x, y]]
+            pts = [[float(p[0]), float(p[1])] for p in bbox]
+            if max_y is not None:
+                # Boxes of a padded batch member can never leave the real tile
+                pts = [[x, min(y, float(max_y))] for x, y in pts]
+            boxes.append({
+                "box": pts,
+                "text": text,
+                "confidence": float(prob)
+            })
+        return boxes
@@ -44,3 +44,8 @@ class MaskAlignmentError(MangaCleanerError):
     """Raised when mask and image dimensions or formats mismatch."""
     def __init__(self, message: str):
         super().__init__(message, error_code="MASK_ALIGNMENT_ERROR")
+
+class QueueFullError(MangaCleanerError):
+    """Raised when the job queue cannot accept more work (backpressure)."""
+    def __init__(self, message: str):
+        super().__init__(message, error_code="QUEUE_FULL")
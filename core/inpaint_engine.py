@@ -1,5 +1,28 @@
 import cv2
 import numpy as np
+from typing import List, Tuple
+from config.settings import settings
+from core.profiler import stage
+
+Rect = Tuple[int, int, int, int]
+
+def merge_rects(rects: List[Rect]) -> List[Rect]:
+    """Merges (x1, y1, x2, y2) rects that overlap into their union, until no two clusters overlap."""
+    clusters = [tuple(r) for r in rects]
+    merged = True
+    while merged:
+        merged = False
+        out: List[Rect] = []
+        for r in clusters:
+            for i, c in enumerate(out):
+                if r[0] < c[2] and c[0] < r[2] and r[1] < c[3] and c[1] < r[3]:
+                    out[i] = (min(r[0], c[0]), min(r[1], c[1]), max(r[2], c[2]), max(r[3], c[3]))
+                    merged = True
+                    break
+            else:
+                out.append(r)
+        clusters = out
+    return clusters
 
 class InpaintEngine:
     """Core engine for inpainting text/balloons."""
@@ -17,3 +40,31 @@ class InpaintEngine:
     def process(self, image: np.ndarray, mask: np.ndarray) -> np.ndarray:
         """Standard inpainting process."""
         return self.inpaint_native_ns(image, mask)
+
+    def process_regions(self, image: np.ndarray, mask: np.ndarray, rects: List[Rect]) -> Tuple[np.ndarray, int]:
+        """
+        Tile-level inpainting: one call per cluster of overlapping rects instead of one per box.
+        An isolated rect gets exactly the crop/mask of the per-box path, so its output is identical.
+        With INPAINT_DENSE_ENABLED, dense tiles (many clusters or a large masked share) are inpainted
+        in a single call instead. That output differs from the per-box path inside the (dilated)
+        masks: Telea sees the pixels around each crop there. Pixels outside the masks are untouched.
+        Returns (result, number of inpaint calls).
+        """
+        result = image.copy()
+        if not rects:
+            return result, 0
+
+        clusters = merge_rects(rects)
+        h, w = image.shape[:2]
+        covered = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in clusters)
+        dense = len(clusters) > settings.INPAINT_DENSE_CLUSTERS or covered > h * w * settings.INPAINT_DENSE_COVERAGE
+        if settings.INPAINT_DENSE_ENABLED and dense:
+            region_mask = np.zeros_like(mask)
+            for x1, y1, x2, y2 in clusters:
+                region_mask[y1:y2, x1:x2] = mask[y1:y2, x1:x2]
+            return self.process(result, region_mask), 1
+
+        for i, (x1, y1, x2, y2) in enumerate(clusters):
+            with stage("inpaint_cluster", cluster=i, px=(x2 - x1) * (y2 - y1)):
+                result[y1:y2, x1:x2] = self.process(result[y1:y2, x1:x2].copy(), mask[y1:y2, x1:x2])
+        return result, len(clusters)
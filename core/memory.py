@@ -4,30 +4,40 @@ from typing import Tuple
 from config.settings import settings
 from core.exceptions import MemoryLimitExceededError
 from core.logger import logger
+from core.tile_executor import resolve_tile_workers
 
 def get_real_available_ram() -> int:
     """Returns real available RAM in bytes using psutil."""
     return psutil.virtual_memory().available
 
-def calculate_estimated_usage(shape: Tuple[int, ...]) -> int:
+def calculate_estimated_usage(shape: Tuple[int, ...], streaming: bool = False) -> int:
     """
     Official Disciplined Formula: (W * H * 3 channels * 3 buffers) * 1.25 margin.
+    Streaming (memmap strip storage): the strip lives on disk, so RAM holds only the one-off
+    decode buffer, or the tiles in flight (tile + cleaned copy per tile) if that is larger.
     """
     if len(shape) < 2:
         return 0
     h, w = shape[:2]
+    if streaming:
+        tile_h = min(h, settings.TILE_HEIGHT)
+        stride = max(1, tile_h - settings.TILE_OVERLAP)
+        in_flight = resolve_tile_workers() * 2 * max(1, settings.OCR_BATCH_SIZE)
+        tiles = min(in_flight, -(-h // stride))
+        base_size = max(h * w * 3, tiles * tile_h * w * 3 * 2)
+        return int(base_size * settings.SAFETY_MARGIN)
     # Assuming 3 channels (RGB) and 3 buffers (Original, Mask, Result)
     # Each pixel in uint8 is 1 byte
     base_size = h * w * 3 * 3
     estimated = int(base_size * settings.SAFETY_MARGIN)
     return estimated
 
-def validate_memory_safety(image_shape: Tuple[int, ...], job_id: str = "foundation"):
+def validate_memory_safety(image_shape: Tuple[int, ...], job_id: str = "foundation", streaming: bool = False):
     """
     Checks if job can proceed. Blocks and raises error if unsafe.
     """
     available_ram = get_real_available_ram()
-    estimated_usage = calculate_estimated_usage(image_shape)
+    estimated_usage = calculate_estimated_usage(image_shape, streaming=streaming)
     
     # Threshold based on available RAM and max percentage setting
     threshold = int(available_ram * (settings.MAX_RAM_PERCENTAGE / 100.0))
@@ -42,7 +52,8 @@ def validate_memory_safety(image_shape: Tuple[int, ...], job_id: str = "foundati
             "ram_available_mb": round(available_ram / 1024**2, 2),
             "estimated_usage_mb": round(estimated_usage / 1024**2, 2),
             "threshold_mb": round(threshold / 1024**2, 2),
-            "resolution": f"{w}x{h}"
+            "resolution": f"{w}x{h}",
+            "streaming": streaming
         }
     }
     
@@ -2,24 +2,41 @@
 
 import cv2
 import numpy as np
-import gc
 import os
+import threading
+import time
 from pathlib import Path
-from typing import List, Dict
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from core.detector import TextDetector
 from core.mask_builder import MaskBuilder
 from core.inpaint_engine import InpaintEngine
+from core.tile_scheduler import TileScheduler
+from core.detection_index import DetectionIndex
+from core.profiler import profiling, stage
+from core.result_cache import ResultCache
+from core.balloon_analyzer import BalloonAnalyzer
+from core.prefilter import find_text_bands, pack_bands, unpack_boxes
+from core.strip_storage import StripStore, probe_shape, use_mmap
+from core.memory import validate_memory_safety
+from core.exceptions import InvalidImageError
 from core.logger import logger
+from config.settings import settings
 
 DEBUG_MODE = True
 DEBUG_DIR = "debug"
+PIPELINE_VERSION = "V21.2"
+
+# Receives progress events such as {"type": "tile", "tile": 3, "tiles": 12}
+ProgressCallback = Callable[[Dict[str, Any]], None]
 
 class MangaCleanerPipeline:
     def __init__(self):
         self.detector = TextDetector()
         self.mask_builder = MaskBuilder()
         self.inpaint_engine = InpaintEngine()
+        self.balloon_analyzer = BalloonAnalyzer()
+        self.result_cache = ResultCache() if settings.RESULT_CACHE_ENABLED else None
         if DEBUG_MODE: Path(DEBUG_DIR).mkdir(exist_ok=True)
 
     def _preprocess_for_ocr(self, tile: np.ndarray) -> np.ndarray:
@@ -47,108 +64,266 @@ class MangaCleanerPipeline:
             mask = cv2.dilate(mask, k_connect)
         return mask
 
-    def process_webtoon_streaming(self, image: np.ndarray, job_id: str, threshold: float = 0.05) -> np.ndarray:
+    def process_webtoon_streaming(self, image: np.ndarray, job_id: str, threshold: float = 0.05,
+                                  progress: Optional[ProgressCallback] = None) -> np.ndarray:
         """Architecture V21.0: Balloon-Aware Local Cleaner."""
-        res, count = self._process_core(image, job_id, threshold)
+        res, count, _ = self.clean_page(image, job_id, threshold, progress=progress)
+        return res
+
+    def clean_image(self, image: np.ndarray, job_id: str = "unknown", threshold: float = 0.05) -> np.ndarray:
+        """
+        In-memory entry point (API/scripts): validates the array, audits memory, and returns the cleaned image.
+        Grayscale input is promoted to BGR.
+        """
+        if not isinstance(image, np.ndarray):
+            raise InvalidImageError(f"Expected a numpy image, got {type(image).__name__}")
+        validate_memory_safety(image.shape, job_id)
+        if image.dtype != np.uint8 or image.ndim not in (2, 3):
+            raise InvalidImageError(f"Unsupported image: dtype {image.dtype}, shape {image.shape}")
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        res, _, _ = self.clean_page(image, job_id, threshold)
         return res
 
     def _process_core(self, image: np.ndarray, job_id: str, threshold: float = 0.05):
         """Architecture V21.0: Balloon-Aware Local Cleaner CORE."""
+        res, count, _ = self.clean_page(image, job_id, threshold)
+        return res, count
+
+    def _cache_params(self, threshold: float, tile_height: int) -> Dict:
+        """
+        Everything besides the page bytes that changes the cleaned output. `tile_height` is the
+        planned one: with TILE_DYNAMIC_HEIGHT it depends on free RAM, not only on TILE_HEIGHT.
+        """
+        return {
+            "version": PIPELINE_VERSION,
+            # Detect-only boxes carry no score: the threshold can't change the output
+            "threshold": None if settings.OCR_DETECT_ONLY else float(threshold),
+            "tile_h": tile_height,
+            "overlap": settings.TILE_OVERLAP,
+            "smart_cuts": [settings.TILE_SMART_CUTS, settings.TILE_CUT_SEARCH, settings.TILE_CUT_MIN_FLAT],
+            "dedup": [settings.DETECTION_DEDUP_IOU, settings.DETECTION_DEDUP_CONTAINMENT],
+            # The language picks the reader; the batch size sets the padding shared by a batch
+            "ocr": [settings.OCR_LANG, settings.OCR_BATCH_SIZE],
+            "detect_only": settings.OCR_DETECT_ONLY,
+            "detect_scale": [settings.OCR_DETECT_SCALE, settings.OCR_DETECT_REFINE, settings.OCR_REFINE_MARGIN],
+            "inpaint_engine": type(self.inpaint_engine).__name__,
+            "prefilter": [settings.PREFILTER_ENABLED, settings.PREFILTER_ROW_TOLERANCE,
+                          settings.PREFILTER_MARGIN, settings.PREFILTER_MIN_GAP],
+            "inpaint_tile_mode": settings.INPAINT_TILE_MODE,
+            "inpaint_dense": [settings.INPAINT_DENSE_ENABLED, settings.INPAINT_DENSE_CLUSTERS, settings.INPAINT_DENSE_COVERAGE],
+        }
+
+    def clean_file(self, in_path: str, out_path: str, job_id: str, threshold: float = 0.05,
+                   progress: Optional[ProgressCallback] = None, before_path: Optional[str] = None) -> int:
+        """
+        File-to-file cleaning. Strips above STRIP_MMAP_MIN_PIXELS are decoded into a disk-backed
+        StripStore and cleaned into another one, so they never sit fully in RAM more than once.
+        Returns the cleaned balloon count; raises InvalidImageError for unreadable files.
+        """
+        with profiling(job_id):
+            shape = probe_shape(in_path)
+            if shape is not None:
+                validate_memory_safety(shape, job_id, streaming=use_mmap(shape))
+
+            if shape is None or not use_mmap(shape):
+                with stage("decode"):
+                    image = cv2.imread(in_path, cv2.IMREAD_COLOR)
+                if image is None:
+                    raise InvalidImageError(f"Could not decode image: {in_path}")
+                if shape is None:
+                    validate_memory_safety(image.shape, job_id)
+                result, count, _ = self.clean_page(image, job_id, threshold, progress=progress)
+                with stage("encode"):
+                    if before_path:
+                        cv2.imwrite(before_path, image)
+                    cv2.imwrite(out_path, result)
+                return count
+
+            with stage("decode"):
+                src = StripStore.from_file(in_path)
+            dst = StripStore.create(src.shape)
+            try:
+                _, count, _ = self.clean_page(src.array, job_id, threshold, progress=progress, out=dst.array)
+                with stage("encode"):
+                    if before_path:
+                        cv2.imwrite(before_path, src.array)
+                    cv2.imwrite(out_path, dst.array)
+            finally:
+                src.close()
+                dst.close()
+            return count
+
+    def clean_page(self, image: np.ndarray, job_id: str, threshold: float = 0.05,
+                   progress: Optional[ProgressCallback] = None, out: Optional[np.ndarray] = None) -> Tuple[np.ndarray, int, List[Dict]]:
+        """
+        Cleans a full page/strip. Returns (cleaned image, cleaned balloon count, detected boxes in page coordinates).
+        Re-uploaded pages are served from the persistent result cache without running OCR or inpainting.
+        `progress`, if given, receives one {"type": "tile", ...} event per finished tile.
+        `out`, if given (e.g. a StripStore memmap), receives the cleaned pixels and is returned.
+        Stages are timed when profiling is on (PROFILE_ENABLED or an enclosing core.profiler.profiling()).
+        """
+        with profiling(job_id):
+            return self._clean_page(image, job_id, threshold, progress, out)
+
+    def _clean_page(self, image: np.ndarray, job_id: str, threshold: float,
+                    progress: Optional[ProgressCallback], out: Optional[np.ndarray]) -> Tuple[np.ndarray, int, List[Dict]]:
         raw_full = np.ascontiguousarray(image, dtype=np.uint8)
-        h, w = raw_full.shape[:2]
-        pad_h = 150
-        img_padded = cv2.copyMakeBorder(raw_full, 0, pad_h, 0, 0, cv2.BORDER_CONSTANT, value=[255, 255, 255])
-        
-        tile_h = 2048
-        overlap = 120
-        stride = tile_h - overlap
-        result_padded = np.zeros(img_padded.shape, dtype=np.uint8)
-        
-        logger.info(f"V21.0 BALLOON-AWARE MISSION [Job: {job_id}] | Threshold {threshold}")
-
-        cleaned_total_count = 0
-        y_start = 0
-        padded_h = img_padded.shape[0]
-        while y_start < padded_h:
-            y_end = min(y_start + tile_h, padded_h)
-            tile = np.array(img_padded[y_start:y_end, 0:w], copy=True, order='C')
-            
-            ocr_ready = self._preprocess_for_ocr(tile)
-            results = self.detector.ocr.readtext(ocr_ready)
-            
-            boxes = [{"box": [[float(p_val[0]), float(p_val[1])] for p_val in b]} for (b, t, p) in results if p >= threshold]
-            
-            cleaned_tile = tile.copy()
-            if boxes:
-                logger.info(f"Page Mission [Job: {job_id}]: Found {len(boxes)} text candidates in tile.")
-                for box_item in boxes:
-                    pts = np.array(box_item["box"], dtype=np.int32)
-                    rx, ry, bw, bh = cv2.boundingRect(pts)
-                    rx, ry = max(0, rx), max(0, ry)
-                    
-                    if (bw * bh) > (tile.shape[0] * tile.shape[1] * 0.15): 
+        # Planned once: the cache key and the run must agree on the (RAM-dependent) tile height
+        scheduler = self._tile_scheduler()
+        tile_height, bounds = scheduler.plan(raw_full.shape[0], raw_full.shape[1], StripStore(raw_full))
+        cache_key = None
+        if self.result_cache is not None:
+            cache_key = self.result_cache.make_key(raw_full, self._cache_params(threshold, tile_height))
+            hit = self.result_cache.get(cache_key)
+            if hit is not None:
+                cached, meta = hit
+                logger.info(f"Result cache HIT [Job: {job_id}]", extra={"job_id": job_id, "extra": {"cache_key": cache_key}})
+                if progress is not None:
+                    progress({"type": "tile", "tile": 1, "tiles": 1, "cached": True})
+                if out is not None:
+                    out[:] = cached
+                    cached = out
+                return cached, int(meta["cleaned_count"]), meta["boxes"]
+
+        result, count, boxes = self._run_tiles(scheduler, bounds, raw_full, job_id, threshold, progress, out)
+
+        if cache_key is not None:
+            try:
+                self.result_cache.put(cache_key, result, {"cleaned_count": count, "boxes": boxes})
+            except OSError as e:
+                logger.warning(f"Result cache write failed [Job: {job_id}]: {str(e)}")
+        return result, count, boxes
+
+    def _tile_scheduler(self) -> TileScheduler:
+        # Work unit = a batch of consecutive tiles sharing one batched OCR pass; 150 white rows
+        # below the strip give balloons at the very bottom a full tile of context.
+        return TileScheduler(batched=True, batch_size=settings.OCR_BATCH_SIZE, pad_bottom=150)
+
+    def _detect_tiles(self, scheduler: TileScheduler, raw_full: np.ndarray, bounds: List[Tuple[int, int]],
+                      job_id: str, threshold: float) -> DetectionIndex:
+        """Detection pass over every tile; boxes land in a page-level index that removes overlap duplicates."""
+        w = raw_full.shape[1]
+        prefilter_stats = {"tiles": 0, "skipped_tiles": 0, "skipped_pixels": 0, "total_pixels": 0}
+        stats_lock = threading.Lock()
+
+        def detect_batch(tiles, batch_ranges):
+            tile_boxes = [[] for _ in tiles]
+            packed, ocr_inputs = [], []
+            skipped_tiles = skipped_rows = 0
+            for idx, (tile, tile_bounds) in enumerate(zip(tiles, batch_ranges)):
+                with stage("preprocess", tile=tile_of[tile_bounds]):
+                    if not settings.PREFILTER_ENABLED:
+                        packed.append((idx, [(0, tile.shape[0])], [0]))
+                        ocr_inputs.append(self._preprocess_for_ocr(tile))
+                        continue
+                    # Blank-tile fast path: flat rows (gutters, solid panels) never reach OCR
+                    bands = find_text_bands(tile)
+                    skipped_rows += tile.shape[0] - sum(y1 - y0 for y0, y1 in bands)
+                    if not bands:
+                        skipped_tiles += 1
                         continue
-                    
-                    bg_pad = 12
-                    bg_x1 = max(0, rx - bg_pad)
-                    bg_y1 = max(0, ry - bg_pad)
-                    bg_x2 = min(w, rx + bw + bg_pad)
-                    bg_y2 = min(tile.shape[0], ry + bh + bg_pad)
-                    
-                    roi_bg = cleaned_tile[bg_y1:bg_y2, bg_x1:bg_x2]
-                    if roi_bg.size == 0: continue
-                    
-                    top = roi_bg[0, :]
-                    bottom = roi_bg[-1, :]
-                    left = roi_bg[:, 0]
-                    right = roi_bg[:, -1]
-                    borders = np.concatenate([top, bottom, left, right], axis=0).astype(np.int32)
-                    
-                    if len(borders) == 0: continue
-                    
-                    median_c = np.median(borders, axis=0).astype(np.int32)
-                    diffs = np.sum(np.abs(borders - median_c), axis=-1)
-                    uniform_ratio = np.mean(diffs < 60)
-                    
-                    if uniform_ratio > 0.65:
-                        cleaned_total_count += 1
-                        pad = 5
-                        x1 = max(0, rx - pad)
-                        y1 = max(0, ry - pad)
-                        x2 = min(w, rx + bw + pad)
-                        y2 = min(tile.shape[0], ry + bh + pad)
-                        
+                    compact, offsets = pack_bands(tile, bands)
+                    packed.append((idx, bands, offsets))
+                    ocr_inputs.append(self._preprocess_for_ocr(compact))
+
+            if ocr_inputs:
+                with stage("ocr", tile=tile_of[batch_ranges[0]], batch=len(ocr_inputs)):
+                    detected = self.detector.detect_batch(ocr_inputs, job_id=job_id, threshold=threshold,
+                                                          recognize=not settings.OCR_DETECT_ONLY)
+                for (idx, bands, offsets), boxes in zip(packed, detected):
+                    tile_boxes[idx] = unpack_boxes(boxes, bands, offsets)
+            del ocr_inputs
+
+            with stats_lock:
+                prefilter_stats["tiles"] += len(tiles)
+                prefilter_stats["skipped_tiles"] += skipped_tiles
+                prefilter_stats["skipped_pixels"] += skipped_rows * w
+                prefilter_stats["total_pixels"] += sum(tile.shape[0] for tile in tiles) * w
+
+            return [self._to_page_coords(boxes, t_start) for boxes, (t_start, _) in zip(tile_boxes, batch_ranges)]
+
+        tile_of = {b: idx for idx, b in enumerate(bounds)}
+        index = DetectionIndex(bounds)
+        for tile_idx, boxes in enumerate(scheduler.map(raw_full, detect_batch, bounds)):
+            index.add(tile_idx, boxes)
+
+        if settings.PREFILTER_ENABLED:
+            skipped_ratio = prefilter_stats["skipped_pixels"] / max(1, prefilter_stats["total_pixels"])
+            logger.info(
+                f"Prefilter [Job: {job_id}]: skipped {prefilter_stats['skipped_tiles']}/{prefilter_stats['tiles']} tiles, "
+                f"{skipped_ratio:.1%} of tile pixels",
+                extra={"job_id": job_id, "extra": {"prefilter": {**prefilter_stats, "skipped_ratio": round(skipped_ratio, 4)}}}
+            )
+        logger.info(f"Detection index [Job: {job_id}]: {index.stats['duplicates_removed']} overlap duplicates removed",
+                    extra={"job_id": job_id, "extra": {"detections": index.stats}})
+        return index
+
+    def detect_page(self, image: np.ndarray, job_id: str = "detect", threshold: float = 0.05) -> Tuple[List[Dict], Dict[str, int]]:
+        """Tiled detection of a full page/strip. Returns (unique boxes in page coordinates, index stats)."""
+        raw_full = np.ascontiguousarray(image, dtype=np.uint8)
+        scheduler = self._tile_scheduler()
+        _, bounds = scheduler.plan(raw_full.shape[0], raw_full.shape[1], StripStore(raw_full))
+        index = self._detect_tiles(scheduler, raw_full, bounds, job_id, threshold)
+        return index.boxes, index.stats
+
+    def _run_tiles(self, scheduler: TileScheduler, bounds: List[Tuple[int, int]], raw_full: np.ndarray, job_id: str,
+                   threshold: float, progress: Optional[ProgressCallback] = None, out: Optional[np.ndarray] = None):
+        logger.info(f"V21.0 BALLOON-AWARE MISSION [Job: {job_id}] | Threshold {threshold} | Tile workers {scheduler.workers}")
+        index = self._detect_tiles(scheduler, raw_full, bounds, job_id, threshold)
+        tile_of = {b: idx for idx, b in enumerate(bounds)}
+
+        # Cleaning pass: every balloon is cleaned once, by the tile that owns it. Its cleaned rects
+        # are authoritative in the overlap, so the neighbour's uncleaned copy is not blended back in.
+        def clean_batch(tiles, batch_ranges):
+            outputs = []
+            for tile, (t_start, t_end) in zip(tiles, batch_ranges):
+                tile_idx = tile_of[(t_start, t_end)]
+                owned = index.owned_by(tile_idx)
+                with stage("clean_tile", tile=tile_idx):
+                    cleaned, count, rects = self._clean_tile(tile, self._to_page_coords(owned, -t_start), job_id)
+                outputs.append((cleaned, count, owned, rects))
+            return outputs
+
+        scheduler.processor = clean_batch
+        return scheduler.run(raw_full, job_id, out=out, progress=progress, bounds=bounds)
+
+    @staticmethod
+    def _to_page_coords(boxes: List[Dict], y_offset: int) -> List[Dict]:
+        return [
+            {**box, "box": [[p[0], p[1] + y_offset] for p in box["box"]]}
+            for box in boxes
+        ]
+
+    def _clean_tile(self, tile: np.ndarray, boxes: List[Dict], job_id: str):
+        """
+        Cleans the detected balloons of a single tile. Safe to run in parallel (no shared state).
+        Returns (cleaned tile, cleaned count, cleaned rects in tile coordinates).
+        """
+        cleaned_count = 0
+        cleaned_tile = tile.copy()
+        rects = []
+        if boxes:
+            logger.info(f"Page Mission [Job: {job_id}]: Found {len(boxes)} text candidates in tile.")
+            with stage("classify", boxes=len(boxes)):
+                tile_mask, decisions = self.balloon_analyzer.analyze(tile, boxes)
+            rects = [d["rect"] for d in decisions if d["accepted"]]
+            cleaned_count = len(rects)
+
+            t_inpaint = time.perf_counter()
+            with stage("inpaint", balloons=cleaned_count):
+                if settings.INPAINT_TILE_MODE:
+                    cleaned_tile, inpaint_calls = self.inpaint_engine.process_regions(cleaned_tile, tile_mask, rects)
+                else:
+                    for x1, y1, x2, y2 in rects:
                         tight_roi = cleaned_tile[y1:y2, x1:x2].copy()
-                        bg_luminance = int(median_c[0]) + int(median_c[1]) + int(median_c[2])
-                        roi_luminance = np.sum(tight_roi.astype(np.int32), axis=-1)
-                        
-                        if bg_luminance > 380: # Light Balloon
-                            mask = (roi_luminance < bg_luminance - 40).astype(np.uint8) * 255
-                        else: # Dark Balloon
-                            mask = (roi_luminance > bg_luminance + 40).astype(np.uint8) * 255
-                            
-                        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
-                        mask = cv2.dilate(mask, kernel, iterations=1)
-                        
-                        local_cleaned = self.inpaint_engine.process(tight_roi, mask)
-                        cleaned_tile[y1:y2, x1:x2] = local_cleaned
-            
-            if y_start == 0:
-                result_padded[y_start:y_end, 0:w] = cleaned_tile
-            else:
-                act = min(overlap, y_end - y_start)
-                alpha = np.linspace(0, 1, act).reshape(-1, 1, 1).astype(np.float32)
-                base = result_padded[y_start : y_start+act, 0:w].astype(np.float32)
-                new = cleaned_tile[0:act, 0:w].astype(np.float32)
-                blend = (base * (1-alpha) + new * alpha).astype(np.uint8)
-                result_padded[y_start : y_start+act, 0:w] = blend
-                if y_start + act < y_end:
-                    result_padded[y_start+act : y_end, 0:w] = cleaned_tile[act:, 0:w]
-            
-            if y_end >= padded_h: break
-            y_start += stride
-            del tile, ocr_ready, cleaned_tile
-            gc.collect()
+                        cleaned_tile[y1:y2, x1:x2] = self.inpaint_engine.process(tight_roi, tile_mask[y1:y2, x1:x2])
+                    inpaint_calls = len(rects)
+            inpaint_ms = (time.perf_counter() - t_inpaint) * 1000
+
+            logger.info(f"Tile inpaint [Job: {job_id}]: {cleaned_count} balloons in {inpaint_calls} calls, {inpaint_ms:.1f}ms", extra={
+                "job_id": job_id,
+                "extra": {"balloons": cleaned_count, "inpaint_calls": inpaint_calls, "inpaint_ms": round(inpaint_ms, 2)}
+            })
 
-        final = result_padded[0:h, 0:w]
-        return np.ascontiguousarray(final, dtype=np.uint8), cleaned_total_count
+        return cleaned_tile, cleaned_count, rects
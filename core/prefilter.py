@@ -0,0 +1,78 @@
+# core/prefilter.py
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import settings
+from core.tile_strategy import row_profile
+
+# White rows inserted between packed bands so CRAFT never links text across two bands
+BAND_SEPARATOR = 16
+
+
+def find_text_bands(tile: np.ndarray, tolerance: Optional[int] = None, margin: Optional[int] = None,
+                    min_gap: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Returns the horizontal bands [y0, y1) of a tile that may contain text.
+    A row whose pixel range (max - min over the row, any channel) is within `tolerance`
+    is flat: gutters, solid panels and vertical gradients can't hold a glyph.
+    Fully vectorized: two reductions over the tile, no Python per row.
+    """
+    tolerance = settings.PREFILTER_ROW_TOLERANCE if tolerance is None else tolerance
+    margin = settings.PREFILTER_MARGIN if margin is None else margin
+    min_gap = settings.PREFILTER_MIN_GAP if min_gap is None else min_gap
+
+    h = tile.shape[0]
+    active = row_profile(tile) > tolerance
+    if not active.any():
+        return []
+
+    # Grow active rows by the margin (anti-aliasing + OCR context) with a cumulative-sum window
+    csum = np.concatenate(([0], np.cumsum(active, dtype=np.int32)))
+    lo = np.clip(np.arange(h) - margin, 0, h)
+    hi = np.clip(np.arange(h) + margin + 1, 0, h)
+    grown = (csum[hi] - csum[lo]) > 0
+
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], grown.astype(np.int8), [0]))))
+    bands = list(zip(edges[0::2].tolist(), edges[1::2].tolist()))
+
+    # Close small gaps: fragmenting a panel into slivers costs more than it saves
+    merged = [bands[0]]
+    for y0, y1 in bands[1:]:
+        if y0 - merged[-1][1] < min_gap:
+            merged[-1] = (merged[-1][0], y1)
+        else:
+            merged.append((y0, y1))
+    return merged
+
+
+def pack_bands(tile: np.ndarray, bands: List[Tuple[int, int]]) -> Tuple[np.ndarray, List[int]]:
+    """Stacks the bands of a tile into one compact image. Returns it with each band's y-offset inside it."""
+    if len(bands) == 1 and bands[0] == (0, tile.shape[0]):
+        return tile, [0]
+
+    parts, offsets, y = [], [], 0
+    separator = np.full((BAND_SEPARATOR,) + tile.shape[1:], 255, dtype=tile.dtype)
+    for i, (y0, y1) in enumerate(bands):
+        if i:
+            parts.append(separator)
+            y += BAND_SEPARATOR
+        offsets.append(y)
+        parts.append(tile[y0:y1])
+        y += y1 - y0
+    return np.concatenate(parts, axis=0), offsets
+
+
+def unpack_boxes(boxes: List[Dict], bands: List[Tuple[int, int]], offsets: List[int]) -> List[Dict]:
+    """Maps boxes detected on a packed image back to the coordinates of the original tile."""
+    starts = np.array(offsets)
+    unpacked = []
+    for box in boxes:
+        pts = []
+        for x, y in box["box"]:
+            idx = max(0, int(np.searchsorted(starts, y, side="right")) - 1)
+            y0, y1 = bands[idx]
+            pts.append([x, float(min(max(y - offsets[idx], 0), y1 - y0) + y0)])
+        unpacked.append({**box, "box": pts})
+    return unpacked
@@ -0,0 +1,152 @@
+# core/preview.py
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+from config.settings import settings
+from core.exceptions import InvalidImageError
+from core.logger import logger
+
+FULL = "full"
+# libwebp refuses images with a side above this
+WEBP_MAX_SIDE = 16383
+
+
+def preview_levels() -> List[str]:
+    """Level names, smallest first: the PREVIEW_WIDTHS and then "full"."""
+    return [str(w) for w in sorted(settings.PREVIEW_WIDTHS)] + [FULL]
+
+
+def preview_path(folder: str, name: str, level: str) -> str:
+    return os.path.join(folder, f"{name}.{level}.webp")
+
+
+def build_pyramid(image: np.ndarray, widths: Sequence[int], full: bool = True) -> Dict[str, np.ndarray]:
+    """
+    Downscaled copies of `image` keyed by level. Each level is area-resized from the next
+    larger one, so the full page is read once. Every level fits WebP's side limit; levels
+    that would not be smaller than the page are left out (readers fall back to the next
+    larger level), and so is "full" when the page itself is too tall for WebP.
+    """
+    h, w = image.shape[:2]
+    fit = min(1.0, WEBP_MAX_SIDE / max(h, w))
+    levels: Dict[str, np.ndarray] = {}
+    if full and fit == 1.0:
+        levels[FULL] = image
+
+    source = image
+    for width in sorted(widths, reverse=True):
+        scale = min(width / w, fit)
+        if scale >= 1.0:
+            continue
+        size = (max(1, round(w * scale)), max(1, round(h * scale)))
+        if size != (source.shape[1], source.shape[0]):
+            source = cv2.resize(source, size, interpolation=cv2.INTER_AREA)
+        levels[str(width)] = source
+    return levels
+
+
+def write_previews(src_path: str, folder: str, name: str, widths: Optional[Sequence[int]] = None,
+                   full: bool = True, quality: Optional[int] = None) -> Dict[str, str]:
+    """Writes the pyramid of `src_path` as <folder>/<name>.<level>.webp; returns {level: path}."""
+    widths = settings.PREVIEW_WIDTHS if widths is None else widths
+    params = [cv2.IMWRITE_WEBP_QUALITY, settings.PREVIEW_QUALITY if quality is None else quality]
+    os.makedirs(folder, exist_ok=True)
+    while True:
+        mtime = os.stat(src_path).st_mtime_ns
+        image = cv2.imread(src_path, cv2.IMREAD_COLOR)
+        if image is None:
+            raise InvalidImageError(f"Could not decode image: {src_path}")
+        written = {}
+        for level, img in build_pyramid(image, widths, full).items():
+            ok, buf = cv2.imencode(".webp", img, params)
+            if not ok:
+                raise InvalidImageError(f"WebP encoding failed: {src_path} ({level})")
+            path = preview_path(folder, name, level)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(buf.tobytes())
+            os.replace(tmp, path)
+            written[level] = path
+        # The page was overwritten while we read it (e.g. an editor save): build again
+        if os.stat(src_path).st_mtime_ns == mtime:
+            return written
+
+
+def resolve_preview(src_path: str, folder: str, name: str, level: str) -> Optional[str]:
+    """Smallest up-to-date preview at least as large as `level`, or None."""
+    levels = preview_levels()
+    src_mtime = os.stat(src_path).st_mtime_ns
+    for candidate in levels[levels.index(level):]:
+        path = preview_path(folder, name, candidate)
+        try:
+            if os.stat(path).st_mtime_ns >= src_mtime:
+                return path
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def has_previews(src_path: str, folder: str, name: str) -> bool:
+    # Every pyramid has at least one level (a page too big for "full" gets all the widths)
+    return resolve_preview(src_path, folder, name, preview_levels()[0]) is not None
+
+
+class PreviewGenerator:
+    """
+    Builds preview pyramids on background threads, at most one job per page at a time.
+    `full=False` keeps only the downscaled levels (project thumbnails).
+    """
+
+    def __init__(self, workers: Optional[int] = None, full: bool = True):
+        self.full = full
+        self._executor = ThreadPoolExecutor(max_workers=workers or settings.PREVIEW_WORKERS, thread_name_prefix="preview")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Future] = {}
+
+    def submit(self, src_path: str, folder: str, name: str) -> Future:
+        key = os.path.join(folder, name)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                job = self._executor.submit(self._run, key, src_path, folder, name)
+                self._jobs[key] = job
+            return job
+
+    def _run(self, key: str, src_path: str, folder: str, name: str) -> Dict[str, str]:
+        try:
+            return write_previews(src_path, folder, name, full=self.full)
+        except Exception as e:
+            logger.warning(f"Preview generation failed for {src_path}: {str(e)}")
+            raise
+        finally:
+            with self._lock:
+                self._jobs.pop(key, None)
+
+    def ensure(self, src_path: str, folder: str, name: str, level: str) -> Optional[str]:
+        """
+        Path of the preview to serve for `level`, building the pyramid first when it is missing
+        or older than the page. None means the page itself is the best match (or it failed).
+        """
+        path = resolve_preview(src_path, folder, name, level)
+        if path is None and not has_previews(src_path, folder, name):
+            try:
+                self.submit(src_path, folder, name).result()
+            except Exception:
+                return None
+            path = resolve_preview(src_path, folder, name, level)
+        return path
+
+    def join(self):
+        """Waits for every queued pyramid."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        wait(jobs)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,132 @@
+# core/profiler.py
+
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from config.settings import settings
+from core.logger import logger
+
+# The active profile of the current job. Tile threads inherit it (TileExecutor and
+# asyncio.to_thread copy the context), so no signature has to carry it around.
+_current: ContextVar[Optional["JobProfile"]] = ContextVar("job_profile", default=None)
+# Tags of the enclosing stage (e.g. tile=3), inherited by nested stages
+_tags: ContextVar[Dict[str, Any]] = ContextVar("job_profile_tags", default={})
+_NULL = nullcontext()
+
+
+class JobProfile:
+    """
+    Wall time (and, with memory=True, tracemalloc peak) of every pipeline stage of one job.
+    Stages nest: a stage opened inside stage("clean_tile", tile=3) is recorded with tile=3.
+    Peaks come from one process-wide tracer: with parallel tiles (TILE_WORKERS > 1) the
+    peak of a stage also counts whatever concurrent tiles allocated meanwhile. Every stage
+    resets the tracer's peak, so the peak reached so far is first folded into each stage
+    still open; a stage reports the larger of its folded peak and the tracer's.
+    """
+
+    def __init__(self, job_id: str, memory: bool = False):
+        self.job_id = job_id
+        self.memory = memory
+        self.records: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._peak = 0
+        # Running peaks of the stages still open, in any thread
+        self._open: List[List[int]] = []
+
+    def _fold(self):
+        """Carries the tracer's peak into every open stage and the job (under _lock)."""
+        peak = tracemalloc.get_traced_memory()[1]
+        for frame in self._open:
+            frame[0] = max(frame[0], peak)
+        self._peak = max(self._peak, peak)
+
+    @contextmanager
+    def stage(self, name: str, **tags) -> Iterator[None]:
+        tags = {**_tags.get(), **tags}
+        token = _tags.set(tags)
+        frame = [0]
+        if self.memory:
+            with self._lock:
+                self._fold()
+                self._open.append(frame)
+                tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = {"stage": name, "ms": round((time.perf_counter() - start) * 1000, 3), **tags}
+            _tags.reset(token)
+            with self._lock:
+                if self.memory:
+                    self._fold()
+                    self._open = [f for f in self._open if f is not frame]
+                    record["peak_mb"] = round(frame[0] / 1024**2, 3)
+                self.records.append(record)
+
+    def report(self, records: bool = True) -> Dict[str, Any]:
+        """Per-stage summary (count, total/max ms, peak MB); `records` adds every tile/cluster entry."""
+        with self._lock:
+            entries = list(self.records)
+        stages: Dict[str, Dict[str, Any]] = {}
+        for entry in entries:
+            summary = stages.setdefault(entry["stage"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            summary["count"] += 1
+            summary["total_ms"] = round(summary["total_ms"] + entry["ms"], 3)
+            summary["max_ms"] = max(summary["max_ms"], entry["ms"])
+            if "peak_mb" in entry:
+                summary["peak_mb"] = max(summary.get("peak_mb", 0.0), entry["peak_mb"])
+
+        report = {"job_id": self.job_id, "total_ms": round((time.perf_counter() - self._start) * 1000, 3), "stages": stages}
+        if self.memory:
+            report["peak_mb"] = round(max(self._peak, tracemalloc.get_traced_memory()[1]) / 1024**2, 3)
+        if records:
+            report["records"] = entries
+        return report
+
+
+def current_profile() -> Optional[JobProfile]:
+    return _current.get()
+
+
+def stage(name: str, **tags):
+    """Times a stage of the active job profile; a shared no-op context when nothing is profiled."""
+    profile = _current.get()
+    return _NULL if profile is None else profile.stage(name, **tags)
+
+
+@contextmanager
+def profiling(job_id: str, enabled: Optional[bool] = None, memory: Optional[bool] = None) -> Iterator[Optional[JobProfile]]:
+    """
+    Profiles the enclosed job (PROFILE_ENABLED unless `enabled` is given) and logs the report
+    through the JSON logger when it ends. Nested calls join the profile already active.
+    Yields the JobProfile, or None when profiling is off.
+    """
+    active = _current.get()
+    if active is not None:
+        yield active
+        return
+    if not (settings.PROFILE_ENABLED if enabled is None else enabled):
+        yield None
+        return
+
+    memory = settings.PROFILE_MEMORY if memory is None else memory
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    profile = JobProfile(job_id, memory=memory)
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+        report = profile.report(records=settings.PROFILE_LOG_RECORDS)
+        if started_tracing:
+            tracemalloc.stop()
+        logger.info(f"Job profile [Job: {job_id}]: {report['total_ms']:.1f}ms", extra={
+            "job_id": job_id, "extra": {"profile": report}
+        })
@@ -4,10 +4,28 @@ import zipfile
 import hashlib
 import uuid
 import shutil
+import struct
+import threading
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Dict, Set, Tuple
 from .project_models import ProjectMetadata, PageState
+from .preview import PreviewGenerator, preview_levels, preview_path
+
+# Formato 2.0: blobs endereçados por conteúdo + um manifesto por geração, só com anexação
+ARCHIVE_FORMAT = "2.0"
+BLOB_DIR = "blobs"
+MANIFEST_DIR = "manifest"
+PROJECT_DIR = "project"
+# PNG/JPEG/WebP já são comprimidos: deflate só gastaria CPU
+STORED_SUFFIXES = {'.png', '.jpg', '.jpeg', '.webp'}
+# Fração de bytes mortos (blobs e manifestos substituídos) que força a regravação completa
+COMPACT_RATIO = 0.5
+# Autosave: snapshot completo + diário de páginas alteradas (JSON compacto, uma linha por tick)
+AUTOSAVE_SNAPSHOT = "snapshot.json"
+AUTOSAVE_JOURNAL = "journal.jsonl"
+# O diário vira snapshot quando passa do tamanho do snapshot (com este mínimo)
+AUTOSAVE_MIN_COMPACT_BYTES = 1 << 20
 
 class ProjectManager:
     def __init__(self, workspace_parent: Optional[str] = None):
@@ -16,6 +34,20 @@ class ProjectManager:
         self.current_project: Optional[ProjectMetadata] = None
         self.current_path: Optional[Path] = None
         self.active_workspace: Optional[Path] = None
+        # arcname -> (tamanho, mtime_ns, sha256) do último save/load: evita re-hash de arquivos intactos
+        self._index: Dict[str, Tuple[int, int, str]] = {}
+        # Abertura lazy: arcname -> (membro no ZIP, sha256 ou None no formato 1.0, tamanho) ainda não extraídos
+        self._pending: Dict[str, Tuple[str, Optional[str], int]] = {}
+        self._lock = threading.Lock()
+        # Miniaturas (só os níveis reduzidos) geradas em segundo plano para thumbnails/
+        self.previews = PreviewGenerator(full=False)
+        # Autosave incremental: páginas alteradas desde o último tick e o save em que o diário se baseia
+        self._dirty_pages: Set[str] = set()
+        self._autosave_base = ""
+        self._autosave_order: List[str] = []
+        self._autosave_fresh = True
+        self._journal_bytes = 0
+        self._snapshot_bytes = 0
 
     def calculate_checksum(self, data: str) -> str:
         return hashlib.sha256(data.encode('utf-8')).hexdigest()
@@ -31,6 +63,9 @@ class ProjectManager:
         project = ProjectMetadata(project_name=name)
         self.current_project = project
         self.current_path = Path(path)
+        self._index = {}
+        self._pending = {}
+        self._reset_autosave()
         
         # Criar espaço de trabalho temporário
         self.active_workspace = self.workspace_parent / f"proj_{project.id}"
@@ -60,10 +95,40 @@ class ProjectManager:
             original_path=f"assets/original/{dest_filename}"
         )
         self.current_project.pages.append(page)
-        self.mark_dirty()
+        self.previews.submit(str(dest_path), str(self.active_workspace / "thumbnails"), page_id)
+        self.mark_dirty(page_id)
+        return page
+
+    def update_page(self, page_id: str, **changes) -> PageState:
+        """Altera campos de uma página (konva_state, history...) e a marca para o próximo autosave."""
+        page = next((p for p in self.current_project.pages if p.id == page_id), None) if self.current_project else None
+        if page is None:
+            raise ValueError(f"Página não encontrada: {page_id}")
+        for field, value in changes.items():
+            setattr(page, field, value)
+        self.mark_dirty(page_id)
         return page
 
-    def save_project(self, target_path: Optional[str] = None) -> bool:
+    def thumbnail_path(self, page_id: str, level: Optional[str] = None) -> Optional[Path]:
+        """
+        Menor miniatura da página com pelo menos `level` de largura (padrão: o menor nível).
+        None enquanto ela não foi gerada, ou se a página já é menor que os níveis: use page_path.
+        """
+        folder = str(self.active_workspace / "thumbnails")
+        levels = preview_levels()[:-1]
+        # Abertura lazy: as miniaturas já saíram do .wcu, a página não precisa ser extraída
+        for candidate in levels[levels.index(level) if level else 0:]:
+            path = Path(preview_path(folder, page_id, candidate))
+            if path.exists():
+                return path
+        return None
+
+    def save_project(self, target_path: Optional[str] = None, compact: bool = False) -> bool:
+        """
+        Salva só o que mudou: arquivos novos ou alterados viram blobs (sha256) anexados ao .wcu,
+        seguidos de um novo manifesto. Save As, arquivos no formato 1.0, `compact=True` ou
+        excesso de bytes mortos regravam o arquivo inteiro (.tmp + troca atômica).
+        """
         if not self.current_project or not self.active_workspace:
             return False
         
@@ -73,27 +138,95 @@ class ProjectManager:
 
         # Status Update
         self.current_project.last_opened = datetime.now()
+        self.current_project.versions.format = ARCHIVE_FORMAT
         
         # Checksum
         self.current_project.checksum = ""
         self.current_project.checksum = self.calculate_checksum(self.current_project.model_dump_json())
 
-        # Atomic Save
+        # Miniaturas em andamento entram neste save
+        self.previews.join()
+        if any(blob is None for _, blob, _ in self._pending.values()):
+            # Formato 1.0 aberto em modo lazy: sem hashes, a regravação precisa dos bytes
+            self.extract_all()
+        index = self._scan_workspace()
+        # Páginas ainda não extraídas mantêm o blob que já está no arquivo
+        files = {name: {"blob": blob, "size": size} for name, (_, blob, size) in self._pending.items()}
+        files.update({name: {"blob": digest, "size": size} for name, (size, _, digest) in index.items()})
+
+        incremental = not compact and final_path == self.current_path and final_path.exists()
+        if not (incremental and self._append_generation(final_path, files)):
+            self._write_archive(final_path, files)
+
+        self._index.update(index)
+        self.current_path = final_path
+        self.current_project.is_dirty = False
+        self._reset_autosave()
+        return True
+
+    def _scan_workspace(self) -> Dict[str, Tuple[int, int, str]]:
+        """Hash de cada arquivo do workspace; só relê os que mudaram de tamanho ou mtime."""
+        index = {}
+        for root, _, names in os.walk(self.active_workspace):
+            for name in names:
+                file_path = Path(root) / name
+                arcname = file_path.relative_to(self.active_workspace).as_posix()
+                if arcname.startswith('autosave/'):
+                    # Recuperação local de crash: o save já contém esse estado
+                    continue
+                if arcname in self._pending:
+                    # Cópia de uma sessão anterior ainda não conferida: vale o blob do manifesto
+                    continue
+                st = file_path.stat()
+                cached = self._index.get(arcname)
+                if cached and cached[:2] == (st.st_size, st.st_mtime_ns):
+                    digest = cached[2]
+                else:
+                    digest = self._hash_file(file_path)
+                index[arcname] = (st.st_size, st.st_mtime_ns, digest)
+        return index
+
+    @staticmethod
+    def _hash_file(path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _compression(arcname: str) -> int:
+        return zipfile.ZIP_STORED if Path(arcname).suffix.lower() in STORED_SUFFIXES else zipfile.ZIP_DEFLATED
+
+    @staticmethod
+    def _latest_manifest(zf: zipfile.ZipFile) -> Optional[str]:
+        manifests = sorted(n for n in zf.namelist() if n.startswith(f"{MANIFEST_DIR}/"))
+        return manifests[-1] if manifests else None
+
+    def _write_blobs(self, zf: zipfile.ZipFile, files: Dict[str, dict], stored: set):
+        for arcname, entry in files.items():
+            if entry["blob"] in stored:
+                continue
+            stored.add(entry["blob"])
+            self.asset_path(arcname)
+            zf.write(self.active_workspace / arcname, f"{BLOB_DIR}/{entry['blob']}",
+                     compress_type=self._compression(arcname))
+
+    def _write_manifest(self, zf: zipfile.ZipFile, generation: int, files: Dict[str, dict]):
+        # O manifesto é gravado por último: é ele que torna a geração visível
+        project_name = f"{PROJECT_DIR}/{generation:06d}.json"
+        zf.writestr(project_name, self.current_project.model_dump_json(indent=4))
+        manifest = {"generation": generation, "project": project_name, "files": files}
+        zf.writestr(f"{MANIFEST_DIR}/{generation:06d}.json", json.dumps(manifest, separators=(',', ':')))
+
+    def _write_archive(self, final_path: Path, files: Dict[str, dict]):
+        """Regravação completa (também serve de compactação): só os blobs vivos, geração 1."""
         tmp_path = final_path.with_suffix('.wcu.tmp')
         
         try:
             with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as zf:
-                # 1. project.json
-                zf.writestr('project.json', self.current_project.model_dump_json(indent=4))
-                
-                # 2. Assets (Original, Processed, Thumbnails)
-                for root, _, files in os.walk(self.active_workspace):
-                    for file in files:
-                        file_path = Path(root) / file
-                        arcname = file_path.relative_to(self.active_workspace)
-                        # Ignorar pasta de autosave no arquivo principal? Geralmente sim,
-                        # mas o usuário pediu dentro. Vou incluir.
-                        zf.write(file_path, arcname)
+                self._write_blobs(zf, files, set())
+                self._write_manifest(zf, 1, files)
 
             # Swap atômico
             if final_path.exists():
@@ -105,64 +238,318 @@ class ProjectManager:
                 backup_path.unlink()
             else:
                 tmp_path.rename(final_path)
-            
-            self.current_path = final_path
-            self.current_project.is_dirty = False
-            return True
+            self._journal_path(final_path).unlink(missing_ok=True)
             
         except Exception as e:
             if tmp_path.exists(): tmp_path.unlink()
             raise e
 
+    def _append_generation(self, path: Path, files: Dict[str, dict]) -> bool:
+        """
+        Anexa os blobs que faltam e um novo manifesto. Retorna False quando o arquivo precisa
+        ser regravado por inteiro (formato 1.0 ou bytes mortos acima de COMPACT_RATIO).
+        """
+        with zipfile.ZipFile(path, 'r') as zf:
+            latest = self._latest_manifest(zf)
+            if latest is None:
+                return False
+            infos = zf.infolist()
+            start_dir = zf.start_dir
+
+        live = {entry["blob"] for entry in files.values()}
+        stored = set()
+        dead = 0
+        for info in infos:
+            blob = info.filename[len(BLOB_DIR) + 1:] if info.filename.startswith(f"{BLOB_DIR}/") else None
+            if blob in live:
+                stored.add(blob)
+            else:
+                # Blobs sem referência e manifestos/projetos das gerações anteriores
+                dead += info.compress_size
+        if dead > COMPACT_RATIO * max(1, sum(info.compress_size for info in infos)):
+            return False
+
+        generation = int(Path(latest).stem) + 1
+        self._begin_journal(path, start_dir)
+        try:
+            # O modo 'a' sobrescreve o diretório central antigo: o diário permite desfazer
+            with zipfile.ZipFile(path, 'a', zipfile.ZIP_DEFLATED) as zf:
+                self._write_blobs(zf, files, stored)
+                self._write_manifest(zf, generation, files)
+            with open(path, 'rb+') as f:
+                os.fsync(f.fileno())
+        except BaseException:
+            self._rollback(path)
+            raise
+        self._journal_path(path).unlink()
+        return True
+
+    @staticmethod
+    def _journal_path(path: Path) -> Path:
+        return path.with_suffix('.wcu.journal')
+
+    def _begin_journal(self, path: Path, start_dir: int):
+        """Guarda o diretório central atual (o fim do arquivo) antes de anexar."""
+        with open(path, 'rb') as f:
+            f.seek(start_dir)
+            tail = f.read()
+        with open(self._journal_path(path), 'wb') as journal:
+            journal.write(struct.pack('<QQ', start_dir, len(tail)) + tail)
+            journal.flush()
+            os.fsync(journal.fileno())
+
+    def _rollback(self, path: Path) -> bool:
+        """Desfaz um save incremental interrompido, restaurando o diretório central anterior."""
+        journal = self._journal_path(path)
+        if not journal.exists():
+            return False
+        data = journal.read_bytes()
+        if len(data) >= 16:
+            start_dir, size = struct.unpack_from('<QQ', data)
+            # Diário incompleto: a queda foi antes de o arquivo ser tocado
+            if len(data) == 16 + size:
+                with open(path, 'rb+') as f:
+                    f.seek(start_dir)
+                    f.write(data[16:])
+                    f.truncate()
+                    f.flush()
+                    os.fsync(f.fileno())
+        journal.unlink()
+        return True
+
     def autosave(self):
+        """
+        Anexa ao diário só as páginas marcadas (mark_dirty/update_page) desde o último tick,
+        em JSON compacto. O custo acompanha o tamanho da edição, não o do projeto; o diário é
+        compactado num snapshot quando cresce além dele.
+        """
         if not self.current_project or not self.active_workspace: return
-        
-        # Incrementa contador (1 a 5)
-        self.current_project.autosave_version = (self.current_project.autosave_version % 5) + 1
-        name = f"autosave_{self.current_project.autosave_version:02d}.json"
-        
-        # Salvamos apenas o JSON do estado no workspace (rápido!)
-        autosave_path = self.active_workspace / "autosave" / name
-        with open(autosave_path, 'w') as f:
-            f.write(self.current_project.model_dump_json(indent=4))
-        
-        # Opcionalmente, salvamos uma cópia completa .wcu de emergência se o projeto for pequeno
-        # Mas para "Professional", o autosave de estado é o prioritário.
 
-    def load_project(self, path: str) -> ProjectMetadata:
+        folder = self.active_workspace / "autosave"
+        folder.mkdir(parents=True, exist_ok=True)
+        journal = folder / AUTOSAVE_JOURNAL
+        if self._autosave_fresh:
+            # Primeiro tick desde o load/save: o diário anterior já não vale
+            (folder / AUTOSAVE_SNAPSHOT).unlink(missing_ok=True)
+            journal.write_bytes(b'')
+            self._journal_bytes = self._snapshot_bytes = 0
+            self._autosave_fresh = False
+
+        project = self.current_project
+        project.autosave_version += 1
+        entry = {
+            "base": self._autosave_base,
+            "seq": project.autosave_version,
+            "project": project.model_dump(mode='json', exclude={'pages'}),
+            "pages": [p.model_dump(mode='json') for p in project.pages if p.id in self._dirty_pages],
+        }
+        order = [p.id for p in project.pages]
+        if order != self._autosave_order:
+            entry["order"] = order
+
+        line = (json.dumps(entry, separators=(',', ':')) + '\n').encode('utf-8')
+        with open(journal, 'ab') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self._dirty_pages.clear()
+        self._autosave_order = order
+        self._journal_bytes += len(line)
+
+        if self._journal_bytes > max(self._snapshot_bytes, AUTOSAVE_MIN_COMPACT_BYTES):
+            self._compact_autosave()
+
+    def _compact_autosave(self):
+        """Grava o estado inteiro como snapshot (troca atômica) e zera o diário."""
+        folder = self.active_workspace / "autosave"
+        folder.mkdir(parents=True, exist_ok=True)
+        snapshot = {
+            "base": self._autosave_base,
+            "seq": self.current_project.autosave_version,
+            "project": self.current_project.model_dump(mode='json'),
+        }
+        data = json.dumps(snapshot, separators=(',', ':')).encode('utf-8')
+        tmp_path = folder / f"{AUTOSAVE_SNAPSHOT}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, folder / AUTOSAVE_SNAPSHOT)
+        # Uma queda aqui é inofensiva: entradas com seq <= snapshot são ignoradas no replay
+        (folder / AUTOSAVE_JOURNAL).write_bytes(b'')
+        self._snapshot_bytes = len(data)
+        self._journal_bytes = 0
+        self._autosave_fresh = False
+
+    def _reset_autosave(self):
+        """Novo ponto de partida do diário: o projeto como acabou de ser salvo/aberto."""
+        self._autosave_base = self.current_project.checksum if self.current_project else ""
+        self._autosave_order = [p.id for p in self.current_project.pages] if self.current_project else []
+        self._dirty_pages = set()
+        self._autosave_fresh = True
+
+    def _replay_autosave(self) -> bool:
+        """Aplica snapshot + diário do workspace sobre o projeto aberto; False se não havia nada."""
+        folder = self.active_workspace / "autosave"
+        base = self.current_project.checksum
+        state, last_seq, applied = None, -1, 0
+
+        snapshot_path = folder / AUTOSAVE_SNAPSHOT
+        if snapshot_path.exists():
+            snapshot = json.loads(snapshot_path.read_bytes())
+            if snapshot["base"] == base:
+                state, last_seq, applied = snapshot["project"], snapshot["seq"], 1
+        if state is None:
+            state = self.current_project.model_dump(mode='json')
+        pages = {p["id"]: p for p in state["pages"]}
+        order = [p["id"] for p in state["pages"]]
+
+        journal_path = folder / AUTOSAVE_JOURNAL
+        if journal_path.exists():
+            with open(journal_path, 'rb') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Última linha cortada pela queda
+                        break
+                    if entry["base"] != base or entry["seq"] <= last_seq:
+                        continue
+                    state.update(entry["project"])
+                    for page in entry["pages"]:
+                        if page["id"] not in pages:
+                            order.append(page["id"])
+                        pages[page["id"]] = page
+                    order = entry.get("order", order)
+                    last_seq = entry["seq"]
+                    applied += 1
+
+        if not applied:
+            return False
+        state["pages"] = [pages[page_id] for page_id in order if page_id in pages]
+        self.current_project = ProjectMetadata.model_validate(state)
+        self.current_project.is_dirty = True
+        self._reset_autosave()
+        # O estado recuperado ainda não está no .wcu: vira o snapshot do novo diário
+        self._compact_autosave()
+        return True
+
+    def load_project(self, path: str, lazy: bool = False) -> ProjectMetadata:
+        """
+        Abre o .wcu. Com lazy=True só project.json (checksum conferido) e as miniaturas são
+        extraídos; as demais páginas saem do arquivo sob demanda (asset_path/page_path).
+        """
         load_path = Path(path)
         if not load_path.exists(): raise FileNotFoundError(path)
 
+        # Um save incremental interrompido deixa um diário: desfazer antes de ler
+        self._rollback(load_path)
+
         # Limpar workspace anterior se necessário
         
         with zipfile.ZipFile(load_path, 'r') as zf:
-            data = zf.read('project.json').decode('utf-8')
+            manifest_name = self._latest_manifest(zf)
+            manifest = json.loads(zf.read(manifest_name)) if manifest_name else None
+            data = zf.read(manifest["project"] if manifest else 'project.json').decode('utf-8')
             project = ProjectMetadata.model_validate_json(data)
             
             if not self.validate_checksum(project):
                 raise ValueError("Checksum inválido! Arquivo corrompido.")
 
-            # Extrair para o workspace ativo
+            if manifest is None:
+                # Formato 1.0: caminhos do workspace direto no ZIP
+                members = {
+                    info.filename: (info.filename, None, info.file_size) for info in zf.infolist()
+                    if info.filename != 'project.json' and not info.is_dir()
+                }
+            else:
+                members = {
+                    arcname: (f"{BLOB_DIR}/{entry['blob']}", entry["blob"], entry["size"])
+                    for arcname, entry in manifest["files"].items()
+                }
+
+            # Workspace ativo: miniaturas primeiro, o resto agora ou sob demanda
             self.active_workspace = self.workspace_parent / f"proj_{project.id}"
-            zf.extractall(self.active_workspace)
+            self._init_workspace_folders(self.active_workspace)
+            self._index = {}
+            self._pending = members
+            for arcname in sorted(members, key=lambda name: not name.startswith('thumbnails/')):
+                if lazy and not arcname.startswith('thumbnails/'):
+                    break
+                self._extract(zf, arcname)
             
             self.current_project = project
             self.current_path = load_path
+            self._reset_autosave()
             return project
 
+    def _extract(self, zf: zipfile.ZipFile, arcname: str):
+        member, blob, size = self._pending[arcname]
+        dest = self.active_workspace / arcname
+        # Já extraído numa sessão anterior e idêntico ao blob: reaproveita
+        cached = blob is not None and dest.is_file() and dest.stat().st_size == size and self._hash_file(dest) == blob
+        if not cached:
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            with zf.open(member) as src, open(dest, 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+        if blob is not None:
+            st = dest.stat()
+            self._index[arcname] = (st.st_size, st.st_mtime_ns, blob)
+        del self._pending[arcname]
+
+    def asset_path(self, arcname: str) -> Path:
+        """Caminho do arquivo no workspace, extraído do .wcu no primeiro acesso."""
+        with self._lock:
+            if arcname in self._pending:
+                with zipfile.ZipFile(self.current_path, 'r') as zf:
+                    self._extract(zf, arcname)
+        return self.active_workspace / arcname
+
+    def page_path(self, page_id: str, processed: bool = False) -> Optional[Path]:
+        page = next((p for p in self.current_project.pages if p.id == page_id), None) if self.current_project else None
+        relative = page and (page.processed_path if processed else page.original_path)
+        return self.asset_path(relative) if relative else None
+
+    def extract_all(self):
+        """Conclui uma abertura lazy extraindo tudo o que falta."""
+        with self._lock:
+            if self._pending:
+                with zipfile.ZipFile(self.current_path, 'r') as zf:
+                    for arcname in list(self._pending):
+                        self._extract(zf, arcname)
+
     def recover_project(self, path: str) -> Optional[ProjectMetadata]:
         """Procura por .tmp ou autosaves para recuperar."""
         base_path = Path(path)
         tmp_path = base_path.with_suffix('.wcu.tmp')
+
+        if self._rollback(base_path):
+            print(f"[RECOVERY] Save incremental interrompido desfeito: {base_path}")
         
         if tmp_path.exists():
             print(f"[RECOVERY] Arquivo temporário encontrado: {tmp_path}")
             # Podemos tentar renomear ou carregar dele
             return self.load_project(str(tmp_path))
         
-        # Se falhar, poderíamos checar a pasta de autosave interna do ZIP (se conseguirmos ler o zip)
-        return None
+        if not base_path.exists():
+            return None
+        with zipfile.ZipFile(base_path, 'r') as zf:
+            manifest_name = self._latest_manifest(zf)
+            project_name = json.loads(zf.read(manifest_name))["project"] if manifest_name else 'project.json'
+            project_id = ProjectMetadata.model_validate_json(zf.read(project_name)).id
+        autosave = self.workspace_parent / f"proj_{project_id}" / "autosave"
+        if not any((autosave / name).exists() for name in (AUTOSAVE_SNAPSHOT, AUTOSAVE_JOURNAL)):
+            return None
+
+        # Autosave de uma sessão que caiu: abre o .wcu (lazy) e reaplica o diário por cima
+        self.load_project(str(base_path), lazy=True)
+        if not self._replay_autosave():
+            return None
+        print(f"[RECOVERY] Autosave reaplicado: {base_path}")
+        return self.current_project
 
-    def mark_dirty(self):
+    def mark_dirty(self, page_id: Optional[str] = None):
         if self.current_project:
             self.current_project.is_dirty = True
+            if page_id:
+                self._dirty_pages.add(page_id)
@@ -0,0 +1,132 @@
+# core/result_cache.py
+
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config.settings import settings
+from core.logger import logger
+
+
+class ResultCache:
+    """
+    Persistent content-addressed cache of cleaned pages.
+    Key = hash(page bytes + shape) + pipeline parameters. Each entry is a lossless PNG
+    plus a JSON sidecar (cleaned count, detected boxes). Entries are evicted LRU
+    (by access time) once the directory grows past the size cap.
+    Safe to share between threads and between worker processes (atomic renames).
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = Path(cache_dir or settings.RESULT_CACHE_DIR)
+        self.max_bytes = max_bytes if max_bytes is not None else settings.RESULT_CACHE_MAX_MB * 1024 * 1024
+        self._lock = threading.Lock()
+        self._size_estimate: Optional[int] = None
+
+    @staticmethod
+    def make_key(image: np.ndarray, params: Dict[str, Any]) -> str:
+        # blake2b: same guarantees as sha256 for this use, noticeably faster on multi-MB strips
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(repr((image.shape, str(image.dtype))).encode("utf-8"))
+        digest.update(memoryview(np.ascontiguousarray(image)).cast("B"))
+        digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        folder = self.cache_dir / key[:2]
+        return folder / f"{key}.png", folder / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, Dict[str, Any]]]:
+        """Returns (cleaned image, metadata) or None on a miss."""
+        img_path, meta_path = self._paths(key)
+        try:
+            # The JSON sidecar is written last, so its presence marks a complete entry
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            image = cv2.imread(str(img_path), cv2.IMREAD_UNCHANGED)
+        except (OSError, ValueError):
+            return None
+        if image is None:
+            return None
+
+        now = time.time()
+        for path in (img_path, meta_path):
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+        return image, meta
+
+    def put(self, key: str, image: np.ndarray, meta: Dict[str, Any]):
+        img_path, meta_path = self._paths(key)
+        img_path.parent.mkdir(parents=True, exist_ok=True)
+
+        ok, encoded = cv2.imencode(".png", image, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        if not ok:
+            logger.warning(f"Result cache: failed to encode entry {key}")
+            return
+        meta_bytes = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        for path, payload in ((img_path, encoded.tobytes()), (meta_path, meta_bytes)):
+            tmp_path = path.with_name(path.name + suffix)
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._size_estimate is None:
+                self._size_estimate = self._scan_size()
+            else:
+                self._size_estimate += len(encoded) + len(meta_bytes)
+            if self._size_estimate > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        """Groups cache files per key: (last access, total size, paths)."""
+        if not self.cache_dir.exists():
+            return []
+        grouped: Dict[str, list] = {}
+        for path in self.cache_dir.glob("*/*"):
+            if path.name.endswith(".tmp"):
+                continue  # Entry still being written by another worker
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entry = grouped.setdefault(path.name.split(".")[0], [0.0, 0, []])
+            entry[0] = max(entry[0], stat.st_mtime)
+            entry[1] += stat.st_size
+            entry[2].append(path)
+        return [tuple(entry) for entry in grouped.values()]
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """Drops least-recently-used entries until the cache is back under 90% of the cap."""
+        entries = sorted(self._entries(), key=lambda e: e[0])
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for _, size, paths in entries:
+            if total <= target:
+                break
+            for path in paths:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+            total -= size
+            removed += 1
+        self._size_estimate = total
+        logger.info(f"Result cache eviction: removed {removed} entries", extra={
+            "extra": {"cache_size_mb": round(total / 1024**2, 2)}
+        })
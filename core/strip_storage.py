@@ -0,0 +1,146 @@
+# core/strip_storage.py
+
+import os
+import struct
+import tempfile
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config.settings import settings
+from core.exceptions import InvalidImageError
+from core.logger import logger
+
+
+def probe_shape(path: str) -> Optional[Tuple[int, int, int]]:
+    """
+    Reads (h, w, 3) from a PNG/JPEG header without decoding pixels, so the memory audit
+    can run before the decode. Returns None for formats it doesn't parse.
+    """
+    try:
+        with open(path, "rb") as f:
+            head = f.read(32)
+            if head[:8] == b"\x89PNG\r\n\x1a\n" and head[12:16] == b"IHDR":
+                w, h = struct.unpack(">II", head[16:24])
+                return h, w, 3
+            if head[:2] == b"\xff\xd8":
+                f.seek(2)
+                while True:
+                    marker = f.read(2)
+                    if len(marker) < 2 or marker[0] != 0xFF:
+                        return None
+                    if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+                        continue
+                    length = struct.unpack(">H", f.read(2))[0]
+                    # SOF0..SOF15, except DHT (C4), JPG (C8) and DAC (CC)
+                    if 0xC0 <= marker[1] <= 0xCF and marker[1] not in (0xC4, 0xC8, 0xCC):
+                        h, w = struct.unpack(">xHH", f.read(5))
+                        return h, w, 3
+                    f.seek(length - 2, os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None
+    return None
+
+
+def use_mmap(shape: Tuple[int, ...]) -> bool:
+    """Whether a strip of this shape goes through disk-backed storage (STRIP_STORAGE_MODE)."""
+    mode = settings.STRIP_STORAGE_MODE
+    if mode == "mmap":
+        return True
+    if mode == "memory":
+        return False
+    return shape[0] * shape[1] >= settings.STRIP_MMAP_MIN_PIXELS
+
+
+class StripStore:
+    """
+    Disk-backed (np.memmap) storage for ultra-tall strips.
+    The tile loop reads row windows from the input store and writes cleaned rows into an
+    output store, so the resident set follows the tile size instead of the strip height:
+    untouched rows stay in the page cache and are evicted by the OS under pressure.
+    Temporary backing files are deleted on close().
+    """
+
+    def __init__(self, array: np.ndarray, path: Optional[str] = None):
+        self.array = array
+        self.path = path
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.array.shape
+
+    @classmethod
+    def _tmp_path(cls, suffix: str) -> str:
+        folder = settings.STRIP_TMP_DIR or None
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix="strip_", suffix=suffix, dir=folder)
+        os.close(fd)
+        return path
+
+    @classmethod
+    def create(cls, shape: Tuple[int, ...], dtype=np.uint8) -> "StripStore":
+        """Empty writable store backed by a temporary file."""
+        path = cls._tmp_path(".out.raw")
+        return cls(np.memmap(path, dtype=dtype, mode="w+", shape=shape), path)
+
+    @classmethod
+    def from_array(cls, image: np.ndarray) -> "StripStore":
+        """Spills an in-RAM strip to disk (the caller drops its own reference afterwards)."""
+        store = cls.create(image.shape, image.dtype)
+        step = max(1, (64 * 1024 * 1024) // max(1, image[0].nbytes))
+        for y in range(0, image.shape[0], step):
+            store.array[y:y + step] = image[y:y + step]
+        return store
+
+    @classmethod
+    def from_file(cls, path: str) -> "StripStore":
+        """
+        Decodes an image file into a memmap. OpenCV can't decode PNG/JPEG by row range, so the
+        decoded buffer exists once, briefly, and is released before any tile work starts.
+        """
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            raise InvalidImageError(f"Could not decode image: {path}")
+        store = cls.from_array(image)
+        del image
+        logger.info(f"Strip spilled to disk: {store.shape[1]}x{store.shape[0]}", extra={
+            "extra": {"strip_mb": round(store.array.nbytes / 1024**2, 2)}
+        })
+        return store
+
+    def read_window(self, y0: int, y1: int, pad_value: int = 255) -> np.ndarray:
+        """
+        Rows [y0, y1) as a fresh contiguous array. Rows past the end read as `pad_value`,
+        which replaces the full-size padded copy the tile loop used to build.
+        """
+        h = self.array.shape[0]
+        out = np.empty((y1 - y0,) + self.array.shape[1:], dtype=self.array.dtype)
+        stop = min(y1, h)
+        if stop > y0:
+            out[:stop - y0] = self.array[y0:stop]
+        if y1 > stop:
+            out[max(0, stop - y0):] = pad_value
+        return out
+
+    def flush(self):
+        if isinstance(self.array, np.memmap):
+            self.array.flush()
+
+    def close(self):
+        # POSIX: unlinking while views are still mapped is fine, the space is reclaimed when they go.
+        # Windows refuses to delete a mapped file, so callers drop their views before close().
+        self.array = None
+        if self.path and os.path.exists(self.path):
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+        self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,72 @@
+# core/tile_executor.py
+
+import os
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+import cv2
+
+from config.settings import settings
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def resolve_tile_workers(requested: Optional[int] = None) -> int:
+    """Resolves the tile pool size. 0 (or less) means auto: one worker per core, capped at 4."""
+    workers = settings.TILE_WORKERS if requested is None else requested
+    if workers <= 0:
+        workers = max(1, min(4, os.cpu_count() or 1))
+    return workers
+
+
+def limit_native_threads(processes: int = 1) -> int:
+    """
+    Caps the intra-op threads of OpenCV and torch (EasyOCR) so that `processes` worker
+    processes, each running resolve_tile_workers() tiles at once, share the cores instead
+    of each tile spawning one thread per core. Returns the threads left to each tile.
+    """
+    threads = max(1, (os.cpu_count() or 1) // (max(1, processes) * resolve_tile_workers()))
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+    except ImportError:
+        return threads
+    torch.set_num_threads(threads)
+    return threads
+
+
+class TileExecutor:
+    """
+    Bounded worker pool for independent tiles.
+    Jobs run concurrently, but results are yielded strictly in submission order,
+    so the caller can keep merging tiles top-to-bottom exactly as in serial mode.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_in_flight: Optional[int] = None):
+        self.workers = resolve_tile_workers(workers)
+        # Limits how many tiles are alive at once (RAM stays proportional to the pool, not the strip)
+        self.max_in_flight = max(self.workers, max_in_flight or self.workers * 2)
+
+    def map_ordered(self, fn: Callable[[T], R], items: Iterable[T]) -> Iterator[R]:
+        if self.workers == 1:
+            for item in items:
+                yield fn(item)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="tile") as pool:
+            pending = deque()
+            try:
+                for item in items:
+                    # Each job runs in a copy of the caller's context (active job profile, ...)
+                    pending.append(pool.submit(contextvars.copy_context().run, fn, item))
+                    if len(pending) >= self.max_in_flight:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                # Consumer stopped early (error/cancel): drop tiles that did not start yet
+                for future in pending:
+                    future.cancel()
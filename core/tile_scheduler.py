@@ -1,60 +1,211 @@
 import gc
 import numpy as np
-import logging
-from core.tile_strategy import TileStrategy
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from config.settings import settings
+from core.exceptions import TileSeamError
+from core.logger import logger
+from core.profiler import stage
+from core.strip_storage import StripStore
+from core.tile_executor import TileExecutor
+from core.tile_strategy import (
+    MIN_TILE_HEIGHT, compute_dynamic_tile_height, generate_text_aware_tiles, generate_vertical_tiles
+)
+
+TileBounds = Tuple[int, int]
+Rect = Tuple[int, int, int, int]
+# A processor returns the cleaned tile, or (cleaned tile, cleaned count, boxes in page coordinates),
+# optionally followed by the rects (tile coordinates) the tile is authoritative for in an overlap
+TileOutput = Union[np.ndarray, Tuple[np.ndarray, int, List[Dict[str, Any]]],
+                   Tuple[np.ndarray, int, List[Dict[str, Any]], List[Rect]]]
 
-logger = logging.getLogger(__name__)
 
 class TileScheduler:
-    """Orchestrates the tile-by-tile streaming process."""
-    
-    def __init__(self, pipeline):
-        self.pipeline = pipeline
-        self.strategy = TileStrategy()
-
-    def process_webtoon(self, image: np.ndarray, overlap: int = 64):
-        """Processes an ultra-tall image using streaming tiles."""
-        h, w = image.shape[:2]
-        
-        # 1. Calculate dynamic tile height based on current RAM
-        tile_height = self.strategy.calculate_dynamic_height(w, h)
-        coords = self.strategy.get_tile_coordinates(h, tile_height, overlap)
-        
-        logger.info(f"Starting Webtoon Streaming: {len(coords)} tiles [Size: {w}x{h}, TileH: {tile_height}]")
-        
-        # 2. Initialize final buffer (incremental construction)
-        # In a real implementation, we might use the original image copy or a blank canvas
-        # To save memory, we use the input image as a base if allowed, or pre-allocate.
-        final_image = image.copy()
-        
-        for i, (y_start, y_end) in enumerate(coords):
-            logger.info(f"Processing Tile {i+1}/{len(coords)} [Y: {y_start}:{y_end}]")
-            
-            # --- TILE ISOLATION START ---
-            # Extract tile (This creates a view or copy)
-            tile = image[y_start:y_end, :].copy()
-            
+    """
+    The streaming tile engine shared by every pipeline entry point.
+    - Plans tiles from settings.TILE_HEIGHT / TILE_OVERLAP, capped by the RAM-driven
+      tile_strategy.compute_dynamic_tile_height when memory is tight.
+    - Reads tiles as windows (white rows past the bottom when `pad_bottom` is set),
+      runs the pluggable processor on a bounded pool, and merges results in y-order
+      with a linear cross-fade over each overlap.
+    - Smart cuts (TILE_SMART_CUTS): boundaries are moved into flat bands (gutters) near
+      the target height, so balloons aren't split and those cuts need no overlap at all.
+    - Mask-aware merge: inside the rects a tile reports as authoritative (e.g. the balloons
+      it alone cleaned), its pixels replace the cross-fade.
+    - Seam check: if two neighbouring tiles disagree on their shared rows by more than
+      TILE_SEAM_THRESHOLD (mean abs difference), the seam is logged, or a TileSeamError
+      is raised when TILE_SEAM_POLICY is "raise".
+
+    Processor contract: processor(tile, bounds) -> TileOutput, or, with batched=True,
+    processor(tiles, bounds_list) -> List[TileOutput] for up to `batch_size` consecutive tiles.
+    """
+
+    def __init__(self, processor: Optional[Callable] = None, batched: bool = False, batch_size: int = 1,
+                 tile_height: Optional[int] = None, overlap: Optional[int] = None, workers: Optional[int] = None,
+                 pad_bottom: int = 0, dynamic_height: Optional[bool] = None,
+                 seam_threshold: Optional[float] = None, seam_policy: Optional[str] = None,
+                 smart_cuts: Optional[bool] = None):
+        self.processor = processor
+        self.batched = batched
+        self.batch_size = max(1, batch_size)
+        self.tile_height = settings.TILE_HEIGHT if tile_height is None else tile_height
+        self.overlap = settings.TILE_OVERLAP if overlap is None else overlap
+        self.executor = TileExecutor(workers)
+        self.workers = self.executor.workers
+        self.pad_bottom = pad_bottom
+        self.dynamic_height = settings.TILE_DYNAMIC_HEIGHT if dynamic_height is None else dynamic_height
+        self.seam_threshold = settings.TILE_SEAM_THRESHOLD if seam_threshold is None else seam_threshold
+        self.seam_policy = settings.TILE_SEAM_POLICY if seam_policy is None else seam_policy
+        self.smart_cuts = settings.TILE_SMART_CUTS if smart_cuts is None else smart_cuts
+
+    def plan(self, height: int, width: int, source: Optional[StripStore] = None) -> Tuple[int, List[TileBounds]]:
+        """Returns (tile height, tile bounds over the padded height). Smart cuts need the `source` rows."""
+        padded_h = height + self.pad_bottom
+        tile_height = self.tile_height
+        if self.dynamic_height:
+            # Every tile in flight (workers x queued batches x batch size) needs its own buffers
+            in_flight = self.workers * 2 * self.batch_size
             try:
-                # Run the atomic pipeline on this tile
-                # Note: This is where we call the existing pipeline.clean_image logic
-                # For Phase 3A, we just define the loop structure.
-                processed_tile = self._process_single_tile(tile)
-                
-                # Merge into final buffer
-                # TODO: Implement blending in Phase 3B
-                final_image[y_start:y_end, :] = processed_tile
-                
-            finally:
-                # --- EXPLICIT DISPOSAL ---
-                del tile
-                if 'processed_tile' in locals():
-                    del processed_tile
-                gc.collect() 
-            # --- TILE ISOLATION END ---
-            
-        return final_image
-
-    def _process_single_tile(self, tile: np.ndarray):
-        """Placeholder for actual tile processing (Phase 3B)."""
-        # In the future, this calls self.pipeline logic
-        return tile # Identity for now
+                ram_height = compute_dynamic_tile_height(width * in_flight, padded_h)
+            except MemoryError:
+                ram_height = MIN_TILE_HEIGHT
+                logger.warning(f"Tile planning: RAM nearly exhausted, falling back to {MIN_TILE_HEIGHT}px tiles")
+            tile_height = min(tile_height, ram_height)
+        tile_height = max(tile_height, self.overlap + 1)
+        if self.smart_cuts and source is not None:
+            return tile_height, list(generate_text_aware_tiles(
+                source.read_window, padded_h, tile_height, self.overlap,
+                search=settings.TILE_CUT_SEARCH, min_flat=settings.TILE_CUT_MIN_FLAT,
+                tolerance=settings.PREFILTER_ROW_TOLERANCE,
+            ))
+        return tile_height, list(generate_vertical_tiles(padded_h, tile_height, self.overlap))
+
+    def _run_processor(self, tiles: List[np.ndarray], bounds: List[TileBounds]) -> List[Tuple[np.ndarray, int, List, List]]:
+        if self.processor is None:
+            outputs: Sequence[TileOutput] = tiles
+        elif self.batched:
+            outputs = self.processor(tiles, bounds)
+        else:
+            outputs = [self.processor(tile, b) for tile, b in zip(tiles, bounds)]
+        return [(out + ([],))[:4] if isinstance(out, tuple) else (out, 0, [], []) for out in outputs]
+
+    def map(self, image: np.ndarray, fn: Callable, bounds: List[TileBounds]) -> List[Any]:
+        """
+        Runs a batched fn(tiles, bounds_list) -> List[Any] over the given tiles on the pool, without
+        merging (e.g. a detection pass ahead of run()). Results come back one per tile, in order.
+        """
+        source = StripStore(image)
+        batches = [bounds[i:i + self.batch_size] for i in range(0, len(bounds), self.batch_size)]
+
+        def run_batch(batch_bounds):
+            return fn([source.read_window(y0, y1) for y0, y1 in batch_bounds], batch_bounds)
+
+        return [item for batch in self.executor.map_ordered(run_batch, batches) for item in batch]
+
+    def run(self, image: np.ndarray, job_id: str = "unknown", out: Optional[np.ndarray] = None,
+            progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+            bounds: Optional[List[TileBounds]] = None) -> Tuple[np.ndarray, int, List[Dict[str, Any]]]:
+        """
+        Processes a full strip. Returns (result, total cleaned count, boxes).
+        `out` (e.g. a StripStore memmap) receives the merged rows; no padded copy of the
+        input or of the result is ever allocated. `bounds` reuses an earlier plan().
+        """
+        h, w = image.shape[:2]
+        source = StripStore(image)
+        result = out if out is not None else np.empty(image.shape, dtype=np.uint8)
+        if bounds is None:
+            tile_height, bounds = self.plan(h, w, source)
+        else:
+            tile_height = max(y1 - y0 for y0, y1 in bounds)
+        batches = [bounds[i:i + self.batch_size] for i in range(0, len(bounds), self.batch_size)]
+
+        overlap_rows = sum(max(0, prev[1] - cur[0]) for prev, cur in zip(bounds, bounds[1:]))
+        logger.info(f"Tile engine [Job: {job_id}]: {len(bounds)} tiles of {tile_height}px, overlap {self.overlap}, workers {self.workers}",
+                    extra={"job_id": job_id, "extra": {"tiles": len(bounds), "tile_height": tile_height, "width": w, "height": h,
+                                                       "overlap_rows": overlap_rows}})
+
+        def run_batch(batch_bounds):
+            tiles = [source.read_window(y0, y1) for y0, y1 in batch_bounds]
+            return self._run_processor(tiles, batch_bounds)
+
+        def iter_tiles():
+            for batch_results in self.executor.map_ordered(run_batch, batches):
+                yield from batch_results
+
+        # Tiles are processed concurrently; the overlap merge stays in strict y-order
+        total_count = 0
+        page_boxes: List[Dict[str, Any]] = []
+        prev_end = 0
+        prev_rects: List[Rect] = []
+        for tile_idx, ((y_start, y_end), (cleaned_tile, tile_count, boxes, rects)) in enumerate(zip(bounds, iter_tiles())):
+            total_count += tile_count
+            page_boxes.extend(boxes)
+            rects = [(x1, y1 + y_start, x2, y2 + y_start) for x1, y1, x2, y2 in rects]
+            with stage("blend", tile=tile_idx):
+                self._merge(result, cleaned_tile, y_start, y_end, h, prev_end, job_id=job_id,
+                            prev_rects=prev_rects, rects=rects)
+            prev_end, prev_rects = y_end, rects
+
+            del cleaned_tile
+
+            if progress is not None:
+                progress({"type": "tile", "tile": tile_idx + 1, "tiles": len(bounds), "cleaned": tile_count})
+
+        # Tile buffers are plain numpy arrays freed by refcount; one sweep per page is enough
+        gc.collect()
+        return result, total_count, page_boxes
+
+    def _merge(self, result: np.ndarray, tile: np.ndarray, y_start: int, y_end: int, h: int, prev_end: int, job_id: str,
+               prev_rects: Sequence[Rect] = (), rects: Sequence[Rect] = ()):
+        """
+        Writes one tile into the result, cross-fading the rows it shares with the previous
+        tile (none after a clean cut). Rects (page coordinates) mark pixels one tile is
+        authoritative for. Rows past the real strip (bottom padding) are never stored.
+        """
+        w = result.shape[1]
+        if y_start >= h:
+            return
+
+        act = min(max(0, prev_end - y_start), y_end - y_start)
+        blend_end = min(y_start + act, h)
+        alpha = np.linspace(0, 1, act).reshape(-1, 1, 1).astype(np.float32)[0:blend_end - y_start]
+        base = result[y_start:blend_end, 0:w].astype(np.float32)
+        new = tile[0:blend_end - y_start, 0:w].astype(np.float32)
+
+        free = None
+        owned = [(r, 0.0) for r in prev_rects] + [(r, 1.0) for r in rects]
+        owned = [(r, a) for r, a in owned if r[1] < blend_end and r[3] > y_start]
+        if owned:
+            alpha = np.repeat(alpha, w, axis=1)
+            free = np.ones(alpha.shape[:2], dtype=bool)
+            for (x1, y1, x2, y2), value in owned:
+                rows = slice(max(y1, y_start) - y_start, min(y2, blend_end) - y_start)
+                alpha[rows, x1:x2] = value
+                free[rows, x1:x2] = False
+        self._check_seam(base if free is None else base[free], new if free is None else new[free], y_start, job_id)
+
+        # Rounded, not truncated: identical tiles must merge back to the same pixels
+        blend = (base * (1-alpha) + new * alpha + 0.5).astype(np.uint8)
+        result[y_start:blend_end, 0:w] = blend
+        if y_start + act < min(y_end, h):
+            result[y_start+act : min(y_end, h), 0:w] = tile[act:min(y_end, h) - y_start, 0:w]
+
+    def _check_seam(self, base: np.ndarray, new: np.ndarray, y_start: int, job_id: str):
+        """Both tiles cleaned the shared rows independently: a large disagreement means a visible seam."""
+        if base.size == 0 or self.seam_threshold is None:
+            return
+        diff = float(np.mean(np.abs(base - new)))
+        if diff <= self.seam_threshold:
+            return
+        msg = f"Tile seam at y={y_start}: mean overlap difference {diff:.2f} exceeds {self.seam_threshold}"
+        if self.seam_policy == "raise":
+            logger.error(msg, extra={"job_id": job_id})
+            raise TileSeamError(msg)
+        logger.warning(msg, extra={"job_id": job_id})
+
+    def process_webtoon(self, image: np.ndarray, overlap: Optional[int] = None) -> np.ndarray:
+        """Processes an ultra-tall image using streaming tiles (result image only)."""
+        if overlap is not None:
+            self.overlap = overlap
+        result, _, _ = self.run(image)
+        return result
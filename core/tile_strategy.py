@@ -1,7 +1,9 @@
 # core/tile_strategy.py
 
 import math
+import numpy as np
 import psutil
+from typing import Callable, Iterator, Optional, Tuple
 from config.settings import settings
 
 
@@ -48,3 +50,52 @@ def generate_vertical_tiles(image_height, tile_height, overlap=OVERLAP):
             break
 
         y = end - overlap
+
+
+def row_profile(rows: np.ndarray) -> np.ndarray:
+    """Per-row pixel range (max - min, any channel): 0 on gutters and flat fills, high on ink."""
+    row_range = rows.max(axis=1).astype(np.int16) - rows.min(axis=1)
+    if row_range.ndim == 2:
+        row_range = row_range.max(axis=1)
+    return row_range
+
+
+def find_cut(profile: np.ndarray, min_flat: int, tolerance: int) -> Optional[int]:
+    """
+    Index of the best cut in a row profile: the centre of the lowest flat run
+    (at least `min_flat` rows within `tolerance`), so the tile stays as close to
+    the target height as possible. None if the window has no such run.
+    """
+    flat = np.concatenate(([0], (profile <= tolerance).astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(flat))
+    for y0, y1 in reversed(list(zip(edges[0::2], edges[1::2]))):
+        if y1 - y0 >= min_flat:
+            return int((y0 + y1) // 2)
+    return None
+
+
+def generate_text_aware_tiles(read_rows: Callable[[int, int], np.ndarray], image_height: int, tile_height: int,
+                              overlap: int = OVERLAP, search: int = 512, min_flat: int = 24,
+                              tolerance: int = 24) -> Iterator[Tuple[int, int]]:
+    """
+    Like generate_vertical_tiles, but each boundary is moved up into a flat band (gutter,
+    blank panel) within `search` rows of the target height. Nothing is drawn across such a
+    band, so the next tile starts right at the cut with no overlap: no balloon is split and
+    no rows are detected/inpainted twice. Where no band exists the fixed cut with `overlap`
+    is kept. Only the search windows are read (`read_rows(y0, y1)`), not the whole strip.
+    """
+    y = 0
+    while y < image_height:
+        target = y + tile_height
+        if target >= image_height:
+            yield y, image_height
+            break
+
+        lo = max(target - search, y + tile_height // 2)
+        cut = find_cut(row_profile(read_rows(lo, target)), min_flat, tolerance)
+        if cut is None:
+            yield y, target
+            y = target - overlap
+        else:
+            yield y, lo + cut
+            y = lo + cut
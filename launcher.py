@@ -1,6 +1,7 @@
 import unittest
 import sys
 import os
+import multiprocessing
 
 # Ensure the root directory is in sys.path
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
@@ -8,4 +9,6 @@ sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 from launcher.main import main
 
 if __name__ == "__main__":
+    # Required for the job queue worker processes (spawn) in the frozen build
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,123 @@
+# scripts/bench_binary_api.py
+"""
+Compares the base64 JSON APIs with their /api/bin/ binary variants.
+
+Offline (default): measures request/response payload size and the server-side
+decode + encode cost of both transports for a page.
+Live (--url): also times round trips of /api/save_image_to_session against
+/api/bin/save_image_to_session on a running server (cheap endpoint: the numbers
+are dominated by transport, which is what differs).
+
+    python scripts/bench_binary_api.py --image page.png
+    python scripts/bench_binary_api.py --image page.png --url http://127.0.0.1:8000
+"""
+
+import sys
+import json
+import time
+import base64
+import argparse
+import statistics
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+
+def synthetic_page(height: int = 6000, width: int = 800) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    page = np.full((height, width, 3), 245, dtype=np.uint8)
+    for y in range(0, height, 400):
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv2.rectangle(page, (20, y + 20), (width - 20, y + 300), color, -1)
+        cv2.ellipse(page, (width // 2, y + 160), (200, 90), 0, 0, 360, (255, 255, 255), -1)
+        cv2.putText(page, "SAMPLE TEXT", (width // 2 - 150, y + 170), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 3)
+    return page
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def offline(png: bytes, repeat: int) -> dict:
+    img = cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_COLOR)
+    body_b64 = json.dumps({"image": "data:image/png;base64," + base64.b64encode(png).decode("ascii")}).encode("utf-8")
+
+    def decode_b64():
+        req = json.loads(body_b64)
+        data = req["image"].split(",")[1]
+        cv2.imdecode(np.frombuffer(base64.b64decode(data), np.uint8), cv2.IMREAD_COLOR)
+
+    def decode_bin():
+        cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_COLOR)
+
+    def encode_b64():
+        _, buffer = cv2.imencode(".png", img)
+        json.dumps({"result": "data:image/png;base64," + base64.b64encode(buffer).decode("utf-8")})
+
+    def encode_bin():
+        cv2.imencode(".png", img)[1].tobytes()
+
+    webp = cv2.imencode(".webp", img, [cv2.IMWRITE_WEBP_QUALITY, 101])[1]
+    return {
+        "request_bytes": {"base64_json": len(body_b64), "binary": len(png)},
+        "response_bytes": {"base64_json": len(body_b64), "png": len(png), "webp_lossless": len(webp)},
+        "decode_ms": {"base64_json": round(timed(decode_b64, repeat), 2), "binary": round(timed(decode_bin, repeat), 2)},
+        "encode_ms": {"base64_json": round(timed(encode_b64, repeat), 2), "binary": round(timed(encode_bin, repeat), 2)},
+    }
+
+
+def live(url: str, png: bytes, repeat: int) -> dict:
+    import requests
+
+    data_url = "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+    session = "bench_binary_api"
+
+    def post_b64():
+        requests.post(f"{url}/api/save_image_to_session",
+                      json={"session": session, "filename": "b64.png", "image": data_url}).raise_for_status()
+
+    def post_bin():
+        requests.post(f"{url}/api/bin/save_image_to_session",
+                      params={"session": session, "filename": "bin.png"},
+                      data=png, headers={"Content-Type": "image/png"}).raise_for_status()
+
+    def post_multipart():
+        requests.post(f"{url}/api/bin/save_image_to_session",
+                      data={"session": session, "filename": "multipart.png"},
+                      files={"image": ("page.png", png, "image/png")}).raise_for_status()
+
+    return {"round_trip_ms": {
+        "base64_json": round(timed(post_b64, repeat), 2),
+        "binary_raw": round(timed(post_bin, repeat), 2),
+        "binary_multipart": round(timed(post_multipart, repeat), 2),
+    }}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", help="Page to send (default: synthetic 800x6000 strip)")
+    parser.add_argument("--url", help="Base URL of a running server for live round trips")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.image:
+        png = cv2.imencode(".png", cv2.imread(args.image, cv2.IMREAD_COLOR))[1].tobytes()
+    else:
+        png = cv2.imencode(".png", synthetic_page())[1].tobytes()
+
+    report = offline(png, args.repeat)
+    if args.url:
+        report.update(live(args.url.rstrip("/"), png, args.repeat))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# scripts/bench_detect_scale.py
+"""
+Recall and detection time of the downscaled CRAFT pass (OCR_DETECT_SCALE).
+
+Every page is detected at each scale, with and without the full-res refinement.
+Recall = share of reference boxes covered (>= 50% of their area) by a detected box.
+References come from <page>.json next to each fixture image (a list of OCR boxes,
+{"box": [[x, y], ...]}), or from the full-resolution detection when there is none.
+Without --fixtures, synthetic 1800px wide pages with rendered dialogue are used.
+Needs EasyOCR and its weights.
+
+    python scripts/bench_detect_scale.py --scales 1.0 0.75 0.5 --repeat 2
+    python scripts/bench_detect_scale.py --fixtures path/to/pages
+"""
+
+import sys
+import json
+import time
+import argparse
+import statistics
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config.settings import settings
+from core.detection_index import box_rect, rect_containment
+from core.detector import TextDetector
+from core.pipeline import MangaCleanerPipeline
+
+
+def synthetic_pages(count: int = 3, seed: int = 0):
+    """Screentoned 1800x2400 pages with dialogue of several sizes; yields (name, page, reference boxes)."""
+    rng = np.random.default_rng(seed)
+    for n in range(count):
+        h, w = 2400, 1800
+        page = np.full((h, w, 3), 245, dtype=np.uint8)
+        yy, xx = np.mgrid[0:h, 0:w]
+        page[((xx // 5 + yy // 5) % 7 == 0)] = 200
+        boxes = []
+        for _ in range(8):
+            scale = float(rng.uniform(0.8, 2.2))
+            label = "WHERE DID YOU GO?" if rng.random() < 0.5 else "I TOLD YOU ALREADY"
+            (tw, th), base = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, scale, 2)
+            x = int(rng.integers(40, w - tw - 40))
+            y = int(rng.integers(th + 40, h - 40))
+            cv2.ellipse(page, (x + tw // 2, y - th // 2), (tw // 2 + 40, th + 30), 0, 0, 360, (255, 255, 255), -1)
+            cv2.putText(page, label, (x, y), cv2.FONT_HERSHEY_SIMPLEX, scale, (20, 20, 20), 2)
+            boxes.append({"box": [[x, y - th], [x + tw, y - th], [x + tw, y + base], [x, y + base]]})
+        yield f"synthetic_{n}", page, boxes
+
+
+def fixture_pages(folder: Path):
+    for path in sorted(folder.iterdir()):
+        if path.suffix.lower() not in (".png", ".jpg", ".jpeg", ".webp"):
+            continue
+        page = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        if page is None:
+            continue
+        truth = path.with_suffix(".json")
+        yield path.stem, page, json.loads(truth.read_text()) if truth.exists() else None
+
+
+def recall(reference, detected) -> float:
+    if not reference:
+        return 1.0
+    rects = [box_rect(b) for b in detected]
+    hits = sum(1 for ref in reference if any(rect_containment(box_rect(ref), r) >= 0.5 for r in rects))
+    return hits / len(reference)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", type=Path, help="Folder of page images (+ optional <page>.json references)")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1.0, 0.75, 0.5, 0.35])
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    detector = TextDetector()
+    prepare = MangaCleanerPipeline._preprocess_for_ocr
+    pages = list(fixture_pages(args.fixtures) if args.fixtures else synthetic_pages())
+    if not pages:
+        print("No fixture images found")
+        sys.exit(1)
+
+    inputs = [(name, prepare(None, page), truth) for name, page, truth in pages]
+    # Full-resolution detection is the reference wherever no ground truth was given
+    inputs = [
+        (name, img, truth if truth is not None else detector.detect_batch([img], recognize=False, scale=1.0)[0])
+        for name, img, truth in inputs
+    ]
+
+    report = {"pages": len(inputs), "runs": []}
+    for scale in args.scales:
+        for refine in ([False] if scale >= 1 else [False, True]):
+            settings.OCR_DETECT_REFINE = refine
+            samples, recalls = [], []
+            for _, img, reference in inputs:
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    boxes = detector.detect_batch([img], recognize=False, scale=scale)[0]
+                    samples.append(time.perf_counter() - start)
+                recalls.append(recall(reference, boxes))
+            report["runs"].append({
+                "scale": scale,
+                "refine": refine,
+                "detect_ms_per_page": round(statistics.median(samples) * 1000, 1),
+                "recall": round(statistics.mean(recalls), 4),
+            })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+# scripts/bench_pipeline.py
+"""
+Reproducible throughput benchmark of the cleaning stack.
+
+Deterministic synthetic webtoon strips (gradient panels, screentone, speed lines,
+white gutters, balloons with rendered dialogue; same seed = same pixels) are run through:
+
+    process_core        MangaCleanerPipeline._process_core, OCR stubbed (see StubDetector)
+    ultra_inpaint_area  LaMa + frequency refinement (skipped when the model isn't installed)
+    hybrid_cleaner      experimental_hybrid_cleaner.HybridCleaner.process
+    frequency_roi       FrequencySeparation.process_roi
+
+For each case: median wall time, pixels/s, per-stage time (core/profiler.py) and peak
+RSS growth during the run. Results are written as JSON; --compare flags regressions
+against an earlier run and exits with status 1 if any case got slower than --tolerance.
+
+    python scripts/bench_pipeline.py --out bench/base.json
+    python scripts/bench_pipeline.py --out bench/new.json --compare bench/base.json
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import threading
+import statistics
+import subprocess
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from unittest.mock import MagicMock
+
+import cv2
+import numpy as np
+import psutil
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+# OCR is stubbed: the suite measures our pipeline, not EasyOCR (which may not even be installed)
+sys.modules.setdefault("easyocr", MagicMock())
+
+from config.settings import settings
+from core.pipeline import MangaCleanerPipeline
+from core.profiler import profiling
+
+STRIP_SIZES = [(800, 4000), (720, 12000), (1600, 8000)]
+QUICK_SIZES = [(720, 3000)]
+DIALOGUE = ["WHERE ARE YOU GOING?", "I TOLD YOU ALREADY", "WAIT!!", "THIS CAN'T BE HAPPENING", "...HUH?"]
+
+
+def synthetic_strip(width: int, height: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """A deterministic webtoon strip and the mask of its rendered text."""
+    rng = np.random.default_rng(seed)
+    strip = np.full((height, width, 3), 255, dtype=np.uint8)
+    text_mask = np.zeros((height, width), dtype=np.uint8)
+    xx = np.arange(width, dtype=np.float32)
+
+    y = 0
+    while y < height:
+        gutter = int(rng.integers(60, 200))
+        panel_h = min(int(rng.integers(600, 1400)), height - y - gutter)
+        y += gutter
+        if panel_h < 200:
+            break
+        top, bottom = y, y + panel_h
+
+        # Gradient panel with a screentone overlay
+        c0, c1 = rng.integers(60, 230, 3), rng.integers(60, 230, 3)
+        t = np.linspace(0, 1, panel_h, dtype=np.float32)[:, None, None]
+        strip[top:bottom] = (c0 * (1 - t) + c1 * t).astype(np.uint8)
+        yy = np.arange(panel_h, dtype=np.float32)[:, None]
+        period = int(rng.integers(5, 9))
+        dots = ((np.sin(xx * np.pi / period) * np.sin(yy * np.pi / period)) > 0.7)
+        strip[top:bottom][dots] = (strip[top:bottom][dots] * 0.75).astype(np.uint8)
+
+        # Speed lines
+        for _ in range(int(rng.integers(10, 40))):
+            x1 = int(rng.integers(0, width))
+            y1 = int(rng.integers(top, bottom))
+            x2 = x1 + int(rng.integers(-80, 80))
+            y2 = min(bottom - 1, y1 + int(rng.integers(80, 300)))
+            cv2.line(strip, (x1, y1), (x2, y2), (255, 255, 255), 1)
+
+        # Balloons with dialogue
+        for _ in range(int(rng.integers(1, 4))):
+            label = DIALOGUE[int(rng.integers(0, len(DIALOGUE)))]
+            scale = float(rng.uniform(0.7, 1.4))
+            (tw, th), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, scale, 2)
+            if tw + 80 >= width or th * 3 + 80 >= panel_h:
+                continue
+            x = int(rng.integers(40, width - tw - 40))
+            ty = int(rng.integers(top + th + 40, bottom - 40))
+            cv2.ellipse(strip, (x + tw // 2, ty - th // 2), (tw // 2 + 30, th + 24), 0, 0, 360, (255, 255, 255), -1)
+            cv2.ellipse(strip, (x + tw // 2, ty - th // 2), (tw // 2 + 30, th + 24), 0, 0, 360, (0, 0, 0), 2)
+            cv2.putText(strip, label, (x, ty), cv2.FONT_HERSHEY_SIMPLEX, scale, (15, 15, 15), 2, cv2.LINE_AA)
+            cv2.putText(text_mask, label, (x, ty), cv2.FONT_HERSHEY_SIMPLEX, scale, 255, 6)
+        y = bottom
+    return strip, text_mask
+
+
+class StubDetector:
+    """
+    Deterministic stand-in for EasyOCR: dark strokes on light surroundings, joined into
+    lines. Works on whatever the pipeline hands it (CLAHE grey, band-packed tiles).
+    """
+
+    def detect_batch(self, tiles: List[np.ndarray], job_id: str = "unknown", threshold: Optional[float] = None,
+                     recognize: bool = True, scale: Optional[float] = None) -> List[List[Dict]]:
+        results = []
+        for tile in tiles:
+            grey = tile if tile.ndim == 2 else cv2.cvtColor(tile, cv2.COLOR_BGR2GRAY)
+            dark = (grey < 60).astype(np.uint8) * 255
+            lines = cv2.dilate(dark, cv2.getStructuringElement(cv2.MORPH_RECT, (25, 7)))
+            contours, _ = cv2.findContours(lines, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            boxes = []
+            for contour in contours:
+                x, y, w, h = cv2.boundingRect(contour)
+                if 10 <= h <= 120 and w >= 2 * h:
+                    pts = [[float(x), float(y)], [float(x + w), float(y)], [float(x + w), float(y + h)], [float(x), float(y + h)]]
+                    boxes.append({"box": pts, "text": None, "confidence": None})
+            results.append(boxes)
+        return results
+
+
+class RSSSampler:
+    """Peak RSS growth (MB) of this process while the block runs, sampled every few ms."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.process = psutil.Process(os.getpid())
+        self.peak_mb = 0.0
+
+    def __enter__(self):
+        self._base = self.process.memory_info().rss
+        self._peak = self._base
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._peak = max(self._peak, self.process.memory_info().rss)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._peak = max(self._peak, self.process.memory_info().rss)
+        self.peak_mb = round((self._peak - self._base) / 1024**2, 2)
+
+
+def measure(name: str, fn: Callable[[], object], pixels: int, repeat: int) -> Dict:
+    fn()  # Warm-up: lazy engines, caches, first-touch allocations
+    samples, rss, stages = [], [], {}
+    for i in range(repeat):
+        with RSSSampler() as sampler, profiling(f"bench_{name}_{i}", enabled=True) as prof:
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+        rss.append(sampler.peak_mb)
+        for stage, summary in prof.report(records=False)["stages"].items():
+            stages.setdefault(stage, []).append(summary["total_ms"])
+    median = statistics.median(samples)
+    return {
+        "pixels": pixels,
+        "median_ms": round(median * 1000, 2),
+        "min_ms": round(min(samples) * 1000, 2),
+        "mpix_per_s": round(pixels / median / 1e6, 3),
+        "peak_rss_mb": max(rss),
+        "stages_ms": {stage: round(statistics.median(values), 2) for stage, values in sorted(stages.items())},
+    }
+
+
+def run_suite(sizes: List[Tuple[int, int]], repeat: int, seed: int) -> Dict[str, Dict]:
+    cases: Dict[str, Dict] = {}
+
+    pipeline = MangaCleanerPipeline()
+    pipeline.result_cache = None
+    pipeline.detector = StubDetector()
+    for width, height in sizes:
+        strip, _ = synthetic_strip(width, height, seed)
+        cases[f"process_core_{width}x{height}"] = measure(
+            "process_core", lambda: pipeline._process_core(strip, job_id="bench"), width * height, repeat
+        )
+
+    panel, mask = synthetic_strip(800, 1200, seed + 1)
+    mask = cv2.dilate(mask, np.ones((5, 5), np.uint8))
+    pixels = panel.shape[0] * panel.shape[1]
+
+    from experimental_hybrid_cleaner.hybrid_cleaner import HybridCleaner
+    hybrid = HybridCleaner()
+    cases["hybrid_cleaner_800x1200"] = measure("hybrid_cleaner", lambda: hybrid.process(panel, mask), pixels, repeat)
+
+    try:
+        from core.advanced_inpaint import FrequencySeparation, get_lama_engine, ultra_inpaint_area
+    except ImportError as e:
+        skipped = {"skipped": f"core.advanced_inpaint unavailable: {e}"}
+        cases["frequency_roi_800x1200"] = cases["ultra_inpaint_area_800x1200"] = skipped
+        return cases
+
+    freq = FrequencySeparation()
+    cases["frequency_roi_800x1200"] = measure("frequency_roi", lambda: freq.process_roi(panel, mask), pixels, repeat)
+    if get_lama_engine().warm():
+        cases["ultra_inpaint_area_800x1200"] = measure(
+            "ultra_inpaint_area", lambda: ultra_inpaint_area(panel, mask), pixels, repeat
+        )
+    else:
+        cases["ultra_inpaint_area_800x1200"] = {"skipped": "LaMa model not installed (scripts/install_ultra.py)"}
+    return cases
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=Path(__file__).parent.parent, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {key: getattr(settings, key) for key in (
+            "TILE_HEIGHT", "TILE_OVERLAP", "TILE_WORKERS", "TILE_SMART_CUTS", "OCR_BATCH_SIZE",
+            "PREFILTER_ENABLED", "INPAINT_TILE_MODE", "STRIP_STORAGE_MODE",
+        )},
+    }
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Prints the per-case change in median time. Returns the cases slower than the tolerance."""
+    regressions = []
+    print(f"{'case':40} {'base ms':>10} {'new ms':>10} {'change':>8}")
+    for name, case in current["cases"].items():
+        base = baseline.get("cases", {}).get(name)
+        if not base or "median_ms" not in base or "median_ms" not in case:
+            print(f"{name:40} {'-':>10} {case.get('median_ms', '-'):>10} {'n/a':>8}")
+            continue
+        change = case["median_ms"] / base["median_ms"] - 1
+        flag = "  REGRESSION" if change > tolerance else ""
+        print(f"{name:40} {base['median_ms']:>10} {case['median_ms']:>10} {change:>+8.1%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", type=Path, help="Write the JSON report here")
+    parser.add_argument("--compare", type=Path, help="Earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed slowdown before a case counts as a regression")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quick", action="store_true", help="One small strip (smoke run)")
+    args = parser.parse_args()
+
+    report = {"environment": environment(), "seed": args.seed,
+              "cases": run_suite(QUICK_SIZES if args.quick else STRIP_SIZES, args.repeat, args.seed)}
+    text = json.dumps(report, indent=2)
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(text)
+    else:
+        print(text)
+
+    if args.compare:
+        regressions = compare(report, json.loads(args.compare.read_text()), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
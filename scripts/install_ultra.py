@@ -18,8 +18,9 @@ def main():
     print("[+] Isso pode demorar dependendo da sua internet.")
     
     try:
-        # A função get_lama_engine() já chama _load_model() que faz o download se não existir
+        # warm() chama _load_model(), que faz o download se não existir e cria o pool de sessões
         engine = get_lama_engine()
+        engine.warm()
         
         if engine.is_available():
             print("\n======================================================")
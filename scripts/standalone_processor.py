@@ -14,6 +14,7 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from core.pipeline import MangaCleanerPipeline
 from core.logger import logger
+from core.profiler import profiling, stage
 
 def natural_sort_key(s):
     """
@@ -54,19 +55,23 @@ def run_batch_processing(input_dir: str, output_dir: str):
         logger.info(f"[{i}/{len(image_files)}] Processing: {filename}")
         
         try:
-            # 3. Memory-Safe Load
-            image = cv2.imread(input_path)
-            if image is None:
-                logger.error(f"CORRUPT: Skipping {filename}")
-                fail_count += 1
-                continue
-            
-            # 4. Professional Streaming Pipeline (Includes Verification Pass)
+            # Per-stage timing report when PROFILE_ENABLED is set
             job_id = f"v2_{int(time.time())}_{i}"
-            result = pipeline.process_webtoon_streaming(image, job_id=job_id, threshold=0.20)
-            
-            # 5. Optimized Save
-            cv2.imwrite(output_path, result, [cv2.IMWRITE_PNG_COMPRESSION, 3])
+            with profiling(job_id):
+                # 3. Memory-Safe Load
+                with stage("decode"):
+                    image = cv2.imread(input_path)
+                if image is None:
+                    logger.error(f"CORRUPT: Skipping {filename}")
+                    fail_count += 1
+                    continue
+                
+                # 4. Professional Streaming Pipeline (Includes Verification Pass)
+                result = pipeline.process_webtoon_streaming(image, job_id=job_id)
+                
+                # 5. Optimized Save
+                with stage("encode"):
+                    cv2.imwrite(output_path, result, [cv2.IMWRITE_PNG_COMPRESSION, 3])
             
             # 6. AGGRESSIVE CLEANUP
             del image
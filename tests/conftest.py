@@ -0,0 +1,21 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# Set before any test module imports config.settings (pipelines built at import time, e.g.
+# web_app.main, read it then): cleaned pages never land in the repo's ./cache
+_CACHE_DIR = tempfile.mkdtemp(prefix="result-cache-")
+os.environ["RESULT_CACHE_DIR"] = _CACHE_DIR
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_CACHE_DIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def isolated_result_cache(tmp_path, monkeypatch):
+    """Pipelines created inside a test cache into that test's tmp_path."""
+    from config.settings import settings
+    monkeypatch.setattr(settings, "RESULT_CACHE_DIR", str(tmp_path / "result_cache"))
@@ -0,0 +1,71 @@
+import numpy as np
+import cv2
+from core.balloon_analyzer import BalloonAnalyzer
+
+
+def _reference(tile, box_item):
+    """Scalar per-box path of the V21.0 loop, kept here as the ground truth."""
+    h, w = tile.shape[:2]
+    pts = np.array(box_item["box"], dtype=np.int32)
+    rx, ry, bw, bh = cv2.boundingRect(pts)
+    rx, ry = max(0, rx), max(0, ry)
+    if (bw * bh) > (h * w * 0.15):
+        return None
+    roi_bg = tile[max(0, ry - 12):min(h, ry + bh + 12), max(0, rx - 12):min(w, rx + bw + 12)]
+    borders = np.concatenate([roi_bg[0, :], roi_bg[-1, :], roi_bg[:, 0], roi_bg[:, -1]], axis=0).astype(np.int32)
+    median_c = np.median(borders, axis=0).astype(np.int32)
+    uniform_ratio = np.mean(np.sum(np.abs(borders - median_c), axis=-1) < 60)
+    if uniform_ratio <= 0.65:
+        return False, uniform_ratio, None, None
+    x1, y1 = max(0, rx - 5), max(0, ry - 5)
+    x2, y2 = min(w, rx + bw + 5), min(h, ry + bh + 5)
+    bg_luminance = int(median_c.sum())
+    roi_luminance = np.sum(tile[y1:y2, x1:x2].astype(np.int32), axis=-1)
+    if bg_luminance > 380:
+        mask = (roi_luminance < bg_luminance - 40).astype(np.uint8) * 255
+    else:
+        mask = (roi_luminance > bg_luminance + 40).astype(np.uint8) * 255
+    mask = cv2.dilate(mask, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5)), iterations=1)
+    return True, uniform_ratio, (x1, y1, x2, y2), mask
+
+
+def _synthetic_tile(seed):
+    rng = np.random.default_rng(seed)
+    tile = rng.integers(0, 255, (600, 400, 3), dtype=np.uint8)
+    boxes = []
+    for i, (x, y) in enumerate([(20, 20), (220, 30), (40, 300), (230, 320), (380, 560)]):
+        bw, bh = int(rng.integers(40, 120)), int(rng.integers(20, 60))
+        fill = 250 if i % 2 == 0 else 15
+        if i != 2:  # box 2 stays on noise (textured background)
+            tile[max(0, y - 20):y + bh + 20, max(0, x - 20):x + bw + 20] = fill
+            tile[y + 5:y + bh - 5, x + 5:x + bw - 5:3] = 255 - fill
+        boxes.append({"box": [[x, y], [x + bw - 1, y], [x + bw - 1, y + bh - 1], [x, y + bh - 1]]})
+    boxes.append({"box": [[0, 0], [399, 0], [399, 599], [0, 599]]})  # too large
+    return tile, boxes
+
+
+def test_batched_analysis_matches_scalar_path():
+    analyzer = BalloonAnalyzer()
+    for seed in range(5):
+        tile, boxes = _synthetic_tile(seed)
+        tile_mask, decisions = analyzer.analyze(tile, boxes)
+        assert len(decisions) == len(boxes)
+
+        for box_item, decision in zip(boxes, decisions):
+            expected = _reference(tile, box_item)
+            if expected is None:
+                assert decision["accepted"] is False and decision["reason"] == "area"
+                continue
+            accepted, ratio, rect, mask = expected
+            assert decision["accepted"] == accepted
+            assert abs(decision["uniform_ratio"] - ratio) < 1e-9
+            if accepted:
+                assert decision["rect"] == rect
+                x1, y1, x2, y2 = rect
+                assert np.array_equal(tile_mask[y1:y2, x1:x2], mask)
+
+
+def test_no_boxes_returns_empty_mask():
+    tile_mask, decisions = BalloonAnalyzer().analyze(np.zeros((50, 60, 3), np.uint8), [])
+    assert tile_mask.shape == (50, 60) and not tile_mask.any()
+    assert decisions == []
@@ -0,0 +1,116 @@
+import sys
+import asyncio
+import base64
+from unittest.mock import MagicMock
+
+# Module-level Mocking: the endpoints are exercised with a stubbed pipeline
+sys.modules.setdefault("easyocr", MagicMock())
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import web_app.main as web_main
+from core.exceptions import InvalidImageError
+from web_app.binary_io import decode_image, encode_image, mask_to_binary
+
+client = TestClient(web_main.app)
+
+
+def _png(img):
+    return cv2.imencode(".png", img)[1].tobytes()
+
+
+def test_encode_decode_round_trip_is_lossless():
+    img = np.random.default_rng(1).integers(0, 255, (40, 30, 3), dtype=np.uint8)
+    for fmt in ("png", "webp"):
+        payload, media_type = encode_image(img, fmt)
+        assert media_type == f"image/{fmt}"
+        assert np.array_equal(decode_image(payload), img)
+
+
+def test_decode_rejects_garbage():
+    with pytest.raises(InvalidImageError):
+        decode_image(b"not an image")
+
+
+def test_mask_alpha_channel_is_binarized():
+    rgba = np.zeros((4, 4, 4), dtype=np.uint8)
+    rgba[1:3, 1:3, 3] = 200
+    mask = mask_to_binary(rgba)
+    assert mask.shape == (4, 4)
+    assert set(np.unique(mask)) == {0, 255}
+    assert mask[1, 1] == 255
+
+
+def test_bin_auto_clean_page_multipart_and_raw(monkeypatch):
+    img = np.full((32, 32, 3), 200, dtype=np.uint8)
+    monkeypatch.setattr(web_main.pipeline, "_process_core", lambda image, job_id: (255 - image, 3))
+
+    multipart = client.post("/api/bin/auto_clean_page", files={"image": ("p.png", _png(img), "image/png")})
+    raw = client.post("/api/bin/auto_clean_page?format=webp", content=_png(img), headers={"Content-Type": "image/png"})
+
+    assert multipart.status_code == 200
+    assert multipart.headers["content-type"] == "image/png"
+    assert multipart.headers["x-cleaned-count"] == "3"
+    assert np.array_equal(decode_image(multipart.content), 255 - img)
+    assert raw.headers["content-type"] == "image/webp"
+    assert np.array_equal(decode_image(raw.content), 255 - img)
+
+
+def test_bin_auto_clean_page_invalid_image():
+    response = client.post("/api/bin/auto_clean_page", content=b"xx", headers={"Content-Type": "image/png"})
+    assert response.status_code == 400
+
+
+def test_bin_save_image_to_session(monkeypatch, tmp_path):
+    monkeypatch.setattr(web_main, "OUTPUT_DIR", str(tmp_path))
+    payload = _png(np.zeros((8, 8, 3), dtype=np.uint8))
+    response = client.post(
+        "/api/bin/save_image_to_session",
+        data={"session": "s1", "filename": "page.png"},
+        files={"image": ("page.png", payload, "image/png")},
+    )
+    assert response.status_code == 200
+    assert (tmp_path / "s1" / "after_page.png").read_bytes() == payload
+
+
+def test_bin_detect_balloons_tiles_tall_images(monkeypatch):
+    calls = []
+    monkeypatch.setattr(web_main.pipeline, "detect_page",
+                        lambda img, job_id, threshold: calls.append(img.shape) or
+                        ([{"box": [], "text": None}, {"box": [], "text": None}], {"duplicates_removed": 2}))
+    monkeypatch.setattr(web_main.settings, "OCR_DETECT_ONLY", True)
+    # Text is recognized by default (Smart OCR in the editor copies it); noise boxes are dropped
+    monkeypatch.setattr(web_main.pipeline.detector, "recognize",
+                        lambda img, boxes, job_id: [{**boxes[0], "text": "hello", "confidence": 0.8}, {**boxes[1], "text": "~", "confidence": 0.01}])
+    tall = np.full((web_main.settings.TILE_HEIGHT + 100, 40, 3), 255, dtype=np.uint8)
+    response = client.post("/api/bin/detect_balloons", files={"image": ("tall.png", _png(tall), "image/png")})
+    assert response.status_code == 200
+    assert response.json()["duplicates_removed"] == 2
+    assert [b["text"] for b in response.json()["balloons"]] == ["hello"]
+    assert calls == [tall.shape]
+
+    boxes_only = client.post("/api/bin/detect_balloons?with_text=false", files={"image": ("tall.png", _png(tall), "image/png")})
+    assert boxes_only.json()["balloons"][0]["text"] is None
+
+
+
+def _loop_running():
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def test_detect_balloons_runs_off_the_event_loop(monkeypatch):
+    seen = []
+    monkeypatch.setattr(web_main, "detect_balloons_payload",
+                        lambda img, with_text: seen.append(_loop_running()) or {"balloons": []})
+    page = np.full((40, 40, 3), 255, dtype=np.uint8)
+    client.post("/api/bin/detect_balloons", files={"image": ("p.png", _png(page), "image/png")})
+    client.post("/api/detect_balloons", json={"image": base64.b64encode(_png(page)).decode()})
+    # Worker threads have no running loop; the event loop thread would
+    assert seen == [False, False]
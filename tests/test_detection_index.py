@@ -0,0 +1,77 @@
+import sys
+from unittest.mock import MagicMock
+
+# Module-level Mocking: detection results are injected, the OCR backend is not needed
+sys.modules.setdefault("easyocr", MagicMock())
+
+import numpy as np
+from config.settings import settings
+from core.detection_index import DetectionIndex
+from core.pipeline import MangaCleanerPipeline
+
+
+def _box(x1, y1, x2, y2, confidence=0.9):
+    return {"box": [[x1, y1], [x2, y1], [x2, y2], [x1, y2]], "text": "t", "confidence": confidence}
+
+
+BOUNDS = [(0, 2048), (1928, 3976), (3856, 5000)]
+
+
+def test_overlap_duplicates_merge_and_get_one_owner():
+    index = DetectionIndex(BOUNDS, iou_threshold=0.3, containment=0.8)
+    index.add(0, [_box(10, 100, 200, 150), _box(10, 1950, 200, 2000)])
+    # Same balloon seen again by tile 1, plus one of its own
+    index.add(1, [_box(12, 1952, 201, 2001), _box(10, 2500, 200, 2550)])
+    index.add(2, [])
+
+    assert index.stats == {"detections": 4, "unique": 3, "duplicates_removed": 1}
+    assert len(index.owned_by(0)) == 2
+    assert len(index.owned_by(1)) == 1
+    assert [b["box"][0][1] for b in index.boxes] == [100, 1950, 2500]
+
+
+def test_cut_off_detection_keeps_the_complete_box():
+    index = DetectionIndex(BOUNDS, iou_threshold=0.3, containment=0.8)
+    # Tile 0 only saw the top of a balloon running past its bottom edge
+    index.add(0, [_box(10, 2000, 200, 2048)])
+    index.add(1, [_box(10, 2000, 200, 2090)])
+    assert index.stats["duplicates_removed"] == 1
+    assert index.owned_by(0) == []
+    assert index.owned_by(1)[0]["box"][2][1] == 2090
+
+
+def test_far_apart_boxes_are_not_merged():
+    index = DetectionIndex(BOUNDS, iou_threshold=0.3, containment=0.8)
+    index.add(0, [_box(10, 1950, 100, 2000)])
+    index.add(1, [_box(400, 1950, 500, 2000)])
+    assert index.stats["unique"] == 2
+
+
+def test_overlap_balloon_is_cleaned_once(monkeypatch):
+    monkeypatch.setattr(settings, "PREFILTER_ENABLED", False)
+    monkeypatch.setattr(settings, "TILE_SMART_CUTS", False)
+    monkeypatch.setattr(settings, "TILE_DYNAMIC_HEIGHT", False)
+    strip = np.random.default_rng(2).integers(0, 255, (3000, 300, 3), dtype=np.uint8)
+
+    pipeline = MangaCleanerPipeline()
+    pipeline.result_cache = None
+    pipeline.detector = MagicMock()
+    # Page rows 1950-1990 are inside both tiles: (0, 2048) and (1928, 3150)
+    pipeline.detector.detect_batch.side_effect = lambda tiles, **kw: [
+        [_box(40, 1950, 140, 1990)] if t.shape[0] == 2048 else [_box(40, 22, 140, 62)] for t in tiles
+    ]
+    analyzed = []
+
+    def analyze(tile, boxes):
+        analyzed.extend(boxes)
+        mask = np.zeros(tile.shape[:2], dtype=np.uint8)
+        return mask, [{"rect": (30, 1940, 150, 2000), "accepted": True}]
+
+    pipeline.balloon_analyzer = MagicMock(analyze=analyze)
+    pipeline.inpaint_engine = MagicMock()
+    pipeline.inpaint_engine.process_regions.side_effect = lambda tile, mask, rects: (np.zeros_like(tile), len(rects))
+
+    result, count, boxes = pipeline.clean_page(strip, job_id="dedup")
+    assert len(analyzed) == 1 and count == 1 and len(boxes) == 1
+    # The owner tile wins inside its cleaned rect, across the whole overlap
+    assert (result[1940:2000, 30:150] == 0).all()
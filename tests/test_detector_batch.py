@@ -0,0 +1,164 @@
+import sys
+from unittest.mock import MagicMock, patch
+
+# Module-level Mocking for the OCR backend
+sys.modules.setdefault("easyocr", MagicMock())
+
+import numpy as np
+from core.detector import TextDetector
+
+
+def _fake_reader():
+    reader = MagicMock()
+    box = [[1, 2], [30, 2], [30, 9000], [1, 9000]]
+    reader.readtext.side_effect = lambda img: [(box, "solo", 0.9)]
+    reader.readtext_batched.side_effect = lambda imgs: [[(box, f"b{i}", 0.8), (box, "low", 0.01)] for i, _ in enumerate(imgs)]
+    return reader
+
+
+def test_detect_batch_groups_equal_widths_into_one_pass():
+    detector = TextDetector()
+    reader = _fake_reader()
+    tiles = [np.zeros((2048, 300), np.uint8), np.zeros((2048, 300), np.uint8),
+             np.zeros((700, 300), np.uint8), np.zeros((2048, 500), np.uint8)]
+
+    with patch.object(TextDetector, "_ocr", reader), patch("core.detector.settings") as mock_settings:
+        mock_settings.OCR_BATCH_SIZE = 4
+        mock_settings.OCR_DETECT_SCALE = 1.0
+        results = detector.detect_batch(tiles, threshold=0.05)
+
+    # 3 tiles of width 300 share one pass, the 500-px tile runs alone
+    assert reader.readtext_batched.call_count == 1
+    assert reader.readtext.call_count == 1
+    batch = reader.readtext_batched.call_args[0][0]
+    assert all(img.shape == (2048, 300) for img in batch)
+    assert np.all(batch[2][700:] == 255)
+
+    assert len(results) == 4
+    assert [b["text"] for b in results[0]] == ["b0"]
+    assert results[3][0]["text"] == "solo"
+    # Boxes of the padded tile are clipped back into its real height
+    assert max(p[1] for p in results[2][0]["box"]) == 700.0
+
+
+def test_detect_batch_respects_batch_size():
+    detector = TextDetector()
+    reader = _fake_reader()
+    tiles = [np.zeros((64, 64), np.uint8) for _ in range(5)]
+
+    with patch.object(TextDetector, "_ocr", reader), patch("core.detector.settings") as mock_settings:
+        mock_settings.OCR_BATCH_SIZE = 2
+        mock_settings.OCR_DETECT_SCALE = 1.0
+        results = detector.detect_batch(tiles, threshold=0.05)
+
+    assert reader.readtext_batched.call_count == 2
+    assert reader.readtext.call_count == 1
+    assert len(results) == 5
+
+
+def test_detect_only_skips_recognition():
+    detector = TextDetector()
+    reader = MagicMock()
+    # EasyOCR detect(): per image, horizontal rects [x_min, x_max, y_min, y_max] and free polygons
+    reader.detect.side_effect = lambda img, **kw: (
+        [[[1, 30, 2, 9000]] for _ in range(len(img) if img.ndim == 4 else 1)],
+        [[[[5, 5], [9, 5], [9, 9], [5, 9]]] for _ in range(len(img) if img.ndim == 4 else 1)],
+    )
+    tiles = [np.zeros((2048, 300), np.uint8), np.zeros((700, 300), np.uint8), np.zeros((64, 500), np.uint8)]
+
+    with patch.object(TextDetector, "_ocr", reader), patch("core.detector.settings") as mock_settings:
+        mock_settings.OCR_BATCH_SIZE = 4
+        mock_settings.OCR_DETECT_SCALE = 1.0
+        results = detector.detect_batch(tiles, threshold=0.05, recognize=False)
+
+    assert not reader.readtext.called and not reader.readtext_batched.called
+    assert reader.detect.call_count == 2
+    batch = reader.detect.call_args_list[0].args[0]
+    assert batch.shape == (2, 2048, 300, 3)
+    assert [len(r) for r in results] == [2, 2, 2]
+    assert results[0][0] == {"box": [[1.0, 2.0], [30.0, 2.0], [30.0, 2048.0], [1.0, 2048.0]], "text": None, "confidence": None}
+    assert max(p[1] for p in results[1][0]["box"]) == 700.0
+
+
+def test_detect_only_reports_an_ignored_threshold_once(monkeypatch):
+    detector = TextDetector()
+    reader = MagicMock()
+    reader.detect.side_effect = lambda img, **kw: ([[[1, 30, 2, 20]]], [[]])
+    warnings = []
+    monkeypatch.setattr(TextDetector, "_threshold_noted", False)
+    monkeypatch.setattr("core.detector.logger.warning", lambda msg, **kw: warnings.append(msg))
+
+    with patch.object(TextDetector, "_ocr", reader), patch("core.detector.settings") as mock_settings:
+        mock_settings.OCR_BATCH_SIZE = 4
+        mock_settings.OCR_DETECT_SCALE = 1.0
+        loose = detector.detect_batch([np.zeros((64, 64), np.uint8)], threshold=0.05, recognize=False)
+        strict = detector.detect_batch([np.zeros((64, 64), np.uint8)], threshold=0.9, recognize=False)
+
+    assert loose == strict
+    assert len(warnings) == 1 and "0.05" in warnings[0]
+
+
+def test_recognize_fills_only_requested_boxes():
+    detector = TextDetector()
+    reader = MagicMock()
+    reader.recognize.side_effect = lambda img, horizontal_list, free_list: [
+        ([[x1, y1], [x2, y1], [x2, y2], [x1, y2]], f"text@{y1}", 0.7) for x1, x2, y1, y2 in reversed(horizontal_list)
+    ]
+    boxes = [{"box": [[1, 10], [20, 10], [20, 30], [1, 30]], "text": None, "confidence": None},
+             {"box": [[1, 50], [20, 50], [20, 70], [1, 70]], "text": None, "confidence": None}]
+
+    with patch.object(TextDetector, "_ocr", reader):
+        recognized = detector.recognize(np.zeros((100, 40, 3), np.uint8), boxes)
+
+    assert [b["text"] for b in recognized] == ["text@10", "text@50"]
+    assert boxes[0]["text"] is None
+
+
+def test_recognize_keeps_boxes_past_the_edge_and_sharing_a_corner():
+    detector = TextDetector()
+    reader = MagicMock()
+    # EasyOCR clamps every rect to the image before cropping it
+    reader.recognize.side_effect = lambda img, horizontal_list, free_list: [
+        ([[max(0, x1), max(0, y1)], [x2, max(0, y1)], [x2, y2], [max(0, x1), y2]], f"{x2}x{y2}", 0.7)
+        for x1, x2, y1, y2 in horizontal_list
+    ]
+    boxes = [{"box": [[-6, -3], [20, -3], [20, 30], [-6, 30]], "text": None, "confidence": None},
+             {"box": [[5, 40], [20, 40], [20, 60], [5, 60]], "text": None, "confidence": None},
+             {"box": [[5, 40], [35, 40], [35, 80], [5, 80]], "text": None, "confidence": None},
+             {"box": [[-30, 10], [-2, 10], [-2, 30], [-30, 30]], "text": None, "confidence": None}]
+
+    with patch.object(TextDetector, "_ocr", reader):
+        recognized = detector.recognize(np.zeros((100, 40), np.uint8), boxes)
+
+    assert [(b["text"], b["confidence"]) for b in recognized] == [("20x30", 0.7), ("20x60", 0.7), ("35x80", 0.7), ("", 0.0)]
+    assert reader.recognize.call_args_list[0].kwargs["horizontal_list"] == [[0, 20, 0, 30]]
+
+
+def test_scaled_detection_maps_boxes_back_and_refines(monkeypatch):
+    from config.settings import settings
+    detector = TextDetector()
+    reader = MagicMock()
+    seen = []
+
+    def detect(img, **kw):
+        seen.append(img.shape)
+        h, w = img.shape[:2]
+        # One text line in the middle of whatever it is shown
+        return [[[w // 4, 3 * w // 4, h // 2 - 5, h // 2 + 5]]], [[]]
+
+    reader.detect.side_effect = detect
+    monkeypatch.setattr(settings, "OCR_REFINE_MARGIN", 16)
+    tile = np.zeros((400, 800), np.uint8)
+
+    with patch.object(TextDetector, "_ocr", reader):
+        monkeypatch.setattr(settings, "OCR_DETECT_REFINE", False)
+        coarse = detector.detect_batch([tile], recognize=False, scale=0.5)[0]
+        monkeypatch.setattr(settings, "OCR_DETECT_REFINE", True)
+        refined = detector.detect_batch([tile], recognize=False, scale=0.5)[0]
+
+    assert seen[0] == (200, 400)
+    # Coarse box upmapped to the full-res middle line: x 100..300 -> 200..600, y 95..105 -> 190..210
+    assert coarse[0]["box"][0] == [200.0, 190.0] and coarse[0]["box"][2] == [600.0, 210.0]
+    # Refinement re-detected only the padded candidate crop at full resolution
+    assert seen[-1] == (210 + 16 - (190 - 16), 600 + 16 - (200 - 16))
+    assert len(refined) == 1 and refined[0]["box"][0][1] >= 190 - 16
@@ -0,0 +1,78 @@
+import cv2
+import numpy as np
+from unittest.mock import patch
+from core.inpaint_engine import InpaintEngine, merge_rects
+
+
+def _tile_with_text(seed=3):
+    rng = np.random.default_rng(seed)
+    tile = np.full((400, 300, 3), 240, dtype=np.uint8)
+    mask = np.zeros((400, 300), dtype=np.uint8)
+    rects = [(10, 10, 90, 50), (150, 20, 260, 70), (30, 200, 120, 260), (180, 300, 290, 390)]
+    for x1, y1, x2, y2 in rects:
+        tile[y1 + 8:y2 - 8, x1 + 8:x2 - 8] = rng.integers(0, 60, (y2 - y1 - 16, x2 - x1 - 16, 3))
+        mask[y1 + 6:y2 - 6, x1 + 6:x2 - 6] = 255
+    return tile, mask, rects
+
+
+def test_merge_rects_joins_overlaps_transitively():
+    rects = [(0, 0, 10, 10), (8, 8, 20, 20), (19, 0, 30, 9), (50, 50, 60, 60)]
+    assert sorted(merge_rects(rects)) == [(0, 0, 30, 20), (50, 50, 60, 60)]
+
+
+def test_region_mode_matches_per_box_path():
+    engine = InpaintEngine()
+    tile, mask, rects = _tile_with_text()
+
+    per_box = tile.copy()
+    for x1, y1, x2, y2 in rects:
+        per_box[y1:y2, x1:x2] = engine.process(per_box[y1:y2, x1:x2].copy(), mask[y1:y2, x1:x2])
+
+    merged, calls = engine.process_regions(tile, mask, rects)
+    assert calls == len(rects)
+    assert np.array_equal(merged, per_box)
+
+
+def test_overlapping_boxes_share_one_call():
+    engine = InpaintEngine()
+    tile, mask, _ = _tile_with_text()
+    result, calls = engine.process_regions(tile, mask, [(10, 10, 90, 50), (60, 30, 140, 80)])
+    assert calls == 1
+    assert result.shape == tile.shape
+
+
+def test_dense_tile_is_inpainted_once():
+    engine = InpaintEngine()
+    tile, mask, rects = _tile_with_text()
+    with patch("core.inpaint_engine.settings") as mock_settings:
+        mock_settings.INPAINT_DENSE_ENABLED = True
+        mock_settings.INPAINT_DENSE_CLUSTERS = 2
+        mock_settings.INPAINT_DENSE_COVERAGE = 1.0
+        result, calls = engine.process_regions(tile, mask, rects)
+    assert calls == 1
+    assert not np.array_equal(result, tile)
+
+
+def test_dense_path_is_off_by_default_and_differs_only_inside_masks():
+    engine = InpaintEngine()
+    rng = np.random.default_rng(1)
+    tile = rng.integers(100, 255, (400, 300, 3), dtype=np.uint8)
+    mask = np.zeros((400, 300), dtype=np.uint8)
+    rects = [(10, 10, 90, 50), (150, 20, 260, 70), (30, 200, 120, 260), (180, 300, 290, 390)]
+    for x1, y1, x2, y2 in rects:
+        mask[y1 + 2:y2 - 2, x1 + 2:x2 - 2] = 255
+
+    per_box, calls = engine.process_regions(tile, mask, rects)
+    assert calls == len(rects)
+    with patch("core.inpaint_engine.settings") as mock_settings:
+        mock_settings.INPAINT_DENSE_ENABLED = True
+        mock_settings.INPAINT_DENSE_CLUSTERS = 0
+        mock_settings.INPAINT_DENSE_COVERAGE = 1.0
+        dense, calls = engine.process_regions(tile, mask, rects)
+    assert calls == 1
+
+    # Accepted difference: only inside the dilated masks, and small on average
+    diff = np.abs(dense.astype(np.int16) - per_box.astype(np.int16)).max(axis=2)
+    inside = cv2.dilate(mask, cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))) > 0
+    assert diff[~inside].max() == 0
+    assert 0 < diff[inside].mean() < 8
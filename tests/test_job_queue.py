@@ -0,0 +1,166 @@
+import sys
+from unittest.mock import MagicMock
+
+# Module-level Mocking: the scheduler is exercised with plain functions, no OCR needed
+sys.modules.setdefault("easyocr", MagicMock())
+
+import os
+import time
+import asyncio
+import cv2
+import numpy as np
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+from core.exceptions import QueueFullError
+from web_app.job_queue import JobQueue, clean_file_job
+
+# Spawned workers don't inherit the module mock above: they import this stand-in instead
+# (the parent's sys.path travels to spawned children)
+_EASYOCR_STUB = """
+class Reader:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def detect(self, img, **kwargs):
+        n = len(img) if getattr(img, "ndim", 0) == 4 else 1
+        return [[] for _ in range(n)], [[] for _ in range(n)]
+"""
+
+
+def _record(order, name):
+    time.sleep(0.01)
+    order.append(name)
+    return name
+
+
+def test_admit_applies_backpressure():
+    """Submissions past the depth limit are rejected until a session is released."""
+    queue = JobQueue(workers=0, max_depth=5)
+    queue.admit("a", 4)
+    with pytest.raises(QueueFullError):
+        queue.admit("b", 2)
+    queue.release("a")
+    queue.admit("b", 2)
+    assert queue.snapshot("b")["session_remaining"] == 2
+
+
+def test_sessions_are_served_round_robin():
+    """A second session is interleaved with a larger one instead of waiting behind it."""
+    async def scenario():
+        queue = JobQueue(workers=0, max_depth=10)
+        order = []
+        queue.admit("big", 3)
+        queue.admit("small", 2)
+        jobs = [queue.run("big", _record, order, f"big{i}") for i in range(3)]
+        jobs += [queue.run("small", _record, order, f"small{i}") for i in range(2)]
+        await asyncio.gather(*jobs)
+        queue.shutdown()
+        return order, queue.snapshot()
+
+    order, snapshot = asyncio.run(scenario())
+    assert order == ["big0", "small0", "big1", "small1", "big2"]
+    assert snapshot["queued"] == 0
+    assert snapshot["running"] == 0
+    assert snapshot["avg_file_seconds"] is not None
+
+
+def test_priority_and_skip():
+    """Higher priority sessions go first; skipped jobs never reach the worker."""
+    async def scenario():
+        queue = JobQueue(workers=0, max_depth=10)
+        order = []
+        queue.admit("low", 2)
+        queue.admit("high", 1, priority=5)
+        jobs = [queue.run("low", _record, order, f"low{i}") for i in range(2)]
+        jobs.append(queue.run("high", _record, order, "high0"))
+        jobs.append(queue.run("low", _record, order, "skipped", skip=lambda: True))
+        results = await asyncio.gather(*jobs)
+        queue.shutdown()
+        return order, results
+
+    order, results = asyncio.run(scenario())
+    assert order == ["low0", "high0", "low1"]
+    assert results[-1] is None
+
+
+def test_process_pool_runs_real_jobs_and_survives_a_dead_worker(tmp_path, monkeypatch):
+    """clean_file_job on a one-worker ProcessPoolExecutor; a killed worker only fails its own job."""
+    stub = tmp_path / "stub"
+    stub.mkdir()
+    (stub / "easyocr.py").write_text(_EASYOCR_STUB)
+    monkeypatch.syspath_prepend(str(stub))
+    page = tmp_path / "page.png"
+    cv2.imwrite(str(page), np.random.default_rng(0).integers(0, 255, (300, 200, 3), dtype=np.uint8))
+
+    def job(n):
+        return str(page), str(tmp_path / f"before_{n}.png"), str(tmp_path / f"after_{n}.png"), f"pool_{n}"
+
+    async def scenario():
+        queue = JobQueue(workers=1, max_depth=10)
+        queue.admit("s", 3)
+        try:
+            first = await queue.run("s", clean_file_job, *job(1))
+            # Abrupt worker death, as with an OOM kill
+            with pytest.raises(BrokenProcessPool):
+                await queue.run("s", os._exit, 1)
+            second = await queue.run("s", clean_file_job, *job(2))
+            return first, second, queue.snapshot()
+        finally:
+            queue.shutdown()
+
+    first, second, snapshot = asyncio.run(scenario())
+    assert first is True and second is True
+    assert cv2.imread(str(tmp_path / "after_2.png")).shape == (300, 200, 3)
+    assert (tmp_path / "before_1.png").exists()
+    assert snapshot["running"] == 0 and snapshot["queued"] == 0
+
+
+def test_failed_file_does_not_end_the_session_early(monkeypatch):
+    """One file raising leaves its siblings running; the reservation is released once, at the end."""
+    import web_app.main as web_main
+
+    finished = []
+
+    async def fake_run(session_id, fn, *args, skip=None):
+        filename = args[-1]
+        if filename == "bad.png":
+            raise RuntimeError("worker died")
+        await asyncio.sleep(0.05)
+        finished.append(filename)
+        return True
+
+    released = []
+    monkeypatch.setattr(web_main.job_queue, "run", fake_run)
+    monkeypatch.setattr(web_main.job_queue, "release", lambda s: released.append(list(finished)))
+    monkeypatch.setattr(web_main, "queue_previews", lambda *a: None)
+    web_main.sessions["s"] = {"total": 3, "processed": 0, "status": "processing", "cancel": False,
+                              "files": ["a.png", "bad.png", "b.png"], "failed": []}
+    try:
+        asyncio.run(web_main.process_task([("in_a", "a.png"), ("in_bad", "bad.png"), ("in_b", "b.png")], "s"))
+        session = web_main.sessions["s"]
+        assert session["status"] == "done" and session["failed"] == ["bad.png"] and session["processed"] == 3
+        assert released == [["a.png", "b.png"]]
+    finally:
+        web_main.sessions.pop("s", None)
+
+
+def test_start_priority_needs_the_configured_token(monkeypatch):
+    from fastapi.testclient import TestClient
+    import web_app.main as web_main
+
+    granted = []
+
+    def admit(session_id, n_files, priority=0):
+        granted.append(priority)
+        raise QueueFullError("full")
+
+    monkeypatch.setattr(web_main.job_queue, "admit", admit)
+    client = TestClient(web_main.app)
+    files = {"files": ("a.png", b"x", "image/png")}
+
+    client.post("/start?priority=9", files=files, headers={"X-Priority-Token": "guess"})
+    monkeypatch.setattr(web_main.settings, "JOB_PRIORITY_TOKEN", "s3cret")
+    client.post("/start?priority=9", files=files)
+    client.post("/start?priority=9", files=files, headers={"X-Priority-Token": "wrong"})
+    client.post("/start?priority=9", files=files, headers={"X-Priority-Token": "s3cret"})
+    assert granted == [0, 0, 0, 9]
@@ -0,0 +1,186 @@
+import sys
+from unittest.mock import MagicMock
+
+# Module-level Mocking: ONNX Runtime / HF Hub are replaced, the pool logic is what's under test
+sys.modules.setdefault("onnxruntime", MagicMock())
+sys.modules.setdefault("huggingface_hub", MagicMock())
+
+import threading
+import numpy as np
+import core.advanced_inpaint as advanced_inpaint
+from core.advanced_inpaint import LaMaSessionPool, LaMaInpainter
+
+
+def _fake_session_factory(created, batch_dim="batch"):
+    def factory(model_path, sess_options=None, providers=None):
+        session = MagicMock()
+        inputs = [MagicMock(), MagicMock()]
+        inputs[0].name, inputs[1].name = "image", "mask"
+        inputs[0].shape = [batch_dim, 3, 512, 512]
+        session.get_inputs.return_value = inputs
+        session.run.side_effect = lambda _, feed: [np.zeros((len(feed["image"]), 3, 512, 512), dtype=np.float32)]
+        created.append((session, sess_options))
+        return session
+    return factory
+
+
+def test_pool_builds_sessions_with_explicit_threading(monkeypatch):
+    created = []
+    monkeypatch.setattr(advanced_inpaint.ort, "InferenceSession", _fake_session_factory(created))
+    pool = LaMaSessionPool("lama.onnx", size=3, intra_op_threads=2, inter_op_threads=1, mem_arena=False)
+
+    assert len(created) == 3
+    assert pool.input_names == ["image", "mask"]
+    opts = created[0][1]
+    assert opts.intra_op_num_threads == 2
+    assert opts.inter_op_num_threads == 1
+    assert opts.enable_cpu_mem_arena is False
+
+
+def test_concurrent_checkouts_get_distinct_sessions(monkeypatch):
+    created = []
+    monkeypatch.setattr(advanced_inpaint.ort, "InferenceSession", _fake_session_factory(created))
+    pool = LaMaSessionPool("lama.onnx", size=2, intra_op_threads=1)
+
+    held = []
+    barrier = threading.Barrier(2)
+
+    def worker():
+        with pool.checkout(timeout=1) as session:
+            held.append(session)
+            barrier.wait(timeout=1)
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(held) == 2 and held[0] is not held[1]
+    assert pool._idle.qsize() == 2
+
+
+def test_inpainter_runs_through_pool(monkeypatch):
+    created = []
+    monkeypatch.setattr(advanced_inpaint.ort, "InferenceSession", _fake_session_factory(created))
+    monkeypatch.setattr(LaMaInpainter, "_pool", LaMaSessionPool("lama.onnx", size=2, intra_op_threads=1))
+
+    image = np.full((64, 64, 3), 200, dtype=np.uint8)
+    mask = np.zeros((64, 64), dtype=np.uint8)
+    mask[20:30, 20:30] = 255
+    result = LaMaInpainter().process(image, mask)
+
+    assert result.shape == image.shape
+    assert sum(s.run.call_count for s, _ in created) == 1
+
+
+def _three_region_mask():
+    mask = np.zeros((600, 600), dtype=np.uint8)
+    mask[20:40, 20:60] = 255
+    mask[300:320, 300:340] = 255
+    mask[540:560, 20:60] = 255
+    return mask
+
+
+def test_region_windows_split_far_clusters_and_merge_close_ones():
+    inpainter = LaMaInpainter()
+    assert len(inpainter.region_windows(_three_region_mask())) == 3
+
+    close = np.zeros((200, 200), dtype=np.uint8)
+    close[50:60, 50:60] = 255
+    close[50:60, 75:85] = 255
+    assert len(inpainter.region_windows(close)) == 1
+
+
+def test_process_regions_batches_windows(monkeypatch):
+    created = []
+    monkeypatch.setattr(advanced_inpaint.ort, "InferenceSession", _fake_session_factory(created))
+    monkeypatch.setattr(LaMaInpainter, "_pool", LaMaSessionPool("lama.onnx", size=1, intra_op_threads=1))
+
+    image = np.full((600, 600, 3), 200, dtype=np.uint8)
+    mask = _three_region_mask()
+    result = LaMaInpainter().process_regions(image, mask, batch_size=4, strategy="resize")
+
+    runs = created[0][0].run.call_args_list
+    assert len(runs) == 1
+    assert runs[0].args[1]["image"].shape == (3, 3, 512, 512)
+    # Every region was pasted back, pixels far from all regions are untouched
+    assert (result[mask > 0] == 0).all()
+    assert (result[150, 450] == 200).all()
+
+
+def test_process_regions_falls_back_for_fixed_batch_models(monkeypatch):
+    created = []
+    monkeypatch.setattr(advanced_inpaint.ort, "InferenceSession", _fake_session_factory(created, batch_dim=1))
+    monkeypatch.setattr(LaMaInpainter, "_pool", LaMaSessionPool("lama.onnx", size=2, intra_op_threads=1))
+
+    LaMaInpainter().process_regions(np.full((600, 600, 3), 200, dtype=np.uint8), _three_region_mask(), batch_size=4, strategy="resize")
+    assert sum(s.run.call_count for s, _ in created) == 3
+
+
+def _identity_session_factory(created):
+    """Fake model that returns its input image: any loss comes from our own resize/paste logic."""
+    def factory(model_path, sess_options=None, providers=None):
+        session = MagicMock()
+        inputs = [MagicMock(), MagicMock()]
+        inputs[0].name, inputs[1].name = "image", "mask"
+        inputs[0].shape = ["batch", 3, 512, 512]
+        session.get_inputs.return_value = inputs
+        session.run.side_effect = lambda _, feed: [np.rint(feed["image"] * 255.0)]
+        created.append((session, sess_options))
+        return session
+    return factory
+
+
+def test_adaptive_strategy_is_native_resolution(monkeypatch):
+    created = []
+    monkeypatch.setattr(advanced_inpaint.ort, "InferenceSession", _identity_session_factory(created))
+    monkeypatch.setattr(LaMaInpainter, "_pool", LaMaSessionPool("lama.onnx", size=1, intra_op_threads=1))
+
+    rng = np.random.default_rng(3)
+    image = rng.integers(0, 255, (1400, 2200, 3), dtype=np.uint8)
+    mask = _three_region_mask()
+    mask = np.pad(mask, ((0, 800), (0, 1600)))
+    mask[900:1000, 300:2000] = 255  # Wide balloon: window > 512, tiled natively
+
+    inpainter = LaMaInpainter()
+    adaptive = inpainter.process_regions(image, mask, batch_size=16, strategy="adaptive")
+    resized = inpainter.process_regions(image, mask, batch_size=16, strategy="resize")
+
+    assert np.array_equal(adaptive, image)
+    assert not np.array_equal(resized, image)
+
+
+def test_adaptive_strategy_packs_small_windows(monkeypatch):
+    created = []
+    monkeypatch.setattr(advanced_inpaint.ort, "InferenceSession", _identity_session_factory(created))
+    monkeypatch.setattr(LaMaInpainter, "_pool", LaMaSessionPool("lama.onnx", size=1, intra_op_threads=1))
+
+    inpainter = LaMaInpainter()
+    image = np.full((600, 600, 3), 180, dtype=np.uint8)
+    mask = _three_region_mask()
+    windows = inpainter.region_windows(mask)
+    canvases, placements = inpainter._adaptive_canvases(image, mask, windows, pack=True)
+    assert len(canvases) == 1
+    assert len(placements) == 3
+
+    # Default: one window per canvas, nothing else in LaMa's receptive field
+    canvases, placements = inpainter._adaptive_canvases(image, mask, windows)
+    assert len(canvases) == 3
+    assert all(cx == cy == 0 for _, cx, cy, *_ in placements)
+    assert all((img == 180).all() for img, _ in canvases)
+
+
+def test_warm_never_downloads_the_model(monkeypatch, tmp_path):
+    created = []
+    monkeypatch.setattr(advanced_inpaint.ort, "InferenceSession", _fake_session_factory(created))
+    monkeypatch.setattr(advanced_inpaint, "hf_hub_download", MagicMock(side_effect=AssertionError("network")))
+    monkeypatch.setattr(LaMaInpainter, "_pool", None)
+    engine = LaMaInpainter()
+    monkeypatch.setattr(engine, "model_path", str(tmp_path / "lama.onnx"))
+
+    assert engine.warm() is False
+    assert created == []
+
+    (tmp_path / "lama.onnx").write_bytes(b"onnx")
+    assert engine.warm() is True
+    assert len(created) == advanced_inpaint.settings.LAMA_POOL_SIZE
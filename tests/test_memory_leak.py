@@ -2,9 +2,7 @@ import sys
 from unittest.mock import MagicMock, patch
 
 # Module-level Mocking
-mock_paddle = MagicMock()
-sys.modules["paddleocr"] = mock_paddle
-sys.modules["paddle"] = MagicMock()
+sys.modules.setdefault("easyocr", MagicMock())
 
 import pytest
 import os
@@ -23,6 +21,8 @@ def test_memory_leak_50_iterations():
     Requirement: Max 5% variation.
     """
     pipeline = MangaCleanerPipeline()
+    # Every run must go through the pipeline, not the result cache
+    pipeline.result_cache = None
     dummy_img = np.zeros((500, 500, 3), dtype=np.uint8)
     
     # Warup
@@ -33,7 +33,7 @@ def test_memory_leak_50_iterations():
     print(f"\n[MEMORY] Start RAM: {start_ram:.2f} MB")
 
     with patch('core.pipeline.validate_memory_safety'):
-        with patch.object(pipeline.detector, 'detect', return_value=[]):
+        with patch.object(pipeline.detector, 'detect_batch', side_effect=lambda tiles, **kw: [[] for _ in tiles]):
             for i in range(50):
                 pipeline.clean_image(dummy_img)
                 if i % 10 == 0:
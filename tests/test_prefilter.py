@@ -0,0 +1,57 @@
+import sys
+from unittest.mock import MagicMock
+
+# Module-level Mocking for the OCR backend
+sys.modules.setdefault("easyocr", MagicMock())
+
+import numpy as np
+from core.prefilter import find_text_bands, pack_bands, unpack_boxes, BAND_SEPARATOR
+from core.pipeline import MangaCleanerPipeline
+
+
+def _strip_with_text_rows(h=2048, w=300, rows=((300, 340), (1500, 1530))):
+    tile = np.full((h, w, 3), 255, dtype=np.uint8)
+    tile[1000:1200] = 20  # flat dark panel
+    for y0, y1 in rows:
+        tile[y0:y1, 50:250:4] = 0
+    return tile
+
+
+def test_blank_tile_has_no_bands():
+    assert find_text_bands(np.full((512, 200, 3), 255, np.uint8)) == []
+    # Vertical gradient: every row is flat
+    gradient = np.repeat(np.linspace(0, 255, 512).astype(np.uint8)[:, None, None], 200, axis=1).repeat(3, axis=2)
+    assert find_text_bands(gradient) == []
+
+
+def test_bands_cover_text_rows_with_margin():
+    bands = find_text_bands(_strip_with_text_rows(), tolerance=24, margin=24, min_gap=64)
+    # The flat dark panel has uniform rows, so only the text bands remain
+    assert bands == [(276, 364), (1476, 1554)]
+
+
+def test_pack_and_unpack_roundtrip():
+    tile = _strip_with_text_rows()
+    bands = [(276, 364), (1476, 1554)]
+    packed, offsets = pack_bands(tile, bands)
+    assert packed.shape[0] == (364 - 276) + BAND_SEPARATOR + (1554 - 1476)
+    assert offsets == [0, 88 + BAND_SEPARATOR]
+
+    box_in_second = {"box": [[50, offsets[1] + 24], [250, offsets[1] + 24], [250, offsets[1] + 54], [50, offsets[1] + 54]]}
+    unpacked = unpack_boxes([box_in_second], bands, offsets)[0]["box"]
+    assert [p[1] for p in unpacked] == [1500, 1500, 1530, 1530]
+
+
+def test_pipeline_skips_ocr_on_blank_strip():
+    pipeline = MangaCleanerPipeline()
+    pipeline.result_cache = None
+    pipeline.detector = MagicMock()
+    pipeline.detector.detect_batch.side_effect = lambda tiles, **kw: [[] for _ in tiles]
+
+    blank = np.full((6000, 200, 3), 255, np.uint8)
+    result, count = pipeline._process_core(blank, job_id="blank")
+
+    assert pipeline.detector.detect_batch.call_count == 0
+    assert count == 0
+    # Overlap rows go through the float cross-fade, which may truncate by one level
+    assert np.abs(result.astype(np.int16) - blank).max() <= 1
@@ -0,0 +1,59 @@
+import sys
+from unittest.mock import MagicMock
+
+# Module-level Mocking: previews are exercised without the OCR backend
+sys.modules.setdefault("easyocr", MagicMock())
+
+import os
+import cv2
+import numpy as np
+from fastapi.testclient import TestClient
+
+import web_app.main as web_main
+from core.preview import WEBP_MAX_SIDE, build_pyramid
+from core.project_manager import ProjectManager
+
+
+def test_pyramid_levels_are_area_resized_and_fit_webp():
+    page = np.full((2000, 1600, 3), 200, dtype=np.uint8)
+    levels = build_pyramid(page, [256, 1024])
+    assert {k: v.shape[:2] for k, v in levels.items()} == {"full": (2000, 1600), "1024": (1280, 1024), "256": (320, 256)}
+    assert (levels["256"] == 200).all()
+
+    # Narrow pages skip levels they can't shrink to; tall strips lose "full" instead of breaking WebP
+    strip = np.zeros((40000, 720, 3), dtype=np.uint8)
+    levels = build_pyramid(strip, [256, 1024])
+    assert set(levels) == {"1024", "256"}
+    assert max(levels["1024"].shape[:2]) <= WEBP_MAX_SIDE
+
+
+def test_preview_endpoint_builds_serves_and_revalidates(monkeypatch, tmp_path):
+    monkeypatch.setattr(web_main, "OUTPUT_DIR", str(tmp_path))
+    (tmp_path / "s1").mkdir()
+    page = tmp_path / "s1" / "after_page.png"
+    cv2.imwrite(str(page), np.random.default_rng(0).integers(0, 255, (1200, 800, 3), dtype=np.uint8))
+    client = TestClient(web_main.app)
+
+    res = client.get("/preview/s1/after_page.png?size=256")
+    assert res.status_code == 200 and res.headers["content-type"] == "image/webp"
+    assert cv2.imdecode(np.frombuffer(res.content, np.uint8), cv2.IMREAD_COLOR).shape[:2] == (384, 256)
+    assert sorted(os.listdir(tmp_path / "s1" / "previews")) == ["after_page.png.256.webp", "after_page.png.full.webp"]
+    assert client.get("/preview/s1/after_page.png?size=256", headers={"If-None-Match": res.headers["etag"]}).status_code == 304
+
+    # No level is 1024 wide for an 800px page: "full" answers
+    assert cv2.imdecode(np.frombuffer(client.get("/preview/s1/after_page.png").content, np.uint8), cv2.IMREAD_COLOR).shape[:2] == (1200, 800)
+    assert client.get("/preview/s1/after_page.png?size=77").status_code == 400
+    assert client.get("/preview/s1/missing.png").status_code == 404
+
+
+def test_project_pages_get_thumbnails(tmp_path):
+    source = tmp_path / "page.png"
+    cv2.imwrite(str(source), np.zeros((3000, 1200, 3), dtype=np.uint8))
+    manager = ProjectManager(workspace_parent=str(tmp_path / "ws"))
+    manager.create_project("demo", str(tmp_path / "demo.wcu"))
+    page = manager.add_page(str(source))
+    manager.save_project()
+
+    assert manager.thumbnail_path(page.id).name == f"{page.id}.256.webp"
+    assert manager.thumbnail_path(page.id, "1024").name == f"{page.id}.1024.webp"
+    assert not (manager.active_workspace / "thumbnails" / f"{page.id}.full.webp").exists()
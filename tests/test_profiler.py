@@ -0,0 +1,83 @@
+import sys
+from unittest.mock import MagicMock
+
+# Module-level Mocking: the profiler is exercised without the OCR backend
+sys.modules.setdefault("easyocr", MagicMock())
+
+import base64
+import cv2
+import numpy as np
+from fastapi.testclient import TestClient
+
+import web_app.main as web_main
+from core.pipeline import MangaCleanerPipeline
+from core.profiler import current_profile, profiling, stage
+from core.tile_executor import TileExecutor
+
+
+def test_stage_is_a_shared_noop_when_off():
+    assert current_profile() is None
+    assert stage("ocr") is stage("inpaint", tile=3)
+    with profiling("off", enabled=False) as prof:
+        assert prof is None
+        with stage("ocr"):
+            pass
+
+
+def test_nested_tags_reach_tile_threads():
+    def job(i):
+        with stage("clean_tile", tile=i):
+            with stage("inpaint"):
+                return i
+
+    with profiling("tags", enabled=True) as prof:
+        assert list(TileExecutor(workers=3).map_ordered(job, range(5))) == list(range(5))
+        with profiling("inner") as inner:
+            assert inner is prof
+
+    inpaint = [r for r in prof.report()["records"] if r["stage"] == "inpaint"]
+    assert sorted(r["tile"] for r in inpaint) == [0, 1, 2, 3, 4]
+    assert prof.report()["stages"]["clean_tile"]["count"] == 5
+
+
+def test_nested_stage_keeps_the_outer_peak():
+    with profiling("nested", enabled=True, memory=True) as prof:
+        with stage("outer"):
+            block = bytearray(50 * 1024**2)
+            del block
+            with stage("inner"):
+                pass
+
+    report = prof.report()
+    assert report["stages"]["outer"]["peak_mb"] >= 50
+    assert report["stages"]["inner"]["peak_mb"] < 50
+    assert report["peak_mb"] >= 50
+
+
+def test_pipeline_reports_every_stage():
+    rng = np.random.default_rng(4)
+    strip = np.where(rng.integers(0, 255, (3000, 200, 3)) > 128, 250, 30).astype(np.uint8)
+    pipeline = MangaCleanerPipeline()
+    pipeline.result_cache = None
+    pipeline.detector = MagicMock()
+    box = {"box": [[20, 20], [120, 20], [120, 60], [20, 60]], "text": None, "confidence": None}
+    pipeline.detector.detect_batch.side_effect = lambda tiles, **kw: [[box] for _ in tiles]
+
+    with profiling("pipeline", enabled=True, memory=True) as prof:
+        pipeline.clean_page(strip, job_id="pipeline")
+
+    report = prof.report()
+    assert {"preprocess", "ocr", "clean_tile", "classify", "inpaint", "blend"} <= set(report["stages"])
+    assert report["peak_mb"] > 0
+    assert all("tile" in r for r in report["records"] if r["stage"] in ("preprocess", "classify", "blend"))
+
+
+def test_api_returns_profile_on_request(monkeypatch):
+    monkeypatch.setattr(web_main.pipeline, "_process_core", lambda image, job_id: (image, 0))
+    _, png = cv2.imencode(".png", np.zeros((16, 16, 3), np.uint8))
+    body = {"image": base64.b64encode(png.tobytes()).decode()}
+    client = TestClient(web_main.app)
+
+    assert "profile" not in client.post("/api/auto_clean_page", json=body).json()
+    profiled = client.post("/api/auto_clean_page?profile=true", json=body).json()
+    assert "encode" in profiled["profile"]["stages"]
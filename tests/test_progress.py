@@ -0,0 +1,71 @@
+import sys
+from unittest.mock import MagicMock
+
+# Module-level Mocking: progress events don't need the OCR backend
+sys.modules.setdefault("easyocr", MagicMock())
+
+import asyncio
+import threading
+import numpy as np
+from core.pipeline import MangaCleanerPipeline
+from web_app.progress import ProgressBroker, is_terminal
+
+
+def test_publish_reaches_only_the_session_subscribers():
+    async def scenario():
+        broker = ProgressBroker()
+        mine = broker.subscribe("a")
+        other = broker.subscribe("b")
+        broker.publish("a", {"type": "file_done"})
+        event = await asyncio.wait_for(mine.get(), timeout=1)
+        broker.unsubscribe("a", mine)
+        broker.publish("a", {"type": "status"})
+        return event, mine.qsize(), other.qsize()
+
+    event, mine_left, other_left = asyncio.run(scenario())
+    assert event == {"type": "file_done"}
+    assert mine_left == 0
+    assert other_left == 0
+
+
+def test_slow_subscriber_keeps_latest_events():
+    async def scenario():
+        broker = ProgressBroker(max_pending=2)
+        queue = broker.subscribe("a")
+        for i in range(5):
+            broker.publish("a", {"tile": i})
+        return [queue.get_nowait()["tile"] for _ in range(queue.qsize())]
+
+    assert asyncio.run(scenario()) == [3, 4]
+
+
+def test_publish_threadsafe_wakes_subscriber():
+    async def scenario():
+        broker = ProgressBroker()
+        broker.bind(asyncio.get_running_loop())
+        queue = broker.subscribe("a")
+        threading.Thread(target=broker.publish_threadsafe, args=("a", {"type": "tile"})).start()
+        return await asyncio.wait_for(queue.get(), timeout=1)
+
+    assert asyncio.run(scenario()) == {"type": "tile"}
+
+
+def test_terminal_statuses():
+    assert is_terminal("done")
+    assert is_terminal("cancelled")
+    assert is_terminal("error: boom")
+    assert not is_terminal("processing")
+
+
+def test_pipeline_reports_every_tile_in_order():
+    pipeline = MangaCleanerPipeline()
+    pipeline.result_cache = None
+    pipeline.detector = MagicMock()
+    pipeline.detector.detect_batch.side_effect = lambda tiles, **kw: [[] for _ in tiles]
+
+    events = []
+    strip = np.full((5000, 200, 3), 255, dtype=np.uint8)
+    pipeline.process_webtoon_streaming(strip, job_id="progress", progress=events.append)
+
+    assert [e["tile"] for e in events] == list(range(1, len(events) + 1))
+    assert all(e["type"] == "tile" and e["tiles"] == len(events) for e in events)
@@ -0,0 +1,158 @@
+import json
+import zipfile
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+import pytest
+
+from core import project_manager
+from core.project_manager import ProjectManager
+
+
+def _png(path, seed):
+    img = np.random.default_rng(seed).integers(0, 255, (64, 64, 3), dtype=np.uint8)
+    cv2.imwrite(str(path), img)
+    return path
+
+
+def _project(tmp_path, pages=3):
+    manager = ProjectManager(workspace_parent=str(tmp_path / "ws"))
+    manager.create_project("demo", str(tmp_path / "demo.wcu"))
+    for i in range(pages):
+        manager.add_page(str(_png(tmp_path / f"p{i}.png", i)))
+    return manager
+
+
+def test_incremental_save_appends_only_changed_pages(tmp_path):
+    manager = _project(tmp_path)
+    target = tmp_path / "demo.wcu"
+    manager.save_project()
+    first = target.read_bytes()
+    with zipfile.ZipFile(target) as zf:
+        blobs = [i for i in zf.infolist() if i.filename.startswith("blobs/")]
+        start_dir = zf.start_dir
+    assert len(blobs) == 3
+    assert all(i.compress_type == zipfile.ZIP_STORED for i in blobs)
+
+    page = manager.active_workspace / manager.current_project.pages[1].original_path
+    _png(page, 99)
+    with patch.object(ProjectManager, "_hash_file", wraps=ProjectManager._hash_file) as hashed:
+        manager.save_project()
+    # Only the edited page is re-read
+    assert hashed.call_count == 1
+    assert target.read_bytes()[:start_dir] == first[:start_dir]
+    with zipfile.ZipFile(target) as zf:
+        assert len([n for n in zf.namelist() if n.startswith("blobs/")]) == 4
+        assert max(n for n in zf.namelist() if n.startswith("manifest/")) == "manifest/000002.json"
+
+    loaded = ProjectManager(workspace_parent=str(tmp_path / "ws2"))
+    project = loaded.load_project(str(target))
+    assert len(project.pages) == 3
+    assert (loaded.active_workspace / project.pages[1].original_path).read_bytes() == page.read_bytes()
+
+
+def test_interrupted_append_is_rolled_back(tmp_path):
+    manager = _project(tmp_path)
+    target = tmp_path / "demo.wcu"
+    manager.save_project()
+    saved = target.read_bytes()
+
+    _png(manager.active_workspace / manager.current_project.pages[0].original_path, 42)
+    with patch.object(ProjectManager, "_write_manifest", side_effect=OSError("disk full")):
+        with pytest.raises(OSError):
+            manager.save_project()
+    assert target.read_bytes() == saved
+    assert not (tmp_path / "demo.wcu.journal").exists()
+
+    # A crash that left the journal behind is undone on the next open
+    with zipfile.ZipFile(target) as zf:
+        manager._begin_journal(target, zf.start_dir)
+    with open(target, "r+b") as f:
+        f.seek(-10, 2)
+        f.write(b"\0" * 10)
+    ProjectManager(workspace_parent=str(tmp_path / "ws3")).load_project(str(target))
+    assert target.read_bytes() == saved
+
+
+def test_dead_bytes_trigger_compaction(tmp_path):
+    manager = _project(tmp_path, pages=1)
+    target = tmp_path / "demo.wcu"
+    page = manager.active_workspace / manager.current_project.pages[0].original_path
+    for seed in range(5):
+        _png(page, 100 + seed)
+        manager.save_project()
+        with zipfile.ZipFile(target) as zf:
+            blobs = [n for n in zf.namelist() if n.startswith("blobs/")]
+        assert len(blobs) <= 2
+
+    manager.save_project(compact=True)
+    with zipfile.ZipFile(target) as zf:
+        assert len([n for n in zf.namelist() if n.startswith("blobs/")]) == 1
+        assert zf.namelist()[-1] == "manifest/000001.json"
+
+
+def test_lazy_open_extracts_thumbnails_then_pages_on_demand(tmp_path):
+    manager = _project(tmp_path)
+    _png(manager.active_workspace / "thumbnails" / "p0.png", 7)
+    manager.save_project()
+
+    lazy = ProjectManager(workspace_parent=str(tmp_path / "lazy"))
+    project = lazy.load_project(str(tmp_path / "demo.wcu"), lazy=True)
+    workspace = lazy.active_workspace
+    assert (workspace / "thumbnails" / "p0.png").exists()
+    assert not list((workspace / "assets" / "original").iterdir())
+
+    first = lazy.page_path(project.pages[0].id)
+    assert first.read_bytes() == (manager.active_workspace / project.pages[0].original_path).read_bytes()
+    assert len(list((workspace / "assets" / "original").iterdir())) == 1
+
+    # Saving keeps the pages that were never opened
+    _png(first, 123)
+    lazy.save_project()
+    reopened = ProjectManager(workspace_parent=str(tmp_path / "again"))
+    reopened.load_project(str(tmp_path / "demo.wcu"))
+    assert len(list((reopened.active_workspace / "assets" / "original").iterdir())) == 3
+    assert (reopened.active_workspace / project.pages[0].original_path).read_bytes() == first.read_bytes()
+
+
+def test_autosave_journals_only_changed_pages_and_recovers(tmp_path):
+    manager = _project(tmp_path)
+    manager.save_project()
+    edited = manager.current_project.pages[1].id
+    manager.update_page(edited, konva_state={"layers": ["x" * 1000]}, ia_applied=True)
+    manager.autosave()
+    manager.autosave()
+
+    journal = manager.active_workspace / "autosave" / "journal.jsonl"
+    entries = [json.loads(line) for line in journal.read_text().splitlines()]
+    assert [[p["id"] for p in e["pages"]] for e in entries] == [[edited], []]
+
+    # A crash tore the last line: everything before it is replayed
+    manager.update_page(edited, history=[{"op": "lost"}])
+    with open(journal, "a") as f:
+        f.write('{"base":')
+    recovered = ProjectManager(workspace_parent=str(tmp_path / "ws")).recover_project(str(tmp_path / "demo.wcu"))
+    assert recovered.is_dirty
+    page = next(p for p in recovered.pages if p.id == edited)
+    assert page.ia_applied and page.konva_state == {"layers": ["x" * 1000]} and page.history == []
+    assert [p.id for p in recovered.pages] == [p.id for p in manager.current_project.pages]
+
+
+def test_autosave_compacts_into_a_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(project_manager, "AUTOSAVE_MIN_COMPACT_BYTES", 0)
+    manager = _project(tmp_path, pages=2)
+    manager.save_project()
+    for i in range(4):
+        manager.update_page(manager.current_project.pages[0].id, konva_state={"step": i})
+        manager.autosave()
+
+    folder = manager.active_workspace / "autosave"
+    assert (folder / "snapshot.json").exists()
+    assert (folder / "journal.jsonl").stat().st_size < (folder / "snapshot.json").stat().st_size * 2
+    recovered = ProjectManager(workspace_parent=str(tmp_path / "ws")).recover_project(str(tmp_path / "demo.wcu"))
+    assert recovered.pages[0].konva_state == {"step": 3}
+
+    # Saving makes the journal obsolete
+    manager.save_project()
+    assert ProjectManager(workspace_parent=str(tmp_path / "ws")).recover_project(str(tmp_path / "demo.wcu")) is None
@@ -0,0 +1,95 @@
+import sys
+import os
+import time
+from unittest.mock import MagicMock
+
+# Module-level Mocking for the OCR backend
+sys.modules.setdefault("easyocr", MagicMock())
+
+import numpy as np
+from config.settings import settings
+from core.result_cache import ResultCache
+from core.pipeline import MangaCleanerPipeline
+
+
+def _page(seed: int, h: int = 64, w: int = 48) -> np.ndarray:
+    return np.random.default_rng(seed).integers(0, 255, (h, w, 3), dtype=np.uint8)
+
+
+def test_key_depends_on_bytes_and_params():
+    page = _page(1)
+    params = {"threshold": 0.05, "tile_h": 2048}
+    assert ResultCache.make_key(page, params) == ResultCache.make_key(page.copy(), dict(params))
+    assert ResultCache.make_key(page, params) != ResultCache.make_key(page, {**params, "threshold": 0.2})
+    other = page.copy()
+    other[0, 0, 0] ^= 1
+    assert ResultCache.make_key(page, params) != ResultCache.make_key(other, params)
+
+
+def test_roundtrip_is_lossless(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    page = _page(2)
+    meta = {"cleaned_count": 3, "boxes": [{"box": [[0, 0], [1, 0], [1, 1], [0, 1]]}]}
+    cache.put("abc123", page, meta)
+
+    cached, cached_meta = cache.get("abc123")
+    assert np.array_equal(cached, page)
+    assert cached_meta == meta
+    assert cache.get("missing") is None
+
+
+def test_lru_eviction_keeps_recent_entries(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=10**9)
+    for i in range(4):
+        cache.put(f"k{i}", _page(i, 128, 128), {"cleaned_count": i, "boxes": []})
+    entry_size = cache._scan_size() // 4
+
+    # Make k0 the oldest, then touch it so k1 becomes the least recently used
+    old = time.time() - 100
+    for i in range(4):
+        for path in (tmp_path / f"k{i}"[:2]).glob(f"k{i}.*"):
+            os.utime(path, (old + i, old + i))
+    assert cache.get("k0") is not None
+
+    cache.max_bytes = int(entry_size * 3.5)
+    cache.put("k4", _page(4, 128, 128), {"cleaned_count": 4, "boxes": []})
+
+    assert cache.get("k1") is None
+    assert cache.get("k0") is not None
+    assert cache.get("k4") is not None
+
+
+def test_pipeline_hit_skips_detection(tmp_path):
+    pipeline = MangaCleanerPipeline()
+    pipeline.result_cache = ResultCache(str(tmp_path))
+    pipeline.detector = MagicMock()
+    pipeline.detector.detect_batch.side_effect = lambda tiles, **kw: [[] for _ in tiles]
+
+    page = _page(9, 300, 200)
+    first, count, boxes = pipeline.clean_page(page, job_id="first")
+    calls = pipeline.detector.detect_batch.call_count
+
+    second, count_2, boxes_2 = pipeline.clean_page(page, job_id="second")
+    assert pipeline.detector.detect_batch.call_count == calls
+    assert np.array_equal(first, second)
+    assert (count, boxes) == (count_2, boxes_2)
+
+
+def test_params_cover_planned_height_and_tuning(monkeypatch):
+    pipeline = MangaCleanerPipeline()
+    base = pipeline._cache_params(0.05, 2048)
+    # Same TILE_HEIGHT, but free RAM shrank the planned tiles
+    assert pipeline._cache_params(0.05, 1024) != base
+    for name, value in [("OCR_LANG", "ko"), ("OCR_BATCH_SIZE", 1), ("PREFILTER_MIN_GAP", 999), ("PREFILTER_MARGIN", 1), ("PREFILTER_ROW_TOLERANCE", 3),
+                        ("INPAINT_DENSE_CLUSTERS", 1), ("INPAINT_DENSE_COVERAGE", 0.9)]:
+        with monkeypatch.context() as m:
+            m.setattr(settings, name, value)
+            assert pipeline._cache_params(0.05, 2048) != base, name
+
+
+def test_threshold_keys_only_recognized_boxes(monkeypatch):
+    pipeline = MangaCleanerPipeline()
+    monkeypatch.setattr(settings, "OCR_DETECT_ONLY", True)
+    assert pipeline._cache_params(0.05, 2048) == pipeline._cache_params(0.2, 2048)
+    monkeypatch.setattr(settings, "OCR_DETECT_ONLY", False)
+    assert pipeline._cache_params(0.05, 2048) != pipeline._cache_params(0.2, 2048)
@@ -2,9 +2,7 @@ import sys
 from unittest.mock import MagicMock, patch
 
 # Module-level Mocking
-mock_paddle = MagicMock()
-sys.modules["paddleocr"] = mock_paddle
-sys.modules["paddle"] = MagicMock()
+sys.modules.setdefault("easyocr", MagicMock())
 
 import pytest
 import threading
@@ -31,7 +29,7 @@ def test_singleton_concurrency_load():
     # Launch 20 threads
     threads = [threading.Thread(target=worker) for _ in range(20)]
     
-    with patch('core.detector.PaddleOCR'):
+    with patch('core.detector.easyocr'):
         # Reset singleton to ensure fresh test
         TextDetector._instance = None
         
@@ -54,6 +52,8 @@ def test_pipeline_parallel_execution():
     Validates thread-safety and lack of deadlocks.
     """
     pipeline = MangaCleanerPipeline()
+    # Every run must go through the pipeline, not the result cache
+    pipeline.result_cache = None
     dummy_img = np.zeros((100, 100, 3), dtype=np.uint8)
     results = []
     
@@ -66,7 +66,7 @@ def test_pipeline_parallel_execution():
 
     # Patch external calls
     with patch('core.pipeline.validate_memory_safety'):
-        with patch.object(pipeline.detector, 'detect', return_value=[]):
+        with patch.object(pipeline.detector, 'detect_batch', side_effect=lambda tiles, **kw: [[] for _ in tiles]):
             threads = [threading.Thread(target=run_pipeline) for _ in range(10)]
             for t in threads: t.start()
             for t in threads: t.join()
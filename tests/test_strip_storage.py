@@ -0,0 +1,67 @@
+import sys
+from unittest.mock import MagicMock
+
+# Module-level Mocking: storage and tiling are exercised without the OCR backend
+sys.modules.setdefault("easyocr", MagicMock())
+
+import os
+import cv2
+import numpy as np
+from config.settings import settings
+from core.memory import calculate_estimated_usage
+from core.pipeline import MangaCleanerPipeline
+from core.strip_storage import StripStore, probe_shape
+
+
+def test_read_window_pads_past_the_bottom():
+    strip = np.arange(10 * 4 * 3, dtype=np.uint8).reshape(10, 4, 3)
+    with StripStore.from_array(strip) as store:
+        window = store.read_window(8, 13)
+        path = store.path
+        assert os.path.exists(path)
+    assert not os.path.exists(path)
+    assert np.array_equal(window[:2], strip[8:10])
+    assert (window[2:] == 255).all()
+
+
+def test_probe_shape_reads_headers(tmp_path):
+    img = np.zeros((37, 53, 3), dtype=np.uint8)
+    for ext in ("png", "jpg"):
+        path = str(tmp_path / f"page.{ext}")
+        cv2.imwrite(path, img)
+        assert probe_shape(path) == (37, 53, 3)
+    (tmp_path / "junk.bin").write_bytes(b"nope")
+    assert probe_shape(str(tmp_path / "junk.bin")) is None
+
+
+def test_streaming_estimate_is_bounded_by_tiles(monkeypatch):
+    monkeypatch.setattr(settings, "TILE_WORKERS", 4)
+    tall = (400_000, 720, 3)
+    assert calculate_estimated_usage(tall, streaming=True) < calculate_estimated_usage(tall) / 2
+    # While the tile working set dominates, the estimate no longer grows with the strip height
+    assert calculate_estimated_usage((80_000, 720, 3), streaming=True) == calculate_estimated_usage((120_000, 720, 3), streaming=True)
+
+
+def test_clean_file_mmap_matches_in_memory(tmp_path, monkeypatch):
+    rng = np.random.default_rng(5)
+    strip = np.where(rng.integers(0, 255, (5200, 240, 3)) > 128, 250, 30).astype(np.uint8)
+    in_path = str(tmp_path / "strip.png")
+    cv2.imwrite(in_path, strip)
+    monkeypatch.setattr(settings, "STRIP_TMP_DIR", str(tmp_path / "tmp"))
+
+    pipeline = MangaCleanerPipeline()
+    pipeline.result_cache = None
+    pipeline.detector = MagicMock()
+    box = {"box": [[20, 20], [120, 20], [120, 60], [20, 60]], "text": "t", "confidence": 0.9}
+    pipeline.detector.detect_batch.side_effect = lambda tiles, **kw: [[box] for _ in tiles]
+
+    outputs = {}
+    for mode in ("memory", "mmap"):
+        monkeypatch.setattr(settings, "STRIP_STORAGE_MODE", mode)
+        out_path = str(tmp_path / f"out_{mode}.png")
+        count = pipeline.clean_file(in_path, out_path, job_id=mode, before_path=str(tmp_path / f"before_{mode}.png"))
+        outputs[mode] = (cv2.imread(out_path), count)
+
+    assert outputs["memory"][1] == outputs["mmap"][1]
+    assert np.array_equal(outputs["memory"][0], outputs["mmap"][0])
+    assert os.listdir(tmp_path / "tmp") == []
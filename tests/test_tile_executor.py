@@ -0,0 +1,83 @@
+import sys
+from unittest.mock import MagicMock
+
+# Module-level Mocking: the OCR backend is not needed to exercise the tile engine
+sys.modules.setdefault("easyocr", MagicMock())
+
+import time
+import threading
+import numpy as np
+from config.settings import settings
+from core.tile_executor import TileExecutor, limit_native_threads, resolve_tile_workers
+from core.pipeline import MangaCleanerPipeline
+
+
+def test_map_ordered_keeps_submission_order():
+    """Results come back in input order even when later jobs finish first."""
+    def slow_first(i):
+        time.sleep(0.02 * (5 - i))
+        return i
+
+    executor = TileExecutor(workers=4)
+    assert list(executor.map_ordered(slow_first, range(6))) == list(range(6))
+
+
+def test_map_ordered_is_bounded():
+    """No more than max_in_flight jobs may be alive at once."""
+    alive = []
+    peak = []
+    lock = threading.Lock()
+
+    def job(i):
+        with lock:
+            alive.append(i)
+            peak.append(len(alive))
+        time.sleep(0.01)
+        with lock:
+            alive.remove(i)
+        return i
+
+    executor = TileExecutor(workers=2, max_in_flight=3)
+    list(executor.map_ordered(job, range(20)))
+    assert max(peak) <= 3
+
+
+def test_resolve_tile_workers_auto():
+    assert resolve_tile_workers(3) == 3
+    assert resolve_tile_workers(0) >= 1
+
+
+def test_native_threads_are_split_between_processes_and_tiles(monkeypatch):
+    import core.tile_executor as tile_executor
+    torch = MagicMock()
+    monkeypatch.setitem(sys.modules, "torch", torch)
+    monkeypatch.setattr(tile_executor.cv2, "setNumThreads", MagicMock())
+    monkeypatch.setattr(tile_executor.os, "cpu_count", lambda: 16)
+    monkeypatch.setattr(settings, "TILE_WORKERS", 4)
+
+    assert limit_native_threads(2) == 2
+    tile_executor.cv2.setNumThreads.assert_called_once_with(2)
+    torch.set_num_threads.assert_called_once_with(2)
+    # Never below one thread, however many workers share the cores
+    assert limit_native_threads(8) == 1
+
+
+def test_parallel_tiles_are_byte_identical_to_serial(monkeypatch):
+    """The overlap blend must produce exactly the same strip in serial and parallel mode."""
+    rng = np.random.default_rng(7)
+    strip = rng.integers(0, 255, (5000, 300, 3), dtype=np.uint8)
+    strip[:, :, :] = np.where(strip > 128, 250, strip)
+
+    pipeline = MangaCleanerPipeline()
+    pipeline.result_cache = None
+    pipeline.detector = MagicMock()
+    box = {"box": [[40, 40], [140, 40], [140, 80], [40, 80]], "text": "txt", "confidence": 0.9}
+    pipeline.detector.detect_batch.side_effect = lambda tiles, **kw: [[box] for _ in tiles]
+
+    monkeypatch.setattr(settings, "TILE_WORKERS", 1)
+    serial, serial_count = pipeline._process_core(strip, job_id="serial")
+    monkeypatch.setattr(settings, "TILE_WORKERS", 4)
+    parallel, parallel_count = pipeline._process_core(strip, job_id="parallel")
+
+    assert serial_count == parallel_count
+    assert np.array_equal(serial, parallel)
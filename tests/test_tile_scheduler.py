@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+import core.tile_scheduler as tile_scheduler
+from core.exceptions import TileSeamError
+from core.tile_scheduler import TileScheduler
+from core.strip_storage import StripStore
+from core.tile_strategy import MIN_TILE_HEIGHT, generate_text_aware_tiles
+
+
+def _strip(h=3000, w=64, seed=1):
+    return np.random.default_rng(seed).integers(0, 255, (h, w, 3), dtype=np.uint8)
+
+
+def test_identity_processor_reconstructs_the_strip():
+    strip = _strip()
+    scheduler = TileScheduler(lambda tile, bounds: tile, tile_height=700, overlap=120, workers=3, pad_bottom=150)
+    result, count, boxes = scheduler.run(strip)
+    assert np.array_equal(result, strip)
+    assert (count, boxes) == (0, [])
+
+
+def test_batched_processor_sees_consecutive_windows_and_counts_merge():
+    strip = _strip(h=2500)
+    seen = []
+
+    def process(tiles, bounds):
+        seen.append(list(bounds))
+        return [(tile, 1, [{"y": y0}]) for tile, (y0, _) in zip(tiles, bounds)]
+
+    scheduler = TileScheduler(process, batched=True, batch_size=2, tile_height=1000, overlap=100, workers=2,
+                              dynamic_height=False)
+    result, count, boxes = scheduler.run(strip)
+    # Batches run on two workers: their completion order is not fixed
+    flat = sorted(b for batch in seen for b in batch)
+    assert flat == [(0, 1000), (900, 1900), (1800, 2500)]
+    assert all(len(batch) <= 2 for batch in seen)
+    assert count == 3 and [b["y"] for b in boxes] == [0, 900, 1800]
+    assert np.array_equal(result, strip)
+
+
+def test_seam_policy(monkeypatch):
+    strip = np.full((1500, 32, 3), 128, dtype=np.uint8)
+    # Every tile is shifted differently, so neighbours disagree on their overlap
+    shifted = lambda tile, bounds: np.clip(tile.astype(np.int16) + (bounds[0] % 3) * 40, 0, 255).astype(np.uint8)
+
+    strict = TileScheduler(shifted, tile_height=600, overlap=100, workers=1, seam_threshold=10, seam_policy="raise",
+                           smart_cuts=False)
+    with pytest.raises(TileSeamError):
+        strict.run(strip)
+
+    warnings = []
+    monkeypatch.setattr(tile_scheduler.logger, "warning", lambda msg, **kw: warnings.append(msg))
+    lenient = TileScheduler(shifted, tile_height=600, overlap=100, workers=1, seam_threshold=10, seam_policy="warn",
+                            smart_cuts=False)
+    lenient.run(strip)
+    assert warnings and "seam" in warnings[0]
+
+
+def test_dynamic_height_falls_back_when_ram_is_exhausted(monkeypatch):
+    def exhausted(width, height):
+        raise MemoryError("no room")
+
+    monkeypatch.setattr(tile_scheduler, "compute_dynamic_tile_height", exhausted)
+    scheduler = TileScheduler(tile_height=2048, overlap=64, workers=1, dynamic_height=True)
+    tile_height, bounds = scheduler.plan(5000, 100)
+    assert tile_height == MIN_TILE_HEIGHT
+    assert bounds[0] == (0, MIN_TILE_HEIGHT) and bounds[-1][1] == 5000
+
+    monkeypatch.setattr(tile_scheduler, "compute_dynamic_tile_height", lambda width, height: 10**6)
+    assert scheduler.plan(5000, 100)[0] == 2048
+
+
+def _panels(h=6000, w=80):
+    """Inked panels separated by white gutters at known rows."""
+    strip = _strip(h=h, w=w)
+    gutters = [(1800, 1900), (3700, 3760)]
+    for y0, y1 in gutters:
+        strip[y0:y1] = 255
+    return strip, gutters
+
+
+def test_text_aware_cuts_land_in_gutters():
+    strip, gutters = _panels()
+    store = StripStore(strip)
+    bounds = list(generate_text_aware_tiles(store.read_window, 6000, 2048, 120, search=512, min_flat=24))
+    assert bounds[:2] == [(0, 1850), (1850, 3730)]
+    # No gutter in reach of the third boundary: the fixed cut keeps its overlap
+    assert bounds[2] == (3730, 3730 + 2048)
+    assert bounds[3] == (3730 + 2048 - 120, 6000)
+
+
+def test_smart_cuts_skip_overlap_work_and_keep_the_strip():
+    strip, _ = _panels()
+    rows = []
+
+    def process(tile, bounds):
+        rows.append(tile.shape[0])
+        return tile
+
+    scheduler = TileScheduler(process, tile_height=2048, overlap=120, workers=2, smart_cuts=True, dynamic_height=False)
+    result, _, _ = scheduler.run(strip)
+    assert np.array_equal(result, strip)
+    # Only the one fixed cut is processed twice
+    assert sum(rows) == 6000 + 120
@@ -0,0 +1,45 @@
+import io
+import os
+import zipfile
+import pytest
+from web_app.zip_stream import stream_zip, session_entries
+
+
+def _make_session(tmp_path):
+    pages = {
+        "after_001.png": os.urandom(300_000),
+        "after_002.png": b"\x89PNG" * 50_000,
+        "before_001.png": b"ignored",
+        "input_001.png": b"ignored",
+    }
+    for name, payload in pages.items():
+        (tmp_path / name).write_bytes(payload)
+    return pages
+
+
+@pytest.mark.parametrize("compression", ["stored", "deflate"])
+def test_stream_zip_round_trip(tmp_path, compression):
+    pages = _make_session(tmp_path)
+    chunks = list(stream_zip(session_entries(str(tmp_path)), compression=compression, chunk_size=64 * 1024))
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == ["001.png", "002.png"]
+        assert archive.read("001.png") == pages["after_001.png"]
+        assert archive.read("002.png") == pages["after_002.png"]
+        expected = zipfile.ZIP_STORED if compression == "stored" else zipfile.ZIP_DEFLATED
+        assert all(info.compress_type == expected for info in archive.infolist())
+
+
+def test_stream_zip_emits_bounded_chunks(tmp_path):
+    """Data leaves the generator while files are still being read, never as one big blob."""
+    _make_session(tmp_path)
+    chunk_size = 64 * 1024
+    chunks = list(stream_zip(session_entries(str(tmp_path)), chunk_size=chunk_size))
+    assert len(chunks) > 4
+    assert max(len(c) for c in chunks) < 2 * chunk_size
+
+
+def test_stream_zip_rejects_unknown_mode(tmp_path):
+    with pytest.raises(ValueError):
+        list(stream_zip([], compression="lzma"))
@@ -1,8 +1,28 @@
 import os
+import threading
 import numpy as np
 import cv2
 import onnxruntime as ort
 
+# Sessão ONNX carregada uma única vez por modelo (antes era recriada a cada chamada)
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def _get_session(model_path: str) -> ort.InferenceSession:
+    session = _sessions.get(model_path)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(model_path)
+            if session is None:
+                opts = ort.SessionOptions()
+                opts.intra_op_num_threads = os.cpu_count() or 1
+                opts.inter_op_num_threads = 1
+                opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+                opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                session = ort.InferenceSession(model_path, sess_options=opts, providers=['CPUExecutionProvider'])
+                _sessions[model_path] = session
+    return session
+
 def lama_inpaint(image: np.ndarray, mask: np.ndarray) -> np.ndarray:
     """
     Executa inpainting usando o modelo LaMa ONNX na CPU e valida as entradas conformes as especificações.
@@ -32,8 +52,8 @@ def lama_inpaint(image: np.ndarray, mask: np.ndarray) -> np.ndarray:
     if not os.path.exists(model_path):
         raise FileNotFoundError(f"Erro: Modelo LaMa não existe no caminho {model_path}.")
         
-    # Usar ONNX Runtime já disponível na CPU
-    session = ort.InferenceSession(model_path, providers=['CPUExecutionProvider'])
+    # Usar ONNX Runtime já disponível na CPU (sessão reaproveitada entre chamadas)
+    session = _get_session(model_path)
     
     # Identificar Bounding Box da máscara para recorte ROI
     y_indices, x_indices = np.where(mask > 0)
@@ -0,0 +1,79 @@
+# web_app/binary_io.py
+
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+from fastapi import Request
+
+from core.exceptions import InvalidImageError
+
+MEDIA_TYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+}
+
+
+async def read_binary_field(request: Request, field: str = "image") -> bytes:
+    """
+    Returns the raw bytes of an uploaded image.
+    Accepts multipart/form-data (the file under `field`) or a raw body (any image/* or
+    application/octet-stream content type), so clients can skip multipart framing entirely.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get(field)
+        if upload is None:
+            raise InvalidImageError(f"Missing multipart field '{field}'")
+        if isinstance(upload, str):
+            return upload.encode("latin-1")
+        return await upload.read()
+    return await request.body()
+
+
+async def read_form_value(request: Request, field: str, default: Optional[str] = None) -> Optional[str]:
+    """Text field of a multipart form, falling back to the query string."""
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        value = (await request.form()).get(field)
+        if isinstance(value, str):
+            return value
+    return request.query_params.get(field, default)
+
+
+def decode_image(data: bytes, flags: int = cv2.IMREAD_COLOR) -> np.ndarray:
+    """Decodes image bytes straight from the request buffer (np.frombuffer: no copy before imdecode)."""
+    if not data:
+        raise InvalidImageError("Empty image payload")
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), flags)
+    if img is None:
+        raise InvalidImageError("Imagem inválida")
+    return img
+
+
+def encode_image(img: np.ndarray, fmt: str = "png", quality: Optional[int] = None) -> Tuple[bytes, str]:
+    """Encodes an image for a binary response. WebP is lossless unless a quality (1-100) is given."""
+    if fmt not in MEDIA_TYPES:
+        raise InvalidImageError(f"Unsupported output format: {fmt}")
+    if fmt == "webp":
+        params = [cv2.IMWRITE_WEBP_QUALITY, 101 if quality is None else int(quality)]
+    else:
+        params = []  # OpenCV default level: same bytes as the base64 endpoints
+    ok, buffer = cv2.imencode(f".{fmt}", img, params)
+    if not ok:
+        raise InvalidImageError(f"Failed to encode {fmt} output")
+    return buffer.tobytes(), MEDIA_TYPES[fmt]
+
+
+def mask_to_binary(mask_raw: np.ndarray) -> np.ndarray:
+    """Editor masks arrive as RGBA (alpha = painted), BGR or grey. Returns a 0/255 single-channel mask."""
+    if len(mask_raw.shape) == 3 and mask_raw.shape[2] == 4:
+        mask_gray = mask_raw[:, :, 3] # Canal Alpha
+    elif len(mask_raw.shape) == 3:
+        mask_gray = cv2.cvtColor(mask_raw, cv2.COLOR_BGR2GRAY)
+    else:
+        mask_gray = mask_raw
+
+    # Garantir binário conforme original app.py
+    _, mask_gray = cv2.threshold(mask_gray, 10, 255, cv2.THRESH_BINARY)
+    return mask_gray
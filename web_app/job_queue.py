@@ -0,0 +1,251 @@
+# web_app/job_queue.py
+
+import time
+import queue
+import asyncio
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from config.settings import settings
+from core.exceptions import QueueFullError
+from core.logger import logger
+
+# --- Worker side (runs inside the pool processes) ---------------------------------
+
+_worker_pipeline = None
+_worker_events = None
+
+
+def _init_worker(events=None, processes: int = 1):
+    """
+    Pool initializer: loads the pipeline (and OCR weights) once, so workers stay warm across jobs.
+    `processes` is the pool size: native thread pools are sized so the workers share the cores.
+    """
+    global _worker_pipeline, _worker_events
+    if events is not None:
+        _worker_events = events
+    if _worker_pipeline is not None:
+        return
+    from core.pipeline import MangaCleanerPipeline
+    from core.tile_executor import limit_native_threads
+    limit_native_threads(processes)
+    _worker_pipeline = MangaCleanerPipeline()
+    _worker_pipeline.detector.ocr  # Force the lazy EasyOCR load now, not on the first page
+
+
+def _emit(session_id: Optional[str], event: Dict[str, Any]):
+    """Sends a progress event from a worker back to the scheduler process (never blocks the job)."""
+    if _worker_events is None or session_id is None:
+        return
+    try:
+        _worker_events.put_nowait((session_id, event))
+    except Exception:
+        pass
+
+
+def clean_file_job(file_path: str, before_path: str, after_path: str, job_id: str,
+                   session_id: Optional[str] = None, filename: Optional[str] = None) -> bool:
+    """Cleans one uploaded file and writes the before/after pair. Returns False for unreadable images."""
+    from core.exceptions import InvalidImageError
+    _init_worker()
+    _emit(session_id, {"type": "file_started", "file": filename})
+    progress = lambda event: _emit(session_id, {**event, "file": filename})
+    try:
+        # File to file: very tall strips go through memmap storage instead of three in-RAM copies
+        _worker_pipeline.clean_file(file_path, after_path, job_id, progress=progress, before_path=before_path)
+    except InvalidImageError:
+        return False
+    return True
+
+
+# --- Scheduler side (runs on the FastAPI event loop) ------------------------------
+
+class JobQueue:
+    """
+    Local job queue in front of a pool of warm worker processes.
+    - Backpressure: admit() rejects submissions that would exceed JOB_QUEUE_MAX_DEPTH files.
+    - Fairness: free slots go round-robin across sessions (highest priority first),
+      so one big chapter can't starve a second user's upload.
+    - Visibility: snapshot() exposes depth, running jobs and an ETA from the mean file time.
+    All bookkeeping happens on the event loop thread, so no locks are needed.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_depth: Optional[int] = None,
+                 on_event: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        self.workers = settings.JOB_WORKERS if workers is None else workers
+        self.slots = max(1, self.workers)
+        self.max_depth = settings.JOB_QUEUE_MAX_DEPTH if max_depth is None else max_depth
+        self._executor: Optional[Executor] = None
+        self._waiters: Dict[str, deque] = {}
+        self._priority: Dict[str, int] = {}
+        self._pending: Dict[str, int] = {}
+        self._served: Dict[str, int] = {}
+        self._running = 0
+        self._avg_seconds: Optional[float] = None
+        self.on_event = on_event
+        self._events = None
+        self._event_reader: Optional[threading.Thread] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.workers <= 0:
+                # In-process fallback (low RAM / debugging): one thread, pipeline loaded in this process
+                self._events = queue.Queue()
+                self._executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="job",
+                    initializer=_init_worker, initargs=(self._events,)
+                )
+            else:
+                ctx = multiprocessing.get_context("spawn")
+                self._events = ctx.Queue()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=ctx,
+                    initializer=_init_worker,
+                    initargs=(self._events, self.workers)
+                )
+            self._event_reader = threading.Thread(target=self._read_events, name="job-events", daemon=True)
+            self._event_reader.start()
+            logger.info(f"Job queue started with {self.slots} worker(s)", extra={
+                "extra": {"workers": self.workers, "max_depth": self.max_depth}
+            })
+        return self._executor
+
+    def _discard_executor(self, executor: Executor):
+        """
+        A worker died abruptly (e.g. OOM-killed on a huge strip): the pool is unusable for good.
+        Drop it so the next job starts a fresh one; jobs already on it fail with it.
+        """
+        if self._executor is not executor:
+            return  # Already replaced after a sibling job hit the same broken pool
+        logger.error("Job worker pool broken (worker died); starting a new pool for the next job")
+        executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        if self._events is not None:
+            self._events.put(None)
+            self._events = None
+
+    def _read_events(self):
+        """Forwards worker progress events to on_event until shutdown posts the sentinel."""
+        events = self._events
+        while True:
+            try:
+                item = events.get()
+            except (EOFError, OSError):
+                return
+            if item is None:
+                return
+            if self.on_event is not None:
+                try:
+                    self.on_event(*item)
+                except Exception as e:
+                    logger.warning(f"Progress event handler failed: {str(e)}")
+
+    def depth(self) -> int:
+        return sum(self._pending.values())
+
+    def admit(self, session_id: str, n_files: int, priority: int = 0):
+        """Reserves queue capacity for a session. Raises QueueFullError when the queue is saturated."""
+        depth = self.depth()
+        if depth + n_files > self.max_depth:
+            raise QueueFullError(f"Job queue full: {depth} files queued, limit {self.max_depth}")
+        self._pending[session_id] = self._pending.get(session_id, 0) + n_files
+        self._priority[session_id] = priority
+
+    def release(self, session_id: str):
+        """Drops whatever is left of a session's reservation (finished, cancelled or failed)."""
+        self._pending.pop(session_id, None)
+        self._priority.pop(session_id, None)
+        self._served.pop(session_id, None)
+
+    async def run(self, session_id: str, fn: Callable, *args, skip: Optional[Callable[[], bool]] = None) -> Any:
+        """
+        Waits for a fair slot, then runs fn(*args) on the pool.
+        `skip` is checked once the slot is granted (e.g. session cancelled); the job is then dropped.
+        """
+        await self._acquire(session_id)
+        started = time.monotonic()
+        ran = False
+        try:
+            if skip is not None and skip():
+                return None
+            ran = True
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            try:
+                return await loop.run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                self._discard_executor(executor)
+                raise
+        finally:
+            if ran:
+                elapsed = time.monotonic() - started
+                self._avg_seconds = elapsed if self._avg_seconds is None else 0.8 * self._avg_seconds + 0.2 * elapsed
+            if self._pending.get(session_id, 0) > 0:
+                self._pending[session_id] -= 1
+            self._running -= 1
+            self._wake_next()
+
+    async def _acquire(self, session_id: str):
+        if self._running < self.slots and not self._waiters:
+            self._grant(session_id)
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(session_id, deque()).append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was granted right before the cancel: hand it to the next session
+                self._running -= 1
+                self._wake_next()
+            raise
+
+    def _grant(self, session_id: str):
+        self._running += 1
+        self._served[session_id] = self._served.get(session_id, 0) + 1
+
+    def _next_session(self) -> str:
+        # Highest priority first; among equals, the session granted the fewest slots so far (round-robin)
+        return min(self._waiters, key=lambda s: (-self._priority.get(s, 0), self._served.get(s, 0)))
+
+    def _wake_next(self):
+        while self._running < self.slots and self._waiters:
+            session_id = self._next_session()
+            waiters = self._waiters[session_id]
+            waiter = waiters.popleft()
+            if not waiters:
+                del self._waiters[session_id]
+            if waiter.done():
+                continue
+            self._grant(session_id)
+            waiter.set_result(None)
+
+    def snapshot(self, session_id: Optional[str] = None) -> Dict[str, Any]:
+        depth = self.depth()
+        eta = None
+        if self._avg_seconds is not None:
+            eta = round(depth * self._avg_seconds / self.slots, 1)
+        info = {
+            "workers": self.slots,
+            "running": self._running,
+            "queued": depth,
+            "max_depth": self.max_depth,
+            "avg_file_seconds": round(self._avg_seconds, 2) if self._avg_seconds is not None else None,
+            "eta_seconds": eta,
+        }
+        if session_id is not None:
+            info["session_remaining"] = self._pending.get(session_id, 0)
+        return info
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._events is not None:
+            self._events.put(None)
+            self._events = None
@@ -1,10 +1,7 @@
 # web_app/main.py
 
 import os
-import io
-import gc
 import uuid
-import zipfile
 import asyncio
 import numpy as np
 import cv2
@@ -12,13 +9,15 @@ import time
 import logging
 import subprocess
 import base64
+import json
 import traceback
 import sys
+import secrets
 from pathlib import Path
 from pydantic import BaseModel
 
-from fastapi import FastAPI, UploadFile, File, WebSocket, BackgroundTasks, WebSocketDisconnect
-from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse
+from fastapi import FastAPI, UploadFile, File, Header, WebSocket, BackgroundTasks, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse, Response, FileResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi import Request
@@ -26,6 +25,9 @@ from fastapi import Request
 class AutoCleanRequest(BaseModel):
     image: str
 
+class DetectBalloonsRequest(AutoCleanRequest):
+    with_text: bool = True  # Editor tools (Smart OCR) read box text; False = boxes only, faster
+
 class SaveImageRequest(BaseModel):
     session: str
     filename: str
@@ -43,8 +45,16 @@ class UltraInpaintRequest(BaseModel):
     mask: str
     use_frequency_separation: bool = True
 
+from config.settings import settings
 from core.pipeline import MangaCleanerPipeline
+from core.profiler import profiling, stage
+from core.preview import PreviewGenerator, preview_levels
 from core.font_manager import WebtoonFontManager
+from core.exceptions import QueueFullError, InvalidImageError
+from web_app.job_queue import JobQueue, clean_file_job
+from web_app.progress import ProgressBroker, is_terminal
+from web_app.zip_stream import COMPRESSION_MODES, stream_zip, session_entries
+from web_app.binary_io import read_binary_field, read_form_value, decode_image, encode_image, mask_to_binary
 
 # Robust resource path resolution for PyInstaller
 def get_resource_path(relative_path):
@@ -110,6 +120,9 @@ app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
 
 pipeline = MangaCleanerPipeline()
 font_manager = WebtoonFontManager()
+progress_broker = ProgressBroker()
+job_queue = JobQueue(on_event=progress_broker.publish_threadsafe)
+preview_generator = PreviewGenerator()
 
 # In-memory session tracking
 sessions = {}
@@ -140,21 +153,52 @@ async def ultra(request: Request):
 @app.websocket("/ws/{session}")
 async def websocket_progress(websocket: WebSocket, session: str):
     await websocket.accept()
+    # Subscribe before the first snapshot so no event can slip in between
+    events = progress_broker.subscribe(session)
     try:
-        while True:
-            await asyncio.sleep(0.5)
-            if session in sessions:
-                await websocket.send_json(sessions[session])
-                if sessions[session]["status"] == "done":
-                    break
+        if session not in sessions:
+            await websocket.send_json({"status": "error: unknown session", "processed": 0, "total": 0})
+            return
+        await websocket.send_json(sessions[session])
+        # Event-driven: wake up only when the session publishes something
+        while not is_terminal(sessions[session]["status"]):
+            event = await events.get()
+            await websocket.send_json({**sessions[session], "event": event})
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected for session: {session}")
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
+    finally:
+        progress_broker.unsubscribe(session, events)
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+def granted_priority(priority: int, token: str = None) -> int:
+    """Queue priority a /start caller gets: jumping ahead of other sessions needs JOB_PRIORITY_TOKEN."""
+    expected = settings.JOB_PRIORITY_TOKEN
+    if expected and token and secrets.compare_digest(token.encode(), expected.encode()):
+        return priority
+    return 0
 
 @app.post("/start")
-async def start_process(background_tasks: BackgroundTasks, files: list[UploadFile] = File(...)):
+async def start_process(background_tasks: BackgroundTasks, files: list[UploadFile] = File(...), priority: int = 0,
+                        x_priority_token: str = Header(None)):
     session_id = str(uuid.uuid4())
+
+    # Backpressure: refuse before touching the disk when the queue is saturated
+    try:
+        job_queue.admit(session_id, len(files), priority=granted_priority(priority, x_priority_token))
+    except QueueFullError as e:
+        queue_info = job_queue.snapshot()
+        retry_after = int(queue_info["eta_seconds"] or 30)
+        return JSONResponse(
+            status_code=429,
+            content={"error": e.message, "queue": queue_info},
+            headers={"Retry-After": str(retry_after)}
+        )
+
     session_folder = os.path.join(OUTPUT_DIR, session_id)
     os.makedirs(session_folder, exist_ok=True)
     
@@ -172,58 +216,94 @@ async def start_process(background_tasks: BackgroundTasks, files: list[UploadFil
         "processed": 0,
         "status": "processing",
         "cancel": False,
-        "files": [f.filename for f in files]
+        "files": [f.filename for f in files],
+        "failed": []
     }
 
     background_tasks.add_task(process_task, input_paths, session_id)
 
-    return {"session": session_id}
+    return {"session": session_id, "queue": job_queue.snapshot(session_id)}
 
-async def process_task(input_paths, session_id):
+async def process_file(session_id, file_path, filename):
     session_folder = os.path.join(OUTPUT_DIR, session_id)
-    
+    before_path = os.path.join(session_folder, "before_" + filename)
+    after_path = os.path.join(session_folder, "after_" + filename)
+
+    # Runs on a warm worker process; the queue hands out slots fairly across sessions
     try:
-        for file_path, filename in input_paths:
-            if sessions.get(session_id, {}).get("cancel"):
-                sessions[session_id]["status"] = "cancelled"
-                logger.info(f"Session {session_id} cancelled.")
-                return
-
-            image = cv2.imread(file_path, cv2.IMREAD_COLOR)
-
-            if image is None:
-                logger.warning(f"Invalid image: {filename}")
-                sessions[session_id]["processed"] += 1
-                continue
-
-            # Use a thread para não bloquear o Event Loop do FastAPI (que faria o WebSocket travar em "Aguardando...")
-            result = await asyncio.to_thread(
-                pipeline.process_webtoon_streaming,
-                image, 
-                job_id=f"ws_{session_id}_{filename}"
-            )
-
-            # Save preview pair
-            before_path = os.path.join(session_folder, "before_" + filename)
-            after_path = os.path.join(session_folder, "after_" + filename)
-
-            cv2.imwrite(before_path, image)
-            cv2.imwrite(after_path, result)
-
-            sessions[session_id]["processed"] += 1
-            
-            # Explicit memory cleanup per file
-            del image
-            del result
-            gc.collect()
+        ok = await job_queue.run(
+            session_id,
+            clean_file_job,
+            file_path, before_path, after_path, f"ws_{session_id}_{filename}", session_id, filename,
+            skip=lambda: sessions.get(session_id, {}).get("cancel", False)
+        )
+    except Exception as e:
+        # Only this file fails (pipeline error, crashed worker): its siblings keep their slots and output
+        logger.exception(f"Error processing {filename} [Session: {session_id}]")
+        sessions[session_id]["failed"].append(filename)
+        sessions[session_id]["processed"] += 1
+        progress_broker.publish(session_id, {"type": "file_done", "file": filename, "ok": False, "error": str(e)})
+        return
+    if ok is None:
+        return
+    if not ok:
+        logger.warning(f"Invalid image: {filename}")
+
+    if ok:
+        queue_previews(session_folder, "before_" + filename, "after_" + filename)
+
+    sessions[session_id]["processed"] += 1
+    progress_broker.publish(session_id, {"type": "file_done", "file": filename, "ok": bool(ok)})
+
+async def process_task(input_paths, session_id):
+    # process_file handles its own errors: the reservation is released only once every file is done
+    try:
+        await asyncio.gather(*(process_file(session_id, file_path, filename) for file_path, filename in input_paths))
+
+        if sessions.get(session_id, {}).get("cancel"):
+            sessions[session_id]["status"] = "cancelled"
+            logger.info(f"Session {session_id} cancelled.")
+            return
 
         sessions[session_id]["status"] = "done"
-        logger.info(f"Session {session_id} completed successfully.")
+        failed = sessions[session_id]["failed"]
+        if failed:
+            logger.warning(f"Session {session_id} completed with {len(failed)} failed file(s): {failed}")
+        else:
+            logger.info(f"Session {session_id} completed successfully.")
 
     except Exception as e:
         logger.exception(f"Error in background task {session_id}")
         if session_id in sessions:
             sessions[session_id]["status"] = f"error: {str(e)}"
+    finally:
+        job_queue.release(session_id)
+        progress_broker.publish(session_id, {"type": "status"})
+
+@app.get("/queue")
+def queue_status(session: str = None):
+    return job_queue.snapshot(session)
+
+@app.on_event("startup")
+async def bind_progress_broker():
+    progress_broker.bind(asyncio.get_running_loop())
+
+def warm_lama_pool():
+    try:
+        from core.advanced_inpaint import get_lama_engine
+        get_lama_engine().warm()
+    except Exception as e:
+        logger.warning(f"LaMa pool warm-up skipped: {str(e)}")
+
+@app.on_event("startup")
+async def start_lama_pool():
+    # Sessions are built in the background so the server answers immediately
+    asyncio.get_running_loop().run_in_executor(None, warm_lama_pool)
+
+@app.on_event("shutdown")
+def shutdown_job_queue():
+    job_queue.shutdown()
+    preview_generator.shutdown()
 
 @app.post("/cancel/{session}")
 def cancel_process(session: str):
@@ -233,27 +313,52 @@ def cancel_process(session: str):
     return {"status": "not_found"}
 
 @app.get("/download/{session}")
-def download_zip(session: str):
+def download_zip(session: str, compression: str = "stored"):
     session_folder = os.path.join(OUTPUT_DIR, session)
     if not os.path.exists(session_folder):
         return JSONResponse(status_code=404, content={"error": "Session not found"})
+    if compression not in COMPRESSION_MODES:
+        return JSONResponse(status_code=400, content={"error": f"Unsupported compression: {compression}"})
 
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w") as zip_file:
-        for filename in os.listdir(session_folder):
-            if filename.startswith("after_"):
-                zip_file.write(
-                    os.path.join(session_folder, filename),
-                    arcname=filename.replace("after_", "")
-                )
-
-    zip_buffer.seek(0)
+    # Streamed entry by entry: first bytes go out immediately, RAM stays at ~1 chunk
     return StreamingResponse(
-        zip_buffer,
+        stream_zip(session_entries(session_folder), compression=compression),
         media_type="application/zip",
         headers={"Content-Disposition": f"attachment; filename=manga_clean_{session[:8]}.zip"}
     )
 
+def queue_previews(session_folder: str, *names: str):
+    """Builds the WebP preview pyramid of session pages in the background."""
+    if not settings.PREVIEW_ENABLED:
+        return
+    for name in names:
+        preview_generator.submit(os.path.join(session_folder, name), os.path.join(session_folder, "previews"), name)
+
+@app.get("/preview/{session}/{filename}")
+async def preview(session: str, filename: str, request: Request, size: str = "1024"):
+    """
+    Downscaled WebP of a session page (before_/after_ name as in /processed): size is one of
+    PREVIEW_WIDTHS or "full". Missing or outdated pyramids are built on demand; the page itself
+    is served when no level is large enough. ETag revalidation keeps re-edited pages fresh.
+    """
+    if size not in preview_levels():
+        return JSONResponse(status_code=400, content={"error": f"Unsupported size: {size}", "sizes": preview_levels()})
+    session_folder = os.path.join(OUTPUT_DIR, os.path.basename(session))
+    src_path = os.path.join(session_folder, os.path.basename(filename))
+    if not os.path.isfile(src_path):
+        return JSONResponse(status_code=404, content={"error": "Page not found"})
+
+    path = src_path
+    if settings.PREVIEW_ENABLED:
+        folder = os.path.join(session_folder, "previews")
+        path = await asyncio.to_thread(preview_generator.ensure, src_path, folder, os.path.basename(filename), size) or src_path
+
+    st = os.stat(path)
+    headers = {"ETag": f'"{st.st_mtime_ns:x}-{st.st_size:x}"', "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, headers=headers)
+
 @app.get("/health")
 def health():
     return {"status": "ultimate_active"}
@@ -269,7 +374,7 @@ def list_fonts():
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 @app.post("/api/auto_clean_page")
-async def api_auto_clean_page(req: AutoCleanRequest):
+async def api_auto_clean_page(req: AutoCleanRequest, profile: bool = False):
     try:
         # Decode image
         img_data = req.image.split(',')[1] if ',' in req.image else req.image
@@ -280,27 +385,51 @@ async def api_auto_clean_page(req: AutoCleanRequest):
             return JSONResponse(status_code=400, content={"error": "Imagem inválida"})
 
         # Executar Limpeza de Balões do Pipeline
-        result, cleaned_count = await asyncio.to_thread(
-            pipeline._process_core,
-            img, 
-            job_id=f"auto_clean_{uuid.uuid4().hex[:8]}"
-        )
-        
-        # Encode result
-        _, buffer = cv2.imencode('.png', result)
-        encoded_img = base64.b64encode(buffer).decode('utf-8')
+        job_id = f"auto_clean_{uuid.uuid4().hex[:8]}"
+        with profiling(job_id, enabled=profile or None) as prof:
+            result, cleaned_count = await asyncio.to_thread(pipeline._process_core, img, job_id=job_id)
+            
+            # Encode result
+            with stage("encode"):
+                _, buffer = cv2.imencode('.png', result)
+                encoded_img = base64.b64encode(buffer).decode('utf-8')
         
-        return {
+        response = {
             "result": f"data:image/png;base64,{encoded_img}",
             "cleaned_count": cleaned_count
         }
+        if profile and prof is not None:
+            response["profile"] = prof.report()
+        return response
         
     except Exception as e:
         logger.error(f"Erro Auto Clean Page: {str(e)}")
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+# Recognizer confidence below which a detected balloon is treated as noise
+DETECT_BALLOONS_THRESHOLD = 0.05
+
+def detect_balloons_payload(img: np.ndarray, with_text: bool = True) -> dict:
+    """
+    Single OCR pass for normal pages; tall strips go through tiled detection with overlap dedup.
+    Boxes carry their text unless `with_text` is off: OCR_DETECT_ONLY only spares the cleaning
+    pipeline the recognizer pass, here it runs on the detected boxes (and drops the noise ones).
+    """
+    duplicates_removed = 0
+    if img.shape[0] <= settings.TILE_HEIGHT:
+        ocr_ready = pipeline._preprocess_for_ocr(img)
+        balloons = pipeline.detector.detect_batch([ocr_ready], job_id="detect_balloons", threshold=DETECT_BALLOONS_THRESHOLD,
+                                                  recognize=not settings.OCR_DETECT_ONLY)[0]
+    else:
+        balloons, stats = pipeline.detect_page(img, job_id="detect_balloons", threshold=DETECT_BALLOONS_THRESHOLD)
+        duplicates_removed = stats["duplicates_removed"]
+    if with_text and settings.OCR_DETECT_ONLY:
+        balloons = pipeline.detector.recognize(pipeline._preprocess_for_ocr(img), balloons, job_id="detect_balloons")
+        balloons = [b for b in balloons if b["confidence"] >= DETECT_BALLOONS_THRESHOLD]
+    return {"balloons": balloons, "duplicates_removed": duplicates_removed}
+
 @app.post("/api/detect_balloons")
-async def api_detect_balloons(req: AutoCleanRequest):
+async def api_detect_balloons(req: DetectBalloonsRequest):
     try:
         # Decode image
         img_data = req.image.split(',')[1] if ',' in req.image else req.image
@@ -310,20 +439,8 @@ async def api_detect_balloons(req: AutoCleanRequest):
         if img is None:
             return JSONResponse(status_code=400, content={"error": "Imagem inválida"})
 
-        # Preprocessar e detectar
-        ocr_ready = pipeline._preprocess_for_ocr(img)
-        results = pipeline.detector.ocr.readtext(ocr_ready)
-        
-        balloons = []
-        for (bbox, text, prob) in results:
-            if prob >= 0.05:
-                balloons.append({
-                    "box": [[float(p[0]), float(p[1])] for p in bbox],
-                    "text": text,
-                    "confidence": float(prob)
-                })
-        
-        return {"balloons": balloons}
+        # Tiled detection of a tall strip takes seconds: keep the event loop (and websockets) free
+        return await asyncio.to_thread(detect_balloons_payload, img, req.with_text)
         
     except Exception as e:
         logger.error(f"Erro Detect Balloons: {str(e)}")
@@ -376,16 +493,7 @@ async def api_ultra_inpaint(req: UltraInpaintRequest):
         mask_bytes = base64.b64decode(req.mask.split(',')[1])
         nparr_mask = np.frombuffer(mask_bytes, np.uint8)
         mask_raw = cv2.imdecode(nparr_mask, cv2.IMREAD_UNCHANGED)
-        
-        if len(mask_raw.shape) == 3 and mask_raw.shape[2] == 4:
-            mask_gray = mask_raw[:, :, 3] # Canal Alpha
-        elif len(mask_raw.shape) == 3:
-            mask_gray = cv2.cvtColor(mask_raw, cv2.COLOR_BGR2GRAY)
-        else:
-            mask_gray = mask_raw
-            
-        # Garantir binário conforme original app.py
-        _, mask_gray = cv2.threshold(mask_gray, 10, 255, cv2.THRESH_BINARY)
+        mask_gray = mask_to_binary(mask_raw)
 
         if img is None or mask_gray is None:
             logger.error("Falha ao decodificar imagem ou máscara")
@@ -444,9 +552,105 @@ async def save_image_to_session(req: SaveImageRequest):
         
         with open(file_path, "wb") as f:
             f.write(img_bytes)
+        queue_previews(session_folder, clean_name)
             
         logger.info(f"Imagem salva com sucesso em: {file_path}")
         return {"status": "success", "path": file_path}
     except Exception as e:
         logger.error(f"Erro ao salvar imagem na sessão: {str(e)}")
         return JSONResponse(status_code=500, content={"error": str(e)})
+
+# --- Binary variants of the base64 JSON APIs ---------------------------------------
+# Same behaviour, but images travel as multipart files / raw bodies and come back as
+# image/png or image/webp bytes: no +33% base64 overhead, no JSON string to parse.
+
+@app.post("/api/bin/auto_clean_page")
+async def api_bin_auto_clean_page(request: Request, format: str = "png", quality: int = None, profile: bool = False):
+    """`profile=true` returns the per-stage summary as JSON in the X-Profile header."""
+    try:
+        img = decode_image(await read_binary_field(request, "image"))
+        job_id = f"auto_clean_{uuid.uuid4().hex[:8]}"
+        with profiling(job_id, enabled=profile or None) as prof:
+            result, cleaned_count = await asyncio.to_thread(pipeline._process_core, img, job_id=job_id)
+            with stage("encode"):
+                payload, media_type = await asyncio.to_thread(encode_image, result, format, quality)
+        headers = {"X-Cleaned-Count": str(cleaned_count)}
+        if profile and prof is not None:
+            headers["X-Profile"] = json.dumps(prof.report(records=False), separators=(",", ":"))
+        return Response(content=payload, media_type=media_type, headers=headers)
+    except InvalidImageError as e:
+        return JSONResponse(status_code=400, content={"error": e.message})
+    except Exception as e:
+        logger.error(f"Erro Auto Clean Page (bin): {str(e)}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+@app.post("/api/bin/detect_balloons")
+async def api_bin_detect_balloons(request: Request):
+    try:
+        img = decode_image(await read_binary_field(request, "image"))
+        with_text = (await read_form_value(request, "with_text", "true")).lower() in ("1", "true", "yes")
+        return await asyncio.to_thread(detect_balloons_payload, img, with_text)
+    except InvalidImageError as e:
+        return JSONResponse(status_code=400, content={"error": e.message})
+    except Exception as e:
+        logger.error(f"Erro Detect Balloons (bin): {str(e)}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+@app.post("/api/bin/ocr_region")
+async def api_bin_ocr_region(request: Request):
+    try:
+        from core.detector import TextDetector
+
+        img = decode_image(await read_binary_field(request, "image"))
+        results = await asyncio.to_thread(TextDetector().detect, img, "manual_ocr")
+        return {"text": "\n".join(box["text"] for box in results)}
+    except InvalidImageError as e:
+        return JSONResponse(status_code=400, content={"error": e.message})
+    except Exception as e:
+        logger.error(f"Erro no OCR Manual (bin): {str(e)}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+@app.post("/api/bin/ultra_inpaint")
+async def api_bin_ultra_inpaint(request: Request, format: str = "png", quality: int = None):
+    """Multipart only: `image` and `mask` files, optional `use_frequency_separation` field."""
+    try:
+        from core.advanced_inpaint import ultra_inpaint_area
+
+        img = decode_image(await read_binary_field(request, "image"))
+        mask_gray = mask_to_binary(decode_image(await read_binary_field(request, "mask"), cv2.IMREAD_UNCHANGED))
+        use_fs = (await read_form_value(request, "use_frequency_separation", "true")).lower() not in ("0", "false", "no")
+
+        cleaned = await asyncio.to_thread(ultra_inpaint_area, img, mask_gray, use_fs)
+        payload, media_type = await asyncio.to_thread(encode_image, cleaned, format, quality)
+        return Response(content=payload, media_type=media_type)
+    except InvalidImageError as e:
+        return JSONResponse(status_code=400, content={"error": e.message})
+    except Exception as e:
+        logger.error(f"Erro no Ultra Inpaint API (bin): {str(e)}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+@app.post("/api/bin/save_image_to_session")
+async def api_bin_save_image_to_session(request: Request):
+    """`session` and `filename` come from form fields or the query string; the image bytes are written as-is."""
+    try:
+        session = await read_form_value(request, "session")
+        filename = await read_form_value(request, "filename")
+        if not session or not filename:
+            return JSONResponse(status_code=400, content={"error": "session e filename são obrigatórios"})
+        img_bytes = await read_binary_field(request, "image")
+        if not img_bytes:
+            return JSONResponse(status_code=400, content={"error": "Imagem vazia"})
+
+        session_folder = os.path.join(OUTPUT_DIR, session)
+        os.makedirs(session_folder, exist_ok=True)
+        clean_name = filename if filename.startswith("after_") else "after_" + filename
+        file_path = os.path.join(session_folder, clean_name)
+        with open(file_path, "wb") as f:
+            f.write(img_bytes)
+        queue_previews(session_folder, clean_name)
+
+        logger.info(f"Imagem salva com sucesso em: {file_path}")
+        return {"status": "success", "path": file_path}
+    except Exception as e:
+        logger.error(f"Erro ao salvar imagem na sessão (bin): {str(e)}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
@@ -0,0 +1,63 @@
+# web_app/progress.py
+
+import asyncio
+from typing import Any, Dict, Optional, Set
+
+from core.logger import logger
+
+TERMINAL_STATUSES = ("done", "cancelled")
+
+
+def is_terminal(status: str) -> bool:
+    return status in TERMINAL_STATUSES or status.startswith("error")
+
+
+class ProgressBroker:
+    """
+    In-process pub/sub for session progress.
+    Producers (process_task, the job queue event reader) publish events per session;
+    each websocket subscriber owns a bounded asyncio.Queue and is woken only when
+    something actually happens, instead of polling the sessions dict.
+    """
+
+    def __init__(self, max_pending: int = 256):
+        self.max_pending = max_pending
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Attaches the event loop that owns the subscriber queues (needed by publish_threadsafe)."""
+        self._loop = loop
+
+    def subscribe(self, session_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_pending)
+        self._subscribers.setdefault(session_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, session_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(session_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[session_id]
+
+    def publish(self, session_id: str, event: Dict[str, Any]):
+        """Delivers an event to every subscriber of a session. Must run on the bound loop."""
+        for queue in self._subscribers.get(session_id, ()):
+            if queue.full():
+                # Slow client: drop its oldest tile event rather than stalling producers
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(event)
+
+    def publish_threadsafe(self, session_id: str, event: Dict[str, Any]):
+        """Same as publish, callable from worker threads (job queue event reader)."""
+        if self._loop is None or self._loop.is_closed():
+            return
+        try:
+            self._loop.call_soon_threadsafe(self.publish, session_id, event)
+        except RuntimeError:
+            logger.debug(f"Progress event dropped for session {session_id}: loop closed")
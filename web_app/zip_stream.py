@@ -0,0 +1,82 @@
+# web_app/zip_stream.py
+
+import os
+import zipfile
+from typing import Iterable, Iterator, Tuple
+
+READ_CHUNK = 1024 * 1024
+
+COMPRESSION_MODES = {
+    "stored": zipfile.ZIP_STORED,      # PNG/WebP are already compressed: just copy the bytes
+    "deflate": zipfile.ZIP_DEFLATED,
+}
+
+
+class _ChunkSink:
+    """
+    Write-only, non-seekable file object for zipfile.
+    Without seek(), zipfile writes data descriptors after each entry instead of
+    rewinding to patch local headers, so the archive can be emitted front to back.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def stream_zip(entries: Iterable[Tuple[str, str]], compression: str = "stored",
+               chunk_size: int = READ_CHUNK) -> Iterator[bytes]:
+    """
+    Yields a ZIP archive of (file path, arcname) entries chunk by chunk.
+    Memory stays bounded by ~chunk_size (plus the deflate window): each file is read
+    in chunks and the compressed bytes are handed out as soon as they are produced.
+    """
+    if compression not in COMPRESSION_MODES:
+        raise ValueError(f"Unknown ZIP compression '{compression}' (expected one of {sorted(COMPRESSION_MODES)})")
+
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=COMPRESSION_MODES[compression], compresslevel=6) as archive:
+        for path, arcname in entries:
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            info.compress_type = COMPRESSION_MODES[compression]
+            with open(path, "rb") as src, archive.open(info, "w") as dst:
+                while True:
+                    block = src.read(chunk_size)
+                    if not block:
+                        break
+                    dst.write(block)
+                    if sink.pending() >= chunk_size:
+                        yield sink.drain()
+            data = sink.drain()
+            if data:
+                yield data
+    # Central directory, written on close
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def session_entries(session_folder: str, prefix: str = "after_") -> Iterator[Tuple[str, str]]:
+    """(path, arcname) of every cleaned page of a session, in name order."""
+    for filename in sorted(os.listdir(session_folder)):
+        if filename.startswith(prefix):
+            yield os.path.join(session_folder, filename), filename.replace(prefix, "")